@@ -1,3 +1,102 @@
-from django.contrib import admin
+from collections import defaultdict
 
-# Register your models here.
+from django.conf import settings
+from django.contrib import admin, messages
+from django.db import transaction
+from django.utils.timezone import now
+
+from common.admin import LargeTableAdmin
+
+from .cache import token_cache
+from .models import User, UserDevice, UserToken
+from .tokens import revocations
+
+# Searches are exact matches, so they run on the unique and device_id indexes
+# instead of scanning for a substring.
+
+
+def revoke_signed_tokens(devices):
+    """
+    Revoke the signed tokens of ``(device pk, user id)`` pairs, one statement
+    per user. Returns the number of devices, 0 unless tokens are signed.
+    """
+    if settings.USERS_TOKEN_FORMAT != 'signed':
+        return 0
+    by_user = defaultdict(list)
+    for device_pk, user_id in devices:
+        by_user[user_id].append(device_pk)
+    return sum(revocations.revoke_many(user_id, device_pks) for user_id, device_pks in by_user.items())
+
+
+@admin.register(User)
+class UserAdmin(LargeTableAdmin):
+    list_display = ('id', 'email', 'name', 'device_id', 'is_superuser', 'is_deleted', 'last_login', 'created_at')
+    search_fields = ('email__exact', 'device_id__exact')
+    search_help_text = "Exact email or device id"
+    list_filter = ('is_deleted',)
+    readonly_fields = ('password', 'token', 'last_login', 'created_at', 'updated_at')
+    exclude = ('groups', 'user_permissions')
+    actions = ['soft_delete']
+
+    def get_queryset(self, request):
+        # The default manager hides soft-deleted users, ops still see them here
+        queryset = User.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    @admin.action(description="Soft-delete selected users and revoke their tokens")
+    def soft_delete(self, request, queryset):
+        # Read once, the queryset may filter on is_deleted and match nothing after the update
+        pks = list(queryset.values_list('pk', flat=True))
+        with transaction.atomic():
+            deleted = User.all_objects.filter(pk__in=pks).update(is_deleted=True, token=None, updated_at=now())
+            keys = UserToken.delete_returning_keys(UserToken.objects.filter(user__in=pks))
+        token_cache.invalidate(*keys)
+        # Signed tokens have no rows to delete, their cached snapshots go by user
+        token_cache.invalidate_users(*pks)
+        self.message_user(request, f"Soft-deleted {deleted} users, revoked {len(keys)} tokens.", messages.SUCCESS)
+
+
+@admin.register(UserDevice)
+class UserDeviceAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'device_id', 'device_os', 'device_os_version', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email__exact', 'device_id__exact')
+    search_help_text = "Exact user email or device id"
+    raw_id_fields = ('user',)
+    actions = ['revoke_tokens']
+
+    @admin.action(description="Revoke tokens of selected devices")
+    def revoke_tokens(self, request, queryset):
+        devices = list(queryset.values_list('pk', 'user_id'))
+        keys = UserToken.delete_returning_keys(UserToken.objects.filter(device_id__in=[pk for pk, _ in devices]))
+        token_cache.invalidate(*keys)
+        revoked = revoke_signed_tokens(devices)
+        self.message_user(request, f"Revoked {len(keys)} tokens, signed tokens on {revoked} devices.", messages.SUCCESS)
+
+
+@admin.register(UserToken)
+class UserTokenAdmin(LargeTableAdmin):
+    list_display = ('id', 'user', 'device_id', 'created_at', 'expires_at')
+    list_select_related = ('user', 'device_id')
+    search_fields = ('user__email__exact', 'device_id__device_id__exact')
+    search_help_text = "Exact user email or device id"
+    raw_id_fields = ('user', 'device_id')
+    # Keys are credentials, shown on the change page only
+    readonly_fields = ('key', 'created_at')
+    actions = ['revoke']
+
+    def has_add_permission(self, request):
+        # Issued by login only
+        return False
+
+    @admin.action(description="Revoke selected tokens")
+    def revoke(self, request, queryset):
+        # Signed tokens issued on the same devices go too
+        devices = set(queryset.values_list('device_id', 'user_id'))
+        keys = UserToken.delete_returning_keys(queryset)
+        token_cache.invalidate(*keys)
+        revoked = revoke_signed_tokens(devices)
+        self.message_user(request, f"Revoked {len(keys)} tokens, signed tokens on {revoked} devices.", messages.SUCCESS)
@@ -4,3 +4,29 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+    def warm_up(self):
+        """
+        Per-process state the first requests would build, see common/prefork.py.
+        """
+        from django.conf import settings
+        from django.contrib.auth.hashers import get_hashers
+
+        from .cache import token_cache
+        from .hashing import hashing_pool
+        from .serializers import LoginSerializer, SignUpSerializer, UserSerializer
+        from .throttling import login_throttle
+        from .tokens import revocations
+
+        for serializer in (LoginSerializer(), SignUpSerializer(), UserSerializer()):
+            serializer.fields
+        # Calibrated hashers read their cost parameters on first use
+        get_hashers()
+        hashing_pool.executor
+        token_cache.local
+        login_throttle.options
+        if settings.USERS_TOKEN_FORMAT == 'signed':
+            revocations.refresh()
@@ -0,0 +1,177 @@
+"""
+Async-native versions of the users API.
+
+Selected instead of ``views`` by ``USERS_ASYNC_VIEWS`` (see ``urls.py``). The
+views run directly on the ASGI event loop, password hashing waits on
+``hashing_pool`` without taking an executor thread. Database access is not
+fully async: Django's async ORM and the transactional sign-up and login
+writes (``SignUpSerializer.acreate_user``, ``LoginSerializer.arecord_login``)
+still run on executor threads, so a worker stays bounded by its threadpool
+there.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated, ParseError, PermissionDenied
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from common.exception import CustomException, custom_exception_handler
+from common.metrics import record_auth
+from common.parsers import loads
+from common.timing import span
+from common.utils import etag_matches
+
+from .authentication import CustomTokenAuthentication as TokenAuthentication
+from .cache import token_cache
+from .serializers import CHECK_TOKEN_CACHE_CONTROL, LoginSerializer, SignUpSerializer, UserSerializer
+from .throttling import login_throttle
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's ``APIView``.
+
+    Handles request parsing, authentication, permissions, exception handling
+    and rendering with the same settings as the sync views.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated API, same as DRF's APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            # A coroutine function on async views, see View.http_method_not_allowed
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        try:
+            await self.initial(request)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc, request)
+
+        return self.finalize_response(request, response)
+
+    async def initial(self, request):
+        request.data = self.parse(request)
+        request.user, request.auth = AnonymousUser(), None
+        for authenticator in self.authentication_classes:
+            user_auth_tuple = await authenticator().aauthenticate(request)
+            if user_auth_tuple is not None:
+                request.user, request.auth = user_auth_tuple
+                break
+
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if request.auth is None:
+                    raise NotAuthenticated()
+                raise PermissionDenied()
+
+    def parse(self, request):
+        if request.content_type == 'application/json':
+            if not request.body:
+                return {}
+            try:
+                return loads(request.body)
+            except ValueError as exc:
+                raise ParseError(f'JSON parse error - {exc}')
+        return request.POST
+
+    def handle_exception(self, exc, request):
+        response = custom_exception_handler(exc, {'view': self, 'request': request})
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, request, response):
+        if isinstance(response, Response):
+            renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+            response.accepted_renderer = renderer
+            response.accepted_media_type = renderer.media_type
+            response.renderer_context = {'view': self, 'request': request, 'response': response}
+            with span('render'):
+                response.render()
+        return response
+
+
+class SignUpView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        serializer = SignUpSerializer(data=request.data)
+        if serializer.is_valid():
+            await SignUpSerializer.acreate_user(serializer.validated_data)
+            return Response({'created': True}, status=status.HTTP_201_CREATED)
+
+        return Response(
+            {
+                'created': False,
+                'message': serializer.errors,
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class LoginView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def post(self, request, *args, **kwargs):
+        attempt = await login_throttle.acheck(request, *login_throttle.credentials(request.data))
+        serializer = LoginSerializer(data=request.data, context={'defer_db_checks': True})
+        if serializer.is_valid():
+            data = serializer.validated_data
+            try:
+                user = await LoginSerializer.aauthenticate_user(data['email'], data['password'])
+            except CustomException as e:
+                if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                    await attempt.afailed()
+                raise
+            await attempt.asucceeded()
+            token = await LoginSerializer.arecord_login(user, data['device_id'], LoginSerializer.login_time(user))
+            return Response(
+                {'status': True, 'token': token.key}, status=status.HTTP_200_OK
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenCheckView(AsyncAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        token = request.auth
+        # token.user is loaded together with the token, serializing it does not query
+        user = token.user
+        if user.token != token.key:
+            record_auth('device_changed')
+            await token_cache.ainvalidate(token.key)
+            await token.adelete()
+            return Response({'status': False, 'device_changed': True, 'message': '로그인 기기가 변경 되었습니다.\n다시 로그인 해주세요.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        etag = UserSerializer.etag(user, token.key)
+        headers = {'ETag': etag, 'Cache-Control': CHECK_TOKEN_CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({'status': True, 'user': UserSerializer(user).data}, status=status.HTTP_200_OK, headers=headers)
+
+
+class LogoutView(AsyncAPIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        token = request.auth
+        user = token.user
+        user.token = None
+        await user.asave(update_fields=['token'])
+        await token_cache.ainvalidate(token.key)
+        await token.adelete()
+        return Response({'status': True,}, status=status.HTTP_200_OK)
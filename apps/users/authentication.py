@@ -1,34 +1,148 @@
+from django.db import DEFAULT_DB_ALIAS
 from django.utils.timezone import now
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-from .models import UserToken
+from common.metrics import record_auth
+from common.timing import timed
+
+from .cache import token_cache
+from .models import User, UserToken
+from .tokens import SignedToken, is_signed, revocations
 
 
 class CustomTokenAuthentication(TokenAuthentication):
     model = UserToken 
     
-    def authenticate(self, request):
+    def get_token_key(self, request):
         auth_header = request.headers.get('Authorization')
         if not auth_header:
-            raise AuthenticationFailed('Authorization header missing')
+            # Let permission classes decide, AllowAny views must stay reachable
+            record_auth('missing')
+            return None
 
         parts = auth_header.split()
         if len(parts) != 2 or parts[0].lower() != 'token':
-            raise AuthenticationFailed('Authorization header must be in the format "Token <token>"')
+            raise self.failed('malformed', 'Authorization header must be in the format "Token <token>"')
 
-        token_key = parts[1]
+        return parts[1]
 
-        try:
-            token = self.model.objects.get(key=token_key)
-        except self.model.DoesNotExist:
-            raise AuthenticationFailed('Invalid token')
+    @timed('auth')
+    def authenticate(self, request):
+        token_key = self.get_token_key(request)
+        if token_key is None:
+            return None
+        if is_signed(token_key):
+            return self.authenticate_signed(token_key)
+
+        token = token_cache.get(token_key)
+        if token is None:
+            try:
+                token = self.get_token(token_key)
+            except self.model.DoesNotExist:
+                raise self.failed('invalid', 'Invalid token')
+            # Expired rows are deleted in batches by the reaper, not on the request path
+            if token.has_expired():
+                raise self.failed('expired', 'Token has expired')
+            token_cache.set(token)
 
+        record_auth('success')
+        return (token.user, token)
+
+    @timed('auth')
+    async def aauthenticate(self, request):
+        token_key = self.get_token_key(request)
+        if token_key is None:
+            return None
+        if is_signed(token_key):
+            return await self.aauthenticate_signed(token_key)
+
+        token = await token_cache.aget(token_key)
+        if token is None:
+            try:
+                token = await self.aget_token(token_key)
+            except self.model.DoesNotExist:
+                raise self.failed('invalid', 'Invalid token')
+            if token.has_expired():
+                raise self.failed('expired', 'Token has expired')
+            await token_cache.aset(token)
+
+        record_auth('success')
         return (token.user, token)
     
+    def authenticate_signed(self, key):
+        token = self.verify_signed(key)
+        revocations.refresh_if_stale()
+        if revocations.is_revoked(token):
+            raise self.failed('revoked', 'Token has been revoked')
+
+        # Verified without the database, the user snapshot still comes from the cache
+        cached = token_cache.get(key)
+        if cached is not None:
+            record_auth('success')
+            return (cached.user, cached)
+        try:
+            token.user = User.objects.get(pk=token.user_id)
+        except User.DoesNotExist:
+            raise self.failed('invalid', 'Invalid token')
+        token_cache.set(token)
+        record_auth('success')
+        return (token.user, token)
+
+    async def aauthenticate_signed(self, key):
+        token = self.verify_signed(key)
+        await revocations.arefresh_if_stale()
+        if revocations.is_revoked(token):
+            raise self.failed('revoked', 'Token has been revoked')
+
+        cached = await token_cache.aget(key)
+        if cached is not None:
+            record_auth('success')
+            return (cached.user, cached)
+        try:
+            token.user = await User.objects.aget(pk=token.user_id)
+        except User.DoesNotExist:
+            raise self.failed('invalid', 'Invalid token')
+        await token_cache.aset(token)
+        record_auth('success')
+        return (token.user, token)
+
+    @staticmethod
+    def failed(outcome, message):
+        record_auth(outcome)
+        return AuthenticationFailed(message)
+
+    def verify_signed(self, key):
+        token = SignedToken.decode(key)
+        if token is None:
+            raise self.failed('invalid', 'Invalid token')
+        if token.has_expired():
+            raise self.failed('expired', 'Token has expired')
+        return token
+
+    def get_token(self, key):
+        # Token and user in a single query, soft-deleted users are rejected
+        queryset = self.model.objects.select_related('user').filter(user__is_deleted=False)
+        try:
+            return queryset.get(key=key)
+        except self.model.DoesNotExist:
+            # A lagging replica may not have the token yet, the primary has the final say
+            if queryset.db == DEFAULT_DB_ALIAS:
+                raise
+            return queryset.using(DEFAULT_DB_ALIAS).get(key=key)
+
+    async def aget_token(self, key):
+        queryset = self.model.objects.select_related('user').filter(user__is_deleted=False)
+        try:
+            return await queryset.aget(key=key)
+        except self.model.DoesNotExist:
+            if queryset.db == DEFAULT_DB_ALIAS:
+                raise
+            return await queryset.using(DEFAULT_DB_ALIAS).aget(key=key)
+
     def authenticate_credentials(self, key):
         try:
-            token = self.model.objects.get(key=key)
+            token = self.get_token(key)
         except self.model.DoesNotExist:
             raise AuthenticationFailed('Invalid token')
         
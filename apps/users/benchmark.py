@@ -0,0 +1,444 @@
+"""
+Throughput and latency benchmark for the users endpoints.
+
+Requests go in-process through the project's WSGI and ASGI handlers, so the
+full middleware, view and ORM stack is measured without a network or server
+in between. A scenario is a weighted mix of endpoints. Every run starts from
+freshly created fixture users, and mixed traffic is ordered with a seeded RNG,
+so two runs of the same commit issue the same requests.
+"""
+import asyncio
+import io
+import itertools
+import json
+import math
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from common.query_budget import QueryCounter
+
+from .cache import token_cache
+from .hashers import percentile
+from .models import User, UserDevice
+from .tokens import issue_token, revocations
+
+ENDPOINTS = {
+    'sign-up': '/api/users/sign-up',
+    'login': '/api/users/login',
+    'check-token': '/api/users/check-token',
+    'logout': '/api/users/logout',
+}
+
+SCENARIOS = {
+    'sign-up': {'sign-up': 100},
+    'login': {'login': 100},
+    'check-token': {'check-token': 100},
+    'logout': {'logout': 100},
+    # Production ratio
+    'mixed': {'check-token': 95, 'login': 5},
+}
+
+PASSWORD = 'Bench@1234'
+
+
+def parse_mix(value):
+    """
+    Parse ``'check-token=95,login=5'`` into ``{'check-token': 95, 'login': 5}``.
+    """
+    mix = {}
+    for part in value.split(','):
+        endpoint, _, weight = part.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+        mix[endpoint] = float(weight or 1)
+    return mix
+
+
+class SharedQueryCounter(QueryCounter):
+    """
+    ``QueryCounter`` installed on every connection opened during a run.
+
+    ``connects`` counts ``connection_created``, i.e. new server connections,
+    or checkouts when ``DB_POOL_MODE=pool``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.connects = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, connection, **kwargs):
+        # First in the chain, QueryBudgetMixin pops the last wrapper it pushed
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+    def on_connection_created(self, connection, **kwargs):
+        with self._lock:
+            self.connects += 1
+        self.install(connection)
+
+    def __enter__(self):
+        connection_created.connect(self.on_connection_created)
+        for connection in connections.all(initialized_only=True):
+            self.install(connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.on_connection_created)
+
+
+class Fixture:
+    """
+    Users, devices and tokens for one run.
+
+    ``login`` and ``check-token`` cycle over ``pool_size`` users each, every
+    ``logout`` consumes a user of its own and ``sign-up`` creates new ones.
+    """
+
+    def __init__(self, run_id, plan, pool_size):
+        self.run_id = run_id
+        self.counts = Counter(plan)
+        self.pool_size = pool_size
+        self.pools = {}
+        self.cursors = {endpoint: itertools.count() for endpoint in ENDPOINTS}
+
+    def build(self):
+        encoded = hashers.make_password(PASSWORD)
+        for endpoint, count in self.counts.items():
+            if endpoint == 'sign-up':
+                continue
+            size = count if endpoint == 'logout' else min(count, self.pool_size)
+            self.pools[endpoint] = self._create_users(endpoint, size, encoded)
+
+    def _create_users(self, endpoint, size, encoded):
+        User.objects.bulk_create([
+            User(
+                email=f'{endpoint}-{self.run_id}-{i}@bench.example.com',
+                password=encoded,
+                name=f'Bench {i}',
+                device_id=f'{endpoint}-{self.run_id}-{i}',
+            )
+            for i in range(size)
+        ])
+        # Re-read for primary keys, not every backend returns them from bulk inserts
+        users = list(User.objects.filter(email__startswith=f'{endpoint}-{self.run_id}-'))
+        UserDevice.objects.bulk_create([
+            UserDevice(user=user, device_id=user.device_id) for user in users
+        ])
+        devices = {device.user_id: device for device in UserDevice.objects.filter(user__in=users)}
+        for user in users:
+            user.token = issue_token(user, devices[user.pk]).key
+        User.objects.bulk_update(users, ['token'])
+        return [(user.email, user.device_id, user.token) for user in users]
+
+    def request(self, endpoint):
+        """
+        Return ``(method, path, body, token)`` for the next ``endpoint`` request.
+        """
+        i = next(self.cursors[endpoint])
+        if endpoint == 'sign-up':
+            body = {
+                'email': f'sign-up-{self.run_id}-{i}@bench.example.com',
+                'password': PASSWORD,
+                'name': f'Bench {i}',
+                'device_id': f'sign-up-{self.run_id}-{i}',
+                'device_os': 'ios',
+                'device_os_version': '18.0',
+            }
+            return 'POST', ENDPOINTS[endpoint], body, None
+
+        pool = self.pools[endpoint]
+        email, device_id, token = pool[i % len(pool)]
+        if endpoint == 'login':
+            body = {'email': email, 'password': PASSWORD, 'device_id': device_id}
+            return 'POST', ENDPOINTS[endpoint], body, None
+        if endpoint == 'check-token':
+            return 'GET', ENDPOINTS[endpoint], None, token
+        return 'POST', ENDPOINTS[endpoint], {}, token
+
+
+def build_plan(mix, total, seed):
+    endpoints = list(mix)
+    if len(endpoints) == 1:
+        return endpoints * total
+    return random.Random(seed).choices(endpoints, weights=[mix[e] for e in endpoints], k=total)
+
+
+def call_wsgi(app, method, path, body, token):
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'bench',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+
+    status = []
+    result = app(environ, lambda status_line, headers, exc_info=None: status.append(status_line))
+    try:
+        for _ in result:
+            pass
+    finally:
+        # Fires request_finished, which closes the connection like a real server
+        result.close()
+    return int(status[0].split()[0])
+
+
+async def call_asgi(app, method, path, body, token):
+    payload = json.dumps(body).encode() if body is not None else b''
+    headers = [
+        (b'host', b'bench'),
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(payload)).encode()),
+    ]
+    if token:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('bench', 80),
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects, the handler cancels this once it responds
+        await asyncio.Event().wait()
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+def drive_wsgi(app, requests, concurrency):
+    samples = [None] * len(requests)
+    indexes = iter(range(len(requests)))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(indexes, None)
+                if i is None:
+                    return
+                endpoint, call = requests[i]
+                started = time.perf_counter()
+                status = call_wsgi(app, *call)
+                samples[i] = (endpoint, status, time.perf_counter() - started)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, name=f'bench-{n}') for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def drive_asgi(app, requests, concurrency):
+    samples = [None] * len(requests)
+    indexes = iter(range(len(requests)))
+
+    async def worker():
+        for i in indexes:
+            endpoint, call = requests[i]
+            started = time.perf_counter()
+            status = await call_asgi(app, *call)
+            samples[i] = (endpoint, status, time.perf_counter() - started)
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return samples
+
+
+DRIVERS = {
+    'wsgi': (get_wsgi_application, drive_wsgi),
+    'asgi': (get_asgi_application, drive_asgi),
+}
+
+
+def latency_summary(latencies):
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        'mean': round(sum(milliseconds) / len(milliseconds), 3),
+        'p50': round(percentile(milliseconds, 50), 3),
+        'p95': round(percentile(milliseconds, 95), 3),
+        'p99': round(percentile(milliseconds, 99), 3),
+        'max': round(max(milliseconds), 3),
+    }
+
+
+def reset():
+    User.all_objects.all().delete()
+    token_cache.clear()
+    revocations.clear()
+
+
+@contextmanager
+def asgi_connection_age(interface):
+    """
+    Drop persistent connections for ASGI runs, as ``configure_pooling`` does
+    under an ASGI server. Connections left in the threads of finished
+    requests would otherwise block dropping the test database.
+    """
+    databases = connections.settings.values()
+    saved = [database['CONN_MAX_AGE'] for database in databases]
+    if interface == 'asgi':
+        for database in databases:
+            database['CONN_MAX_AGE'] = 0
+    try:
+        yield
+    finally:
+        for database, age in zip(databases, saved):
+            database['CONN_MAX_AGE'] = age
+
+
+def run(scenario, mix, interface, concurrency, requests, warmup=0, pool_size=100, seed=0):
+    """
+    Run ``requests`` measured requests of ``mix`` through ``interface``
+    (``'wsgi'`` or ``'asgi'``) with ``concurrency`` workers.
+    """
+    reset()
+    run_id = f'{interface}{concurrency}'
+    plan = build_plan(mix, warmup + requests, seed)
+    fixture = Fixture(run_id, plan, pool_size)
+    fixture.build()
+    calls = [(endpoint, fixture.request(endpoint)) for endpoint in plan]
+
+    get_application, drive = DRIVERS[interface]
+    app = get_application()
+    with asgi_connection_age(interface):
+        if warmup:
+            drive(app, calls[:warmup], concurrency)
+        connections.close_all()
+
+        with SharedQueryCounter() as counter:
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            samples = drive(app, calls[warmup:], concurrency)
+            elapsed = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+
+    statuses = Counter(str(status) for _, status, _ in samples)
+    by_endpoint = {}
+    for endpoint, _, latency in samples:
+        by_endpoint.setdefault(endpoint, []).append(latency)
+
+    return {
+        'scenario': scenario,
+        'mix': mix,
+        'interface': interface,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+        'status_codes': dict(statuses),
+        'requests_per_second': round(len(samples) / elapsed, 1),
+        'latency_ms': latency_summary([latency for _, _, latency in samples]),
+        'queries_per_request': round(counter.count / len(samples), 2),
+        'connects_per_request': round(counter.connects / len(samples), 3),
+        'cpu_ms_per_request': round(cpu * 1000 / len(samples), 3),
+        'endpoints': {
+            endpoint: {'requests': len(latencies), **latency_summary(latencies)}
+            for endpoint, latencies in sorted(by_endpoint.items())
+        },
+    }
+
+
+def pool_mode(database):
+    if database.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    return 'persistent' if database.get('CONN_MAX_AGE') else 'none'
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'database': connections['default'].vendor,
+        'db_pool_mode': pool_mode(connections['default'].settings_dict),
+        'token_format': settings.USERS_TOKEN_FORMAT,
+        'async_views': settings.USERS_ASYNC_VIEWS,
+        'hasher': hashers.get_hasher().algorithm,
+    }
+
+
+def compare(baseline, current):
+    """
+    Yield ``(key, baseline, current)`` for runs present in both reports.
+    """
+    def index(report):
+        return {
+            (result['scenario'], result['interface'], result['concurrency']): result
+            for result in report['results']
+        }
+
+    before = index(baseline)
+    for key, result in index(current).items():
+        if key in before:
+            yield key, before[key], result
+
+
+def percent_change(before, after):
+    if not before:
+        return math.nan
+    return (after - before) / before * 100
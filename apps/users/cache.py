@@ -0,0 +1,286 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.timezone import now
+
+from common.metrics import TOKEN_CACHE_LOOKUPS
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'users:token:',
+    'LOCAL_MAXSIZE': 10000,
+    # Local entries cannot be invalidated from other processes, keep them short lived.
+    'LOCAL_TTL': 5,
+    'SHARED_TTL': 300,
+}
+
+LOOKUP_RESULTS = {'local_hits': 'local_hit', 'shared_hits': 'shared_hit', 'misses': 'miss'}
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry expiry.
+
+    Entries set with a ``tag`` can be dropped together with ``delete_tag``.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires <= time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tag=None):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, time.monotonic() + ttl, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def delete_tag(self, tag):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+        keys = self._tags[entry[2]]
+        keys.discard(key)
+        if not keys:
+            del self._tags[entry[2]]
+
+
+class TokenCache:
+    """
+    Verification cache for authentication tokens.
+
+    Snapshots of a token with its user already loaded are kept in an in-process
+    LRU in front of the shared Django cache backend. Entries never outlive the
+    token's ``expires_at``.
+
+    Shared entries carry the user's generation, a value replaced by
+    ``invalidate_users`` whenever the user row changes. A snapshot taken
+    before the change no longer matches and is read as a miss, whichever
+    token it was cached under.
+    """
+
+    def __init__(self):
+        self._local = None
+        self._options = None
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = {**DEFAULTS, **getattr(settings, 'USERS_TOKEN_CACHE', {})}
+        return self._options
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LRUCache(self.options['LOCAL_MAXSIZE'])
+        return self._local
+
+    @property
+    def shared(self):
+        return caches[self.options['CACHE_ALIAS']]
+
+    @property
+    def enabled(self):
+        return self.options['ENABLED']
+
+    def make_key(self, key):
+        return f"{self.options['KEY_PREFIX']}{key}"
+
+    def make_user_key(self, user_id):
+        return f"{self.options['KEY_PREFIX']}user:{user_id}"
+
+    def get(self, key):
+        """
+        Return a fresh copy of the cached token for ``key``, or ``None``.
+        """
+        if not self.enabled:
+            return None
+
+        blob = self.local.get(key)
+        if blob is not None:
+            self._count('local_hits')
+            return pickle.loads(blob)
+
+        entry = self.shared.get(self.make_key(key))
+        if not self._is_entry(entry):
+            return self._from_shared(key, None, None)
+        return self._from_shared(key, entry, self.shared.get(self.make_user_key(entry[0])))
+
+    async def aget(self, key):
+        if not self.enabled:
+            return None
+
+        blob = self.local.get(key)
+        if blob is not None:
+            self._count('local_hits')
+            return pickle.loads(blob)
+
+        entry = await self.shared.aget(self.make_key(key))
+        if not self._is_entry(entry):
+            return self._from_shared(key, None, None)
+        return self._from_shared(key, entry, await self.shared.aget(self.make_user_key(entry[0])))
+
+    def set(self, token):
+        """
+        Cache ``token``. Its ``user`` relation must already be loaded.
+        """
+        if not self.enabled:
+            return
+
+        remaining = self._remaining(token)
+        if remaining <= 0:
+            return
+
+        generation = self.shared.get(self.make_user_key(token.user_id))
+        blob = pickle.dumps(token)
+        self.local.set(token.key, blob, min(self.options['LOCAL_TTL'], remaining), tag=token.user_id)
+        entry = (token.user_id, generation, blob)
+        self.shared.set(self.make_key(token.key), entry, min(self.options['SHARED_TTL'], remaining))
+
+    async def aset(self, token):
+        if not self.enabled:
+            return
+
+        remaining = self._remaining(token)
+        if remaining <= 0:
+            return
+
+        generation = await self.shared.aget(self.make_user_key(token.user_id))
+        blob = pickle.dumps(token)
+        self.local.set(token.key, blob, min(self.options['LOCAL_TTL'], remaining), tag=token.user_id)
+        entry = (token.user_id, generation, blob)
+        await self.shared.aset(self.make_key(token.key), entry, min(self.options['SHARED_TTL'], remaining))
+
+    def invalidate(self, *keys):
+        keys = self._drop_local(keys)
+        if keys:
+            self.shared.delete_many([self.make_key(key) for key in keys])
+
+    async def ainvalidate(self, *keys):
+        keys = self._drop_local(keys)
+        if keys:
+            await self.shared.adelete_many([self.make_key(key) for key in keys])
+
+    def invalidate_users(self, *user_ids):
+        """
+        Drop every cached snapshot of these users, after their rows changed.
+
+        Other processes keep serving their local copies for up to ``LOCAL_TTL``.
+        """
+        if not self.enabled or not user_ids:
+            return
+        for user_id in user_ids:
+            self.local.delete_tag(user_id)
+        # Outlives every snapshot taken before it
+        generation = uuid.uuid4().hex
+        self.shared.set_many(
+            {self.make_user_key(user_id): generation for user_id in user_ids}, self.options['SHARED_TTL']
+        )
+
+    def clear(self):
+        """
+        Drop local entries and counters. Also used when settings change in tests.
+        """
+        if self._local is not None:
+            self._local.clear()
+        self._options = None
+        self._local = None
+        self.reset_stats()
+
+    def stats(self):
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+            'local_size': len(self._local) if self._local is not None else 0,
+            'local_evictions': self._local.evictions if self._local is not None else 0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.local_hits = self.shared_hits = self.misses = 0
+
+    @staticmethod
+    def _is_entry(entry):
+        # (user_id, generation, blob), a bare blob is from an older release
+        return isinstance(entry, tuple)
+
+    def _from_shared(self, key, entry, generation):
+        if entry is None or entry[1] != generation:
+            self._count('misses')
+            return None
+
+        self._count('shared_hits')
+        user_id, _, blob = entry
+        token = pickle.loads(blob)
+        self.local.set(key, blob, min(self.options['LOCAL_TTL'], self._remaining(token)), tag=user_id)
+        return token
+
+    def _drop_local(self, keys):
+        keys = [key for key in keys if key]
+        for key in keys:
+            self.local.delete(key)
+        return keys
+
+    def _count(self, name):
+        TOKEN_CACHE_LOOKUPS.labels(LOOKUP_RESULTS[name]).inc()
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _remaining(token):
+        if token.expires_at is None:
+            return 0
+        return (token.expires_at - now()).total_seconds()
+
+
+token_cache = TokenCache()
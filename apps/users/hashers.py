@@ -0,0 +1,121 @@
+"""
+Password hashers whose cost parameters come from ``manage.py calibrate_hasher``.
+
+The algorithms keep their stock names, so existing hashes keep verifying and
+``must_update`` flags hashes made with other parameters for a rehash.
+"""
+import functools
+import json
+import math
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    PBKDF2SHA1PasswordHasher,
+    get_hasher,
+    identify_hasher,
+)
+
+# algorithm -> (stock hasher, cost parameter scaled by the calibration)
+TUNABLE_HASHERS = {
+    PBKDF2PasswordHasher.algorithm: (PBKDF2PasswordHasher, 'iterations'),
+    PBKDF2SHA1PasswordHasher.algorithm: (PBKDF2SHA1PasswordHasher, 'iterations'),
+    Argon2PasswordHasher.algorithm: (Argon2PasswordHasher, 'time_cost'),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_calibration():
+    path = getattr(settings, 'PASSWORD_HASHER_CALIBRATION_FILE', None)
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('hashers', {})
+
+
+def get_calibration(algorithm):
+    return load_calibration().get(algorithm, {})
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return get_calibration(self.algorithm).get('iterations', PBKDF2PasswordHasher.iterations)
+
+
+class CalibratedPBKDF2SHA1PasswordHasher(PBKDF2SHA1PasswordHasher):
+    @property
+    def iterations(self):
+        return get_calibration(self.algorithm).get('iterations', PBKDF2SHA1PasswordHasher.iterations)
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return get_calibration(self.algorithm).get('time_cost', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return get_calibration(self.algorithm).get('memory_cost', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return get_calibration(self.algorithm).get('parallelism', Argon2PasswordHasher.parallelism)
+
+
+def needs_rehash(encoded):
+    """
+    True when ``encoded`` was not made by the preferred hasher with its current parameters.
+    """
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != get_hasher('default').algorithm or hasher.must_update(encoded)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(len(ordered) * pct / 100) - 1, 0)]
+
+
+def measure(hasher, samples, pct, password='calibration-Password1!'):
+    """
+    Verification latency of ``hasher`` in seconds at the given percentile.
+    """
+    encoded = hasher.encode(password, hasher.salt())
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.verify(password, encoded)
+        timings.append(time.perf_counter() - started)
+    return percentile(timings, pct)
+
+
+def calibrate(algorithm, target, pct=95, samples=20, minimum=1, rounds=4, overrides=None):
+    """
+    Scale the cost parameter of ``algorithm`` until verification takes ``target`` seconds.
+
+    Returns the parameters to store and the measured latency.
+    """
+    stock, param = TUNABLE_HASHERS[algorithm]
+    hasher = stock()
+    for name, value in (overrides or {}).items():
+        setattr(hasher, name, value)
+
+    value = getattr(hasher, param)
+    for _ in range(rounds):
+        setattr(hasher, param, value)
+        latency = measure(hasher, samples, pct)
+        scaled = max(int(value * target / latency), minimum)
+        if abs(scaled - value) <= value * 0.05:
+            break
+        value = scaled
+
+    setattr(hasher, param, value)
+    latency = measure(hasher, samples, pct)
+    params = {param: value, **(overrides or {})}
+    return params, latency
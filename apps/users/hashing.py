@@ -0,0 +1,273 @@
+"""
+Bounded worker pool for password hashing and verification.
+
+PBKDF2 keeps a core busy for tens of milliseconds per call. Running it on a
+dedicated executor with a bounded queue keeps login bursts from starving the
+cheap endpoints served by the same worker. ``hashlib.pbkdf2_hmac`` releases
+the GIL, so the thread executor is enough for the default hasher; the
+process executor covers hashers that hold it.
+"""
+import asyncio
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.db import connection
+from rest_framework import status
+
+from common.exception import CustomException, ServerErrorMessages
+from common.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE
+from common.timing import record, span
+
+from .hashers import needs_rehash
+
+DEFAULTS = {
+    'EXECUTOR': 'thread',  # thread or process
+    'WORKERS': os.cpu_count() or 1,
+    'QUEUE_SIZE': 64,
+    'TIMEOUT': 10,
+    'REHASH_ON_LOGIN': True,
+}
+REHASH_QUEUE_SIZE = 256
+
+
+class HashingPoolFull(CustomException):
+    def __init__(self):
+        super().__init__(ServerErrorMessages.SERVER_BUSY, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def _timed_call(fn, args, submitted_at):
+    # Runs in the worker, monotonic clocks are system wide on the platforms we deploy to
+    started_at = time.monotonic()
+    result = fn(*args)
+    return result, started_at - submitted_at, time.monotonic() - started_at
+
+
+class HashingPool:
+    """
+    Executor for ``make_password``/``check_password`` with a bounded queue.
+
+    At most ``QUEUE_SIZE`` calls are in flight (running or waiting); further
+    calls fail fast with ``HashingPoolFull`` (503) instead of piling up. Calls
+    that take longer than ``TIMEOUT`` fail with the same 503 and give up their
+    slot, a queued call is dropped, a running one finishes unobserved.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._options = None
+        self._slots = None
+        self._lock = threading.Lock()
+        # Rehashes write to the database, keep them on their own small thread
+        self._rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-rehash')
+        self._rehash_slots = threading.BoundedSemaphore(REHASH_QUEUE_SIZE)
+        self.reset_stats()
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING_POOL', {})}
+        return self._options
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._slots = threading.BoundedSemaphore(self.options['QUEUE_SIZE'])
+                    self._executor = self._create_executor()
+        return self._executor
+
+    def _create_executor(self):
+        workers = self.options['WORKERS']
+        if self.options['EXECUTOR'] == 'process':
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('forkserver'),
+                initializer=django.setup,
+            )
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+    def submit(self, fn, *args, block=False):
+        executor = self.executor
+        # Replaced with the executor after a shutdown, calls of the old one
+        # give their slot back to the semaphore they took it from
+        slots = self._slots
+        # Blocking callers wait up to TIMEOUT for a slot
+        if block:
+            acquired = slots.acquire(timeout=self.options['TIMEOUT'])
+        else:
+            acquired = slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolFull()
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = executor.submit(_timed_call, fn, args, time.monotonic())
+        except BaseException:
+            self._release(slots)
+            raise
+        future.slots = slots
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args):
+        with span('hash'):
+            future = self.submit(fn, *args)
+            try:
+                result, waited, ran = future.result(timeout=self.options['TIMEOUT'])
+            except FutureTimeoutError:
+                self._abandon(future)
+                raise HashingPoolFull() from None
+        self._observe(fn, waited, ran)
+        return result
+
+    async def arun(self, fn, *args):
+        with span('hash'):
+            future = self.submit(fn, *args)
+            try:
+                result, waited, ran = await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout=self.options['TIMEOUT']
+                )
+            except asyncio.TimeoutError:
+                self._abandon(future)
+                raise HashingPoolFull() from None
+        self._observe(fn, waited, ran)
+        return result
+
+    def map(self, fn, iterable):
+        """
+        Yield ``fn(item)`` for each item, in order, for bulk work sharing the pool.
+
+        At most ``WORKERS`` of its calls are in flight, so interactive calls
+        queue behind no more than one round of them.
+        """
+        window = collections.deque()
+        for item in iterable:
+            if len(window) >= self.options['WORKERS']:
+                yield window.popleft().result()[0]
+            window.append(self.submit(fn, item, block=True))
+        while window:
+            yield window.popleft().result()[0]
+
+    def _abandon(self, future):
+        with self._lock:
+            self.timed_out += 1
+        # Cancelling a queued call releases its slot through _done, a running
+        # one cannot be stopped but nobody waits for it any more
+        if not future.cancel():
+            self._release(future.slots, future)
+
+    @staticmethod
+    def _observe(fn, waited, ran):
+        record('hash_queue', waited)
+        PASSWORD_HASH_QUEUE.observe(waited)
+        PASSWORD_HASH_DURATION.labels(fn.__name__).observe(ran)
+
+    def make_password(self, password):
+        return self.run(hashers.make_password, password)
+
+    def check_password(self, password, encoded):
+        return self.run(hashers.check_password, password, encoded)
+
+    async def amake_password(self, password):
+        return await self.arun(hashers.make_password, password)
+
+    async def acheck_password(self, password, encoded):
+        return await self.arun(hashers.check_password, password, encoded)
+
+    def schedule_rehash(self, user, password):
+        """
+        Rehash ``password`` off the request path when the stored hash is stale.
+
+        The new hash only replaces the old one if the password did not change
+        in the meantime. Skipped when the pool or the rehash queue is busy, the
+        next login retries.
+        """
+        if not self.options['REHASH_ON_LOGIN'] or not needs_rehash(user.password):
+            return None
+        if not self._rehash_slots.acquire(blocking=False):
+            return None
+        try:
+            return self._rehash_executor.submit(
+                self._rehash, type(user)._default_manager, user.pk, password, user.password
+            )
+        except BaseException:
+            self._rehash_slots.release()
+            raise
+
+    def _rehash(self, manager, pk, password, old_encoded):
+        try:
+            encoded = self.make_password(password)
+            return manager.filter(pk=pk, password=old_encoded).update(password=encoded)
+        except HashingPoolFull:
+            return 0
+        finally:
+            self._rehash_slots.release()
+            connection.close()
+
+    def stats(self):
+        completed = self.completed
+        return {
+            'in_flight': self.in_flight,
+            'queue_depth': max(self.in_flight - self.options['WORKERS'], 0),
+            'queue_size': self.options['QUEUE_SIZE'],
+            'workers': self.options['WORKERS'],
+            'completed': completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'wait_time_avg': self.wait_time_total / completed if completed else 0.0,
+            'wait_time_max': self.wait_time_max,
+            'run_time_avg': self.run_time_total / completed if completed else 0.0,
+        }
+
+    def reset_stats(self):
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._options = None
+        # Outside the lock, calls finishing meanwhile take it in _done
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _done(self, future):
+        self._release(future.slots, future)
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, wait_time, run_time = future.result()
+        with self._lock:
+            self.completed += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+            self.run_time_total += run_time
+
+    def _release(self, slots, future=None):
+        with self._lock:
+            # Once per call, a timed out call is released before it finishes
+            if future is not None:
+                if getattr(future, 'slot_released', False):
+                    return
+                future.slot_released = True
+            self.in_flight -= 1
+        slots.release()
+
+
+hashing_pool = HashingPool()
@@ -0,0 +1,285 @@
+"""
+Streaming bulk import of users from CSV or JSONL.
+
+Rows are read lazily, validated with the same rules as sign-up, deduplicated
+against the input and the ``user`` table one batch at a time, hashed in
+parallel and inserted with ``bulk_create``. Memory stays flat however large
+the input: earlier batches are found in the ``user`` table, and only the
+first rejections are kept unless they are streamed to a file.
+"""
+import codecs
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import hashers
+from django.db import IntegrityError, connection, transaction
+
+from common.exception import ImportErrorMessages, UserValidationMessages
+from common.validation import credential_rules
+
+from .hashing import hashing_pool
+from .models import User, UserDevice
+
+REQUIRED_FIELDS = (
+    ('email', UserValidationMessages.EMAIL_REQUIRED),
+    ('password', UserValidationMessages.PASSWORD_REQUIRED),
+    ('name', UserValidationMessages.NAME_REQUIRED),
+    ('device_id', UserValidationMessages.DEVICE_ID_REQUIRED),
+)
+
+
+def iter_records(lines, fmt):
+    """
+    Yield ``(line_number, record)`` from an iterable of text lines.
+
+    Unparseable JSONL lines yield ``None`` as the record.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def iter_uploaded_records(uploaded_file, fmt):
+    # UploadedFile iterates over byte lines and spools large uploads to disk
+    return iter_records(codecs.iterdecode(uploaded_file, 'utf-8-sig'), fmt)
+
+
+def required_error(record):
+    if record is None:
+        return ImportErrorMessages.INVALID_ROW
+    for field, message in REQUIRED_FIELDS:
+        if not record.get(field):
+            return message
+        if not isinstance(record[field], str):
+            return ImportErrorMessages.INVALID_ROW
+    return None
+
+
+def validate_record(record):
+    """
+    Return the first validation message for ``record``, or ``None`` when it is valid.
+    """
+    return required_error(record) or credential_rules.error(record['email'], record['password'])
+
+
+def validate_records(records):
+    """
+    ``validate_record`` for a list of records, checking credentials in one batch.
+    """
+    reasons = [required_error(record) for record in records]
+    complete = [i for i, reason in enumerate(reasons) if reason is None]
+    checked = credential_rules.errors((records[i]['email'], records[i]['password']) for i in complete)
+    for i, reason in zip(complete, checked):
+        reasons[i] = reason
+    return reasons
+
+
+class ImportReport:
+    """
+    Counts for the whole import, the first ``max_rejections`` rejections and,
+    with ``rejection_stream``, every rejection written out as a JSON line.
+    """
+
+    def __init__(self, max_rejections=1000, rejection_stream=None):
+        self.processed = 0
+        self.created = 0
+        self.rejected = 0
+        self.rejections = []
+        self.max_rejections = max_rejections
+        self.rejection_stream = rejection_stream
+        self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line_number, record, reason):
+        email = record.get('email') if record else None
+        rejection = {'line': line_number, 'email': email, 'reason': reason}
+        self.rejected += 1
+        if len(self.rejections) < self.max_rejections:
+            self.rejections.append(rejection)
+        if self.rejection_stream is not None:
+            self.rejection_stream.write(json.dumps(rejection, ensure_ascii=False) + '\n')
+
+    def summary(self):
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'rejected': self.rejected,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class UserImporter:
+    """
+    Import users and their devices in chunks of ``batch_size`` rows.
+
+    ``executor`` is ``'process'`` to hash across cores from a management
+    command, or ``'pool'`` inside a web worker to share ``hashing_pool``
+    with logins and sign-ups.
+
+    Duplicates within a batch are caught here, duplicates of earlier batches
+    by the ``user`` table they were inserted into. A dry run inserts nothing
+    and remembers at most ``dry_run_seen_limit`` emails and device ids, past
+    that it reports duplicates within a batch and of existing users only.
+    """
+    dry_run_seen_limit = 100000
+
+    def __init__(self, batch_size=1000, workers=None, executor='process', dry_run=False, progress=None,
+                 max_rejections=1000, rejection_stream=None):
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.executor_type = executor
+        self.dry_run = dry_run
+        self.progress = progress
+        self.max_rejections = max_rejections
+        self.rejection_stream = rejection_stream
+        self.seen_emails = set()
+        self.seen_device_ids = set()
+
+    def run(self, records):
+        report = ImportReport(self.max_rejections, self.rejection_stream)
+        with self._create_executor() as executor:
+            batch = []
+            for line_number, record in records:
+                batch.append((line_number, record))
+                if len(batch) >= self.batch_size:
+                    self._import_batch(batch, executor, report)
+                    batch = []
+            if batch:
+                self._import_batch(batch, executor, report)
+        return report
+
+    def _create_executor(self):
+        if self.executor_type == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('forkserver'),
+                initializer=django.setup,
+            )
+        # hashing_pool is long-lived, nothing to create or shut down
+        return contextlib.nullcontext()
+
+    def _import_batch(self, batch, executor, report):
+        if not self.dry_run or len(self.seen_emails) >= self.dry_run_seen_limit:
+            self.seen_emails.clear()
+            self.seen_device_ids.clear()
+        report.processed += len(batch)
+        rows = self._validate(batch, report)
+        rows = self._exclude_existing(rows, report)
+        if rows and self.dry_run:
+            report.created += len(rows)
+        elif rows:
+            encoded = self._hash([record['password'] for _, record in rows], executor)
+            report.created += self._insert(rows, encoded, report)
+
+        if self.progress:
+            self.progress(report)
+
+    def _hash(self, passwords, executor):
+        if executor is None:
+            return list(hashing_pool.map(hashers.make_password, passwords))
+        chunksize = max(len(passwords) // (self.workers * 4), 1)
+        return list(executor.map(hashers.make_password, passwords, chunksize=chunksize))
+
+    def _validate(self, batch, report):
+        rows = []
+        reasons = validate_records([record for _, record in batch])
+        for (line_number, record), reason in zip(batch, reasons):
+            if reason is None and record['email'] in self.seen_emails:
+                reason = UserValidationMessages.EMAIL_ALREADY_EXISTS
+            if reason is None and record['device_id'] in self.seen_device_ids:
+                reason = UserValidationMessages.DEVICE_ID_ALREADY_EXISTS
+            if reason is not None:
+                report.reject(line_number, record, reason)
+                continue
+            self.seen_emails.add(record['email'])
+            self.seen_device_ids.add(record['device_id'])
+            rows.append((line_number, record))
+        return rows
+
+    def _exclude_existing(self, rows, report):
+        if not rows:
+            return rows
+        emails = set(User.objects.filter(
+            email__in=[record['email'] for _, record in rows]
+        ).values_list('email', flat=True))
+        device_ids = set(User.objects.filter(
+            device_id__in=[record['device_id'] for _, record in rows]
+        ).values_list('device_id', flat=True))
+
+        remaining = []
+        for line_number, record in rows:
+            if record['email'] in emails:
+                report.reject(line_number, record, UserValidationMessages.EMAIL_ALREADY_EXISTS)
+            elif record['device_id'] in device_ids:
+                report.reject(line_number, record, UserValidationMessages.DEVICE_ID_ALREADY_EXISTS)
+            else:
+                remaining.append((line_number, record))
+        return remaining
+
+    def _insert(self, rows, encoded, report):
+        try:
+            with transaction.atomic():
+                return self._bulk_create(rows, encoded)
+        except IntegrityError:
+            # Lost a race with a concurrent sign-up, re-check this chunk and retry once
+            checked = self._exclude_existing(rows, report)
+            passwords = dict(zip((line for line, _ in rows), encoded))
+            with transaction.atomic():
+                return self._bulk_create(checked, [passwords[line] for line, _ in checked])
+
+    def _bulk_create(self, rows, encoded):
+        if not rows:
+            return 0
+        users = User.objects.bulk_create([
+            User(
+                email=record['email'],
+                password=password,
+                name=record['name'],
+                device_id=record['device_id'],
+                time_zone=record.get('time_zone') or None,
+            )
+            for (_, record), password in zip(rows, encoded)
+        ])
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ids = dict(User.objects.filter(
+                email__in=[user.email for user in users]
+            ).values_list('email', 'id'))
+            for user in users:
+                user.pk = ids[user.email]
+
+        UserDevice.objects.bulk_create([
+            UserDevice(
+                user=user,
+                device_id=record['device_id'],
+                device_os=record.get('device_os') or '',
+                device_os_version=record.get('device_os_version') or '',
+            )
+            for (_, record), user in zip(rows, users)
+        ])
+        return len(users)
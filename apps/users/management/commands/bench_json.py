@@ -0,0 +1,68 @@
+import io
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.users.models import User
+from apps.users.serializers import UserSerializer
+from common.exception import LoginErrorMessages
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+
+
+def payloads():
+    user = User(
+        id=12345,
+        name='테스트 사용자',
+        email='bench@example.com',
+        device_id='3f1c9a2e-7b41-4c55-9d0e-1a2b3c4d5e6f',
+        token='0123456789abcdef0123456789abcdef01234567',
+        time_zone='Asia/Seoul',
+        created_at=now(),
+        updated_at=now(),
+    )
+    return {
+        'login': {'status': True, 'token': user.token},
+        'check-token': {'status': True, 'user': UserSerializer(user).data},
+        'device-changed': {'status': False, 'device_changed': True, 'message': '로그인 기기가 변경 되었습니다.\n다시 로그인 해주세요.'},
+        'error': {'message': LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD},
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare the orjson renderer and parser with DRF's JSON classes on the users payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help="Calls per payload and class.")
+
+    def handle(self, *args, **options):
+        number = options['number']
+        renderers = (JSONRenderer(), FastJSONRenderer())
+        parsers = (JSONParser(), FastJSONParser())
+
+        for name, data in payloads().items():
+            rendered = [renderer.render(data) for renderer in renderers]
+            if rendered[0] != rendered[1]:
+                raise CommandError(f"{name}: output differs\n{rendered[0]!r}\n{rendered[1]!r}")
+            body = rendered[0]
+            parsed = [parser.parse(io.BytesIO(body)) for parser in parsers]
+            if parsed[0] != parsed[1] or parsed[0] != json.loads(body):
+                raise CommandError(f"{name}: parsed data differs")
+
+            render = [self.time(lambda r=r: r.render(data), number) for r in renderers]
+            parse = [self.time(lambda p=p: p.parse(io.BytesIO(body)), number) for p in parsers]
+            self.stdout.write(
+                f"{name:<15} {len(body):>4} B  "
+                f"render {render[0]:6.2f} -> {render[1]:5.2f} us ({render[0] / render[1]:4.1f}x)  "
+                f"parse {parse[0]:6.2f} -> {parse[1]:5.2f} us ({parse[0] / parse[1]:4.1f}x)"
+            )
+
+    @staticmethod
+    def time(fn, number):
+        # Best of 3, in microseconds per call
+        return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
@@ -0,0 +1,88 @@
+import logging
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from common.log import JSONFormatter, QueueHandler
+
+
+class SlowHandler(logging.Handler):
+    """
+    Writes to the null device after ``delay`` seconds, a log disk that stalls on every write.
+    """
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.stream = open(os.devnull, 'w')
+        self.written = 0
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.stream.write(self.format(record) + '\n')
+        self.written += 1
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+class Command(BaseCommand):
+    help = "Request latency with no log handler, a synchronous one and the queued one, on a slow log disk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--delay', type=float, default=5.0, help="Milliseconds per log write.")
+        parser.add_argument('--queue-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        delay = options['delay'] / 1000
+        # Every unauthenticated check-token logs an "Unauthorized" warning on django.request
+        logger = logging.getLogger('django.request')
+        saved = logger.handlers, logger.propagate, logger.level
+        logger.propagate, logger.level = False, logging.WARNING
+        try:
+            for mode in ('none', 'sync', 'queue'):
+                target = SlowHandler(delay)
+                target.setFormatter(JSONFormatter())
+                handler = {
+                    'none': logging.NullHandler(),
+                    'sync': target,
+                    'queue': QueueHandler(target, options['queue_size']),
+                }[mode]
+                logger.handlers = [handler]
+                latencies = self.run(options['requests'])
+
+                started = time.perf_counter()
+                if isinstance(handler, QueueHandler):
+                    handler.close()
+                drained = time.perf_counter() - started
+                target.close()
+                self.stdout.write(
+                    f"{mode:<6} p50 {statistics.median(latencies):7.2f} ms  "
+                    f"p99 {self.p99(latencies):7.2f} ms  max {max(latencies):7.2f} ms  "
+                    f"written {target.written:>4}  dropped {getattr(handler, 'dropped', 0):>4}  "
+                    f"drained after {drained:5.2f} s"
+                )
+        finally:
+            logger.handlers, logger.propagate, logger.level = saved
+
+    @staticmethod
+    def run(number):
+        client = Client()
+        url = reverse('users:check-token')
+        client.get(url)
+        latencies = []
+        for _ in range(number):
+            started = time.perf_counter()
+            client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    @staticmethod
+    def p99(values):
+        return statistics.quantiles(values, n=100)[98]
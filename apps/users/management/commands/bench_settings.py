@@ -0,0 +1,141 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter per sample so imports are not already cached
+PROBE = r'''
+import time
+started = time.perf_counter()
+
+import io
+import json
+import sys
+
+import django
+django.setup()
+setup = time.perf_counter()
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import get_resolver
+
+handler = WSGIHandler()
+get_resolver().url_patterns
+ready = time.perf_counter()
+
+REQUESTS = {
+    'check-token 401': ('GET', '/api/users/check-token', b''),
+    'sign-up 400': ('POST', '/api/users/sign-up', b'{"email": "invalid", "password": "x", "name": "a"}'),
+}
+
+
+def environ(method, path, body):
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+    }
+
+
+def start_response(status, headers):
+    statuses.append(status.split()[0])
+
+
+statuses = []
+number = int(sys.argv[1])
+per_request = {}
+for name, (method, path, body) in REQUESTS.items():
+    timings = []
+    for _ in range(3):
+        began = time.perf_counter()
+        for _ in range(number):
+            b''.join(handler(environ(method, path, body), start_response))
+        timings.append((time.perf_counter() - began) / number * 1e6)
+    per_request[name] = {'us': min(timings), 'status': statuses[-1]}
+
+print(json.dumps({
+    'apps': len(settings.INSTALLED_APPS),
+    'middleware': len(settings.MIDDLEWARE),
+    'modules': len(sys.modules),
+    'setup_ms': (setup - started) * 1e3,
+    'ready_ms': (ready - started) * 1e3,
+    'requests': per_request,
+}))
+'''
+
+# Placeholders so profiles that read connection settings load without a database,
+# the probed requests never query
+PROBE_ENV = {
+    'POSTGRES_DB': 'listener',
+    'POSTGRES_USER': 'listener',
+    'POSTGRES_PASSWORD': 'listener',
+    'POSTGRES_HOST': 'localhost',
+    'POSTGRES_PORT': '5432',
+    'DJANGO_ALLOWED_HOSTS': 'testserver',
+}
+
+
+class Command(BaseCommand):
+    help = "Report startup time and per-request overhead of settings profiles, e.g. production against api."
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['production', 'api'], help="DJANGO_ENV values.")
+        parser.add_argument('--runs', type=int, default=3, help="Fresh processes per profile.")
+        parser.add_argument('--number', type=int, default=300, help="Requests per endpoint and repeat.")
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            samples = [self.probe(profile, options['number']) for _ in range(options['runs'])]
+            results[profile] = samples
+
+        first = options['profiles'][0]
+        self.stdout.write(
+            f"{'profile':<12} {'apps':>4} {'mw':>3} {'modules':>7} {'setup':>9} {'ready':>9}  per request"
+        )
+        for profile, samples in results.items():
+            setup = statistics.median(sample['setup_ms'] for sample in samples)
+            ready = statistics.median(sample['ready_ms'] for sample in samples)
+            requests = {
+                name: min(sample['requests'][name]['us'] for sample in samples)
+                for name in samples[0]['requests']
+            }
+            line = (
+                f"{profile:<12} {samples[0]['apps']:>4} {samples[0]['middleware']:>3} {samples[0]['modules']:>7} "
+                f"{setup:7.1f}ms {ready:7.1f}ms "
+            )
+            for name, us in requests.items():
+                line += f" {name} {us:6.1f}us"
+                if profile != first:
+                    baseline = min(sample['requests'][name]['us'] for sample in results[first])
+                    line += f" ({(us - baseline) / baseline:+.0%})"
+            self.stdout.write(line)
+
+    def probe(self, profile, number):
+        env = {
+            **PROBE_ENV,
+            **os.environ,
+            'DJANGO_ENV': profile,
+            'DJANGO_SETTINGS_MODULE': 'core.settings',
+            'DJANGO_SERVER_INTERFACE': 'wsgi',
+        }
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, str(number)],
+            # BASE_DIR is the core package, the project root is above it
+            cwd=settings.BASE_DIR.parent, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"{profile}: probe failed\n{result.stderr}")
+        return json.loads(result.stdout.splitlines()[-1])
@@ -0,0 +1,117 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.timezone import now
+
+from apps.users import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the users endpoints through the WSGI and ASGI handlers on a throwaway "
+        "test database. Run with DJANGO_ENV=benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=sorted(benchmark.SCENARIOS),
+            help="Scenario to run, repeatable. Defaults to all of them.",
+        )
+        parser.add_argument(
+            '--mix', help="Extra weighted scenario, e.g. check-token=95,login=5",
+        )
+        parser.add_argument('--interface', default='wsgi,asgi', help="Comma separated: wsgi, asgi.")
+        parser.add_argument('--concurrency', default='1,8', help="Comma separated worker counts.")
+        parser.add_argument('--requests', type=int, default=500, help="Measured requests per run.")
+        parser.add_argument('--warmup', type=int, default=50, help="Unmeasured requests before each run.")
+        parser.add_argument('--users', type=int, default=100, help="Fixture users per login/check-token pool.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Print the change against a previous results file.")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the test database between runs.")
+
+    def handle(self, *args, **options):
+        if settings.DEBUG:
+            raise CommandError("DEBUG records every query, run with DJANGO_ENV=benchmark.")
+
+        scenarios = {name: benchmark.SCENARIOS[name] for name in options['scenario'] or benchmark.SCENARIOS}
+        if options['mix']:
+            try:
+                scenarios['custom'] = benchmark.parse_mix(options['mix'])
+            except ValueError as e:
+                raise CommandError(e)
+        interfaces = [value.strip() for value in options['interface'].split(',')]
+        if set(interfaces) - set(benchmark.DRIVERS):
+            raise CommandError(f"Unknown interface in {options['interface']}")
+        concurrencies = [int(value) for value in options['concurrency'].split(',')]
+
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            report = {
+                'meta': {
+                    **benchmark.environment(),
+                    'created_at': now().isoformat(),
+                    'requests': options['requests'],
+                    'warmup': options['warmup'],
+                    'users': options['users'],
+                    'seed': options['seed'],
+                },
+                'results': [],
+            }
+            for name, mix in scenarios.items():
+                for interface in interfaces:
+                    for concurrency in concurrencies:
+                        result = benchmark.run(
+                            name, mix, interface, concurrency,
+                            requests=options['requests'],
+                            warmup=options['warmup'],
+                            pool_size=options['users'],
+                            seed=options['seed'],
+                        )
+                        report['results'].append(result)
+                        self.write_result(result)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.write_comparison(baseline, report)
+
+    def write_result(self, result):
+        latency = result['latency_ms']
+        line = (
+            f"{result['scenario']:<12} {result['interface']:<4} c={result['concurrency']:<3} "
+            f"{result['requests_per_second']:>8.1f} req/s  "
+            f"p50 {latency['p50']:>7.2f}  p95 {latency['p95']:>7.2f}  p99 {latency['p99']:>7.2f} ms  "
+            f"{result['queries_per_request']:>5.2f} q/req  {result['connects_per_request']:>5.2f} conn/req  "
+            f"{result['cpu_ms_per_request']:>6.2f} cpu ms/req"
+        )
+        if result['errors']:
+            line += f"  errors {result['errors']} {result['status_codes']}"
+            self.stdout.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
+
+    def write_comparison(self, baseline, report):
+        self.stdout.write(f"\nAgainst {baseline['meta'].get('commit')}:")
+        for (scenario, interface, concurrency), before, after in benchmark.compare(baseline, report):
+            rps = benchmark.percent_change(before['requests_per_second'], after['requests_per_second'])
+            p99 = benchmark.percent_change(before['latency_ms']['p99'], after['latency_ms']['p99'])
+            queries = after['queries_per_request'] - before['queries_per_request']
+            self.stdout.write(
+                f"{scenario:<12} {interface:<4} c={concurrency:<3} "
+                f"req/s {rps:+6.1f}%  p99 {p99:+6.1f}%  q/req {queries:+.2f}"
+            )
@@ -0,0 +1,79 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.exception import UserValidationMessages
+from common.utils import (
+    is_password_str_num_included,
+    is_valid_email_format,
+    is_valid_password_length,
+    is_valid_password_strength,
+)
+from common.validation import credential_rules
+
+
+def samples():
+    # (email, password) pairs covering each outcome, ASCII and Korean
+    return [
+        ('bench@example.com', 'Passw0rd!@#'),
+        ('bench@example.com', 'Password1@'),
+        ('bench@example.com', 'password'),
+        ('bench@example.com', '12345678'),
+        ('bench@example.com', 'Pa1@'),
+        ('bench@example.com', 'Password1@Password1@'),
+        ('bench@example.com', 'password1@'),
+        ('bench@example.com', '비밀번호Pass1@'),
+        ('bench@example.com', '비밀번호１２３４'),
+        ('bench.example.com', 'Password1@'),
+        ('bench+tag@mail.example.co.kr', 'Password1@'),
+    ]
+
+
+def legacy_error(email, password):
+    """
+    The checks as the serializers ran them before ``credential_rules``.
+    """
+    if not is_valid_email_format(email):
+        return UserValidationMessages.EMAIL_FORMAT_INVALID
+    if not is_password_str_num_included(password):
+        return UserValidationMessages.PASSWORD_STR_NUM_REQUIRED
+    if not is_valid_password_length(password):
+        return UserValidationMessages.PASSWORD_LENGTH_INVALID
+    if not is_valid_password_strength(password):
+        return UserValidationMessages.PASSWORD_STRENGTH_INVALID
+    return None
+
+
+class Command(BaseCommand):
+    help = "Compare the compiled credential rules with the common.utils checks, per call and in batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=50000, help="Calls per sample.")
+        parser.add_argument('--batch', type=int, default=10000, help="Records per batch run.")
+
+    def handle(self, *args, **options):
+        number = options['number']
+        pairs = samples()
+        for email, password in pairs:
+            expected = legacy_error(email, password)
+            if credential_rules.error(email, password) != expected:
+                raise CommandError(f"{email} {password!r}: result differs from the common.utils checks")
+
+            legacy = self.time(lambda: legacy_error(email, password), number)
+            compiled = self.time(lambda: credential_rules.error(email, password), number)
+            self.stdout.write(
+                f"{password:<22} {legacy:5.2f} -> {compiled:5.2f} us ({legacy / compiled:4.1f}x)  {expected or 'valid'}"
+            )
+
+        batch = (pairs * (options['batch'] // len(pairs) + 1))[:options['batch']]
+        legacy = self.time(lambda: [legacy_error(email, password) for email, password in batch], 5)
+        compiled = self.time(lambda: credential_rules.errors(batch), 5)
+        self.stdout.write(
+            f"batch of {len(batch)}: {legacy / len(batch):5.2f} -> {compiled / len(batch):5.2f} us per record "
+            f"({legacy / compiled:4.1f}x)"
+        )
+
+    @staticmethod
+    def time(fn, number):
+        # Best of 3, in microseconds per call
+        return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
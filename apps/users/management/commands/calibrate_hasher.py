@@ -0,0 +1,86 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from apps.users.hashers import TUNABLE_HASHERS, calibrate, load_calibration
+
+# Lowest costs we accept whatever the machine, calibration must not silently disable stretching
+MINIMUMS = {
+    'iterations': 100000,
+    'time_cost': 1,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the configured password hashers on this machine and write the cost "
+        "parameters that hit a target verification latency to PASSWORD_HASHER_CALIBRATION_FILE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=50, help="Target verification latency in milliseconds.")
+        parser.add_argument('--percentile', type=float, default=95, help="Latency percentile compared to the target.")
+        parser.add_argument('--samples', type=int, default=20, help="Verifications measured per trial.")
+        parser.add_argument('--min-iterations', type=int, default=MINIMUMS['iterations'])
+        parser.add_argument('--argon2-memory-kib', type=int, default=None, help="Fixed Argon2 memory_cost, time_cost is scaled.")
+        parser.add_argument('--argon2-parallelism', type=int, default=None)
+        parser.add_argument('--output', default=None, help="Defaults to PASSWORD_HASHER_CALIBRATION_FILE.")
+        parser.add_argument('--dry-run', action='store_true', help="Print the parameters without writing them.")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.PASSWORD_HASHER_CALIBRATION_FILE
+        target = options['target_ms'] / 1000
+        minimums = {**MINIMUMS, 'iterations': options['min_iterations']}
+
+        results = {}
+        for hasher in get_hashers():
+            if hasher.algorithm not in TUNABLE_HASHERS or hasher.algorithm in results:
+                continue
+            if hasher.library:
+                try:
+                    hasher._load_library()
+                except ValueError as exc:
+                    self.stdout.write(f"{hasher.algorithm}: skipped ({exc})")
+                    continue
+
+            _, param = TUNABLE_HASHERS[hasher.algorithm]
+            overrides = {}
+            if param == 'time_cost':
+                if options['argon2_memory_kib']:
+                    overrides['memory_cost'] = options['argon2_memory_kib']
+                if options['argon2_parallelism']:
+                    overrides['parallelism'] = options['argon2_parallelism']
+
+            params, latency = calibrate(
+                hasher.algorithm,
+                target,
+                pct=options['percentile'],
+                samples=options['samples'],
+                minimum=minimums[param],
+                overrides=overrides,
+            )
+            results[hasher.algorithm] = {**params, 'latency_ms': round(latency * 1000, 2)}
+            self.stdout.write(
+                f"{hasher.algorithm}: {params} -> p{options['percentile']:g} {latency * 1000:.1f} ms"
+            )
+
+        if not results:
+            raise CommandError("None of the configured PASSWORD_HASHERS can be calibrated.")
+
+        document = {
+            'target_ms': options['target_ms'],
+            'percentile': options['percentile'],
+            'calibrated_at': now().isoformat(),
+            'hashers': results,
+        }
+        if options['dry_run']:
+            self.stdout.write(json.dumps(document, indent=2))
+            return
+
+        with open(output, 'w') as f:
+            json.dump(document, f, indent=2)
+        load_calibration.cache_clear()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}"))
@@ -0,0 +1,48 @@
+import contextlib
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.importer import UserImporter, iter_records
+
+
+class Command(BaseCommand):
+    help = "Stream users from a CSV or JSONL file into the user and user_device tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=None, help="Hashing processes, defaults to the CPU count.")
+        parser.add_argument('--rejections', default=None, help="Write the per-row rejection report to this JSONL file.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and deduplicate without inserting.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Cannot infer the format, pass --format csv or --format jsonl.")
+
+        with contextlib.ExitStack() as stack:
+            # Streamed as they happen, the report itself keeps only the first few
+            rejections = None
+            if options['rejections']:
+                rejections = stack.enter_context(open(options['rejections'], 'w', encoding='utf-8'))
+            importer = UserImporter(
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                dry_run=options['dry_run'],
+                progress=self.progress,
+                rejection_stream=rejections,
+            )
+            f = stack.enter_context(open(path, newline='', encoding='utf-8-sig'))
+            report = importer.run(iter_records(f, fmt))
+
+        self.stdout.write(self.style.SUCCESS(json.dumps(report.summary())))
+
+    def progress(self, report):
+        self.stdout.write(
+            f"{report.processed} rows, {report.created} created, {report.rejected} rejected "
+            f"({report.rows_per_second:.0f} rows/s)"
+        )
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.users.reaper import get_options, reap_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired rows from user_token in bounded batches ordered by expires_at."
+
+    def add_arguments(self, parser):
+        options = get_options()
+        parser.add_argument('--batch-size', type=int, default=options['BATCH_SIZE'])
+        parser.add_argument('--sleep', type=float, default=options['SLEEP'], help="Seconds to pause between batches.")
+        parser.add_argument('--max-batches', type=int, default=options['MAX_BATCHES'])
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help="Keep running, one reaper pass every SECONDS.")
+
+    def handle(self, *args, **options):
+        if options['loop'] is None:
+            self.reap(options)
+            return
+        while True:
+            self.reap(options)
+            # No connection held open between passes
+            connection.close()
+            time.sleep(options['loop'])
+
+    def reap(self, options):
+        result = reap_expired_tokens(
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            max_batches=options['max_batches'],
+        )
+        if result['deleted'] is None:
+            self.stdout.write(self.style.WARNING("Another reaper is running, skipped."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {result['deleted']} expired tokens in {result['batches']} batches ({result['elapsed']:.2f}s)"
+        ))
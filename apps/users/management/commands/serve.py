@@ -0,0 +1,72 @@
+import functools
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.reaper import start_reaper_thread
+from common.prefork import Arbiter, BootError, bind, preload, serve_asgi, serve_wsgi, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the project from preforked worker processes that warm up before accepting traffic. "
+        "SIGHUP restarts the workers one at a time, SIGTERM stops them gracefully."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000', help="host:port to listen on.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--interface', choices=('wsgi', 'asgi'), default='wsgi')
+        parser.add_argument('--graceful-timeout', type=int, default=30,
+                            help="Seconds a stopping worker gets to finish its requests.")
+        parser.add_argument('--warm-up-timeout', type=int, default=60)
+        parser.add_argument('--timeout', type=int, default=30,
+                            help="WSGI only: seconds a connection may send nothing before it is dropped.")
+        parser.add_argument('--no-warm-up', action='store_false', dest='warm_up',
+                            help="Accept traffic without warming up, for comparison.")
+
+    def handle(self, *args, **options):
+        interface = options['interface']
+        # Settings pick the connection reuse mode from it (core/configs/database.py)
+        if os.environ.get('DJANGO_SERVER_INTERFACE', 'wsgi') != interface:
+            raise CommandError(f"Set DJANGO_SERVER_INTERFACE={interface} to serve {interface.upper()}.")
+        host, _, port = options['bind'].rpartition(':')
+        if not host or not port.isdigit():
+            raise CommandError("--bind must be host:port.")
+
+        if interface == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError as exc:
+                raise CommandError("--interface asgi needs uvicorn installed.") from exc
+            from django.core.asgi import get_asgi_application
+            serve = functools.partial(
+                serve_asgi, application=get_asgi_application(), graceful_timeout=options['graceful_timeout'],
+            )
+        else:
+            from django.core.wsgi import get_wsgi_application
+            serve = functools.partial(serve_wsgi, application=get_wsgi_application(), timeout=options['timeout'])
+
+        # Imported and resolved once here, shared by the forked workers
+        preload()
+        sock = bind(host.strip('[]'), int(port))
+        self.stdout.write(f"Listening on {':'.join(map(str, sock.getsockname()[:2]))}", ending='\n')
+        self.stdout.flush()
+        arbiter = Arbiter(
+            sock,
+            serve,
+            workers=options['workers'],
+            graceful_timeout=options['graceful_timeout'],
+            warm_up_timeout=options['warm_up_timeout'],
+            warm_up=warm_up if options['warm_up'] else None,
+        )
+        # One reaper for all workers: threads do not survive the fork, so it runs
+        # in the master only. No-op unless TOKEN_REAPER['INTERVAL'] is set
+        reaper = start_reaper_thread()
+        try:
+            arbiter.run()
+        except BootError as exc:
+            raise CommandError(f"Giving up: {exc}.") from exc
+        finally:
+            if reaper is not None:
+                reaper.stop()
@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_usertoken_expires_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTokenRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revoked_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='token_revocations', to='users.userdevice')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_revocations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_token_revocation',
+                'ordering': ['-revoked_at'],
+                'indexes': [models.Index(fields=['revoked_at'], name='user_token_revoked_at_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicates(apps, schema_editor):
+    # Keep the newest row per (user, device), tokens first since devices cascade to them
+    for model_name in ('UserToken', 'UserDevice'):
+        model = apps.get_model('users', model_name)
+        duplicates = (
+            model.objects.values('user', 'device_id')
+            .annotate(newest=Max('pk'), rows=Count('pk'))
+            .filter(rows__gt=1)
+        )
+        for row in duplicates.iterator():
+            model.objects.filter(user=row['user'], device_id=row['device_id']).exclude(pk=row['newest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_usertokenrevocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userdevice',
+            constraint=models.UniqueConstraint(fields=('user', 'device_id'), name='user_device_user_device_id_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='usertoken',
+            constraint=models.UniqueConstraint(fields=('user', 'device_id'), name='user_token_user_device_uniq'),
+        ),
+    ]
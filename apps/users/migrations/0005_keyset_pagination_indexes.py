@@ -0,0 +1,22 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_login_upsert_constraints'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='userdevice',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='user_device_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='usertoken',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='user_token_user_created_idx'),
+        ),
+    ]
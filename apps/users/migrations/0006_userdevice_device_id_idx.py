@@ -0,0 +1,18 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='userdevice',
+            index=models.Index(fields=['device_id'], name='user_device_device_id_idx'),
+        ),
+    ]
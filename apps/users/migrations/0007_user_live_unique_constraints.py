@@ -0,0 +1,73 @@
+from django.db import migrations, models
+
+# (column, partial unique index, unique constraint and pattern index from 0001)
+UNIQUE_COLUMNS = [
+    ('email', 'user_email_live_uniq', 'user_email_key', 'user_email_54dc62b2_like'),
+    ('device_id', 'user_device_id_live_uniq', 'user_device_id_key', 'user_device_id_d0d13697_like'),
+]
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0006_userdevice_device_id_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            # The partial indexes are built without blocking writes to "user"
+            # before the full unique constraints they replace are dropped,
+            # so live rows stay unique throughout
+            database_operations=[
+                *(
+                    migrations.RunSQL(
+                        f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{index}" '
+                        f'ON "user" ("{column}") WHERE NOT "is_deleted"',
+                        f'DROP INDEX CONCURRENTLY IF EXISTS "{index}"',
+                    )
+                    for column, index, _, _ in UNIQUE_COLUMNS
+                ),
+                *(
+                    migrations.RunSQL(
+                        f'ALTER TABLE "user" DROP CONSTRAINT IF EXISTS "{constraint}"',
+                        f'ALTER TABLE "user" ADD CONSTRAINT "{constraint}" UNIQUE ("{column}")',
+                    )
+                    for column, _, constraint, _ in UNIQUE_COLUMNS
+                ),
+                *(
+                    migrations.RunSQL(
+                        f'DROP INDEX CONCURRENTLY IF EXISTS "{like_index}"',
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{like_index}" '
+                        f'ON "user" ("{column}" varchar_pattern_ops)',
+                    )
+                    for column, _, _, like_index in UNIQUE_COLUMNS
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='device_id',
+                    field=models.CharField(default=None),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='email',
+                    field=models.EmailField(default=None, max_length=254),
+                ),
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(('is_deleted', False)), fields=('email',), name='user_email_live_uniq',
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(('is_deleted', False)), fields=('device_id',), name='user_device_id_live_uniq',
+                    ),
+                ),
+            ],
+        ),
+    ]
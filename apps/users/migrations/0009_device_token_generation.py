@@ -0,0 +1,29 @@
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_email_device_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdevice',
+            name='token_generation',
+            field=models.PositiveIntegerField(db_default=0),
+        ),
+        # Earlier rows revoke by issue time, which signed tokens no longer carry
+        migrations.AddField(
+            model_name='usertokenrevocation',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='usertokenrevocation',
+            name='revoked_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now()),
+        ),
+    ]
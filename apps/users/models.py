@@ -1,14 +1,31 @@
-from django.contrib.auth.hashers import make_password
-from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
-from django.db import models
+import hashlib
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.db import connections, models, router, transaction
+from django.db.models import NOT_PROVIDED
+from django.db.models.functions import Now
 from django.utils.timezone import now, timedelta
 
+from .cache import token_cache
+
+
+class LiveUserManager(BaseUserManager):
+    """
+    Users that are not soft-deleted. ``User.all_objects`` includes them.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100, null=False, default=None)
-    email = models.EmailField(unique=True, null=False, default=None)
-    device_id = models.CharField(unique=True, null=False, default=None)
+    # Unique among live users, see Meta.constraints
+    email = models.EmailField(null=False, default=None)
+    device_id = models.CharField(null=False, default=None)
     time_zone = models.CharField(null=True, default=None)
     token = models.CharField(null=True, default=None)
     last_login = models.DateTimeField(null=True)
@@ -16,11 +33,27 @@ class User(AbstractBaseUser, PermissionsMixin):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
+    objects = LiveUserManager()
+    all_objects = models.Manager()
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['name']
     class Meta:
         db_table = 'user'
         ordering = ['-created_at']
+        indexes = [
+            # Lookups that include deleted users, e.g. the admin's search over all_objects
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['device_id'], name='user_device_id_idx'),
+        ]
+        constraints = [
+            # Deleted accounts free their email and device id, and lookups
+            # through the default manager only walk live index entries
+            models.UniqueConstraint(fields=['email'], condition=models.Q(is_deleted=False), name='user_email_live_uniq'),
+            models.UniqueConstraint(
+                fields=['device_id'], condition=models.Q(is_deleted=False), name='user_device_id_live_uniq',
+            ),
+        ]
 
     @property
     def is_anonymous(self):
@@ -29,22 +62,112 @@ class User(AbstractBaseUser, PermissionsMixin):
     @property
     def is_authenticated(self):
         return True
+
+    @property
+    def is_staff(self):
+        # No separate staff flag, superusers get the admin site
+        return self.is_superuser
     
     def save(self, *args, **kwargs):
         if self.pk is None and self.password:
-            self.password = make_password(self.password)
+            # common.exception pulls in DRF settings, which import this module
+            from .hashing import hashing_pool
+            self.password = hashing_pool.make_password(self.password)
         super().save(*args, **kwargs)
 
+    @classmethod
+    def insert_with_device(cls, user, device, using=None):
+        """
+        Insert an unsaved ``user`` (password already hashed) and its first ``device``.
+
+        A single ``WITH ... INSERT ... RETURNING`` statement on PostgreSQL, both
+        inserts in one transaction elsewhere. A duplicate email or device id
+        raises ``IntegrityError`` and inserts neither row.
+        """
+        using = using or router.db_for_write(cls, instance=user)
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=using):
+                cls.objects.using(using).bulk_create([user])
+                device.user = user
+                UserDevice.objects.using(using).bulk_create([device])
+            return user
+
+        qn = connection.ops.quote_name
+        user_fields = [f for f in cls._meta.local_concrete_fields if not f.primary_key]
+        device_fields = [
+            f for f in UserDevice._meta.local_concrete_fields
+            if not f.primary_key and f.name != 'user' and f.db_default is NOT_PROVIDED
+        ]
+        sql = (
+            f"WITH u AS (INSERT INTO {qn(cls._meta.db_table)} ({', '.join(qn(f.column) for f in user_fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(user_fields))}) RETURNING {qn(cls._meta.pk.column)}) "
+            f"INSERT INTO {qn(UserDevice._meta.db_table)} "
+            f"({qn(UserDevice._meta.get_field('user').column)}, {', '.join(qn(f.column) for f in device_fields)}) "
+            f"SELECT u.{qn(cls._meta.pk.column)}, {', '.join(['%s'] * len(device_fields))} FROM u "
+            f"RETURNING {qn(UserDevice._meta.get_field('user').column)}, {qn(UserDevice._meta.pk.column)}"
+        )
+        params = [
+            f.get_db_prep_save(f.pre_save(obj, add=True), connection)
+            for obj, fields in ((user, user_fields), (device, device_fields))
+            for f in fields
+        ]
+        # One statement commits atomically on its own, a savepoint keeps an
+        # enclosing transaction usable after a duplicate
+        with transaction.atomic(using=using) if connection.in_atomic_block else nullcontext():
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                user.pk, device.pk = cursor.fetchone()
+        device.user = user
+        for obj in (user, device):
+            obj._state.adding = False
+            obj._state.db = using
+        return user
+
+    @classmethod
+    async def ainsert_with_device(cls, user, device, using=None):
+        # Raw SQL and a possible savepoint, no async ORM equivalent
+        return await sync_to_async(cls.insert_with_device)(user, device, using)
+
 class UserDevice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='devices')
     device_id = models.CharField()
     device_os = models.CharField()
     device_os_version = models.CharField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Signed tokens carry it, revoking them bumps it. A database default, so
+    # the login upsert returns the current value with the pk
+    token_generation = models.PositiveIntegerField(db_default=0)
 
     class Meta:
         db_table = 'user_device'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's devices, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='user_device_user_created_idx'),
+            # Admin search by device id across users
+            models.Index(fields=['device_id'], name='user_device_device_id_idx'),
+        ]
+        constraints = [
+            # Conflict target of the login upsert
+            models.UniqueConstraint(fields=['user', 'device_id'], name='user_device_user_device_id_uniq'),
+        ]
+
+    @classmethod
+    def upsert(cls, user, device_id, using=None):
+        """
+        Device ``device_id`` of ``user``, inserted if missing, in one statement.
+        """
+        using = using or router.db_for_write(cls)
+        device = cls(user=user, device_id=device_id)
+        # Setting device_id to itself makes the conflicting row come back with its pk
+        cls.objects.using(using).bulk_create(
+            [device],
+            update_conflicts=True,
+            unique_fields=['user', 'device_id'],
+            update_fields=['device_id'],
+        )
+        return device
 
 class UserToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tokens')
@@ -56,6 +179,20 @@ class UserToken(models.Model):
     class Meta:
         db_table = 'user_token'
         ordering = ['-created_at']
+        indexes = [
+            # Expired token reaper scans by expiry
+            models.Index(fields=['expires_at'], name='user_token_expires_at_idx'),
+            # Keyset pagination of a user's tokens, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='user_token_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'device_id'], name='user_token_user_device_uniq'),
+        ]
+
+    @property
+    def device_pk(self):
+        # Same attribute as SignedToken
+        return self.device_id_id
 
     @staticmethod
     def get_expiry():
@@ -69,23 +206,189 @@ class UserToken(models.Model):
     def has_expired(self):
         return self.expires_at < now()
     
+    @staticmethod
+    def make_key(user, device, salt=''):
+        user_data = f"{user.email}{user.id}{device.device_id}{salt}"
+        return hashlib.sha1(user_data.encode('utf-8')).hexdigest()[:40]
+
+    def rotate(self, user, device):
+        # Create new token if the token is expired
+        old_key = self.key
+        self.expires_at = self.get_expiry()
+        self.key = self.make_key(user, device, salt=now())
+        return old_key
+
     @classmethod
     def get_or_create(cls, user, device):
-        import hashlib
-        user_data = f"{user.email}{user.id}{device.device_id}"
-        key = hashlib.sha1(user_data.encode('utf-8')).hexdigest()[:40]
         token, created = cls.objects.get_or_create(
             user=user,
             device_id=device,
             defaults={
-                'key': key,
+                'key': cls.make_key(user, device),
                 'expires_at': cls.get_expiry(),
             }
         )
-        # Create new token if the token is expired
         if not created and token.has_expired():
-            token.expires_at = cls.get_expiry()
-            token.key = hashlib.sha1(f"{user_data}{now()}".encode('utf-8')).hexdigest()[:40]
+            token_cache.invalidate(token.rotate(user, device))
             token.save()
             
-        return token, created
\ No newline at end of file
+        return token, created
+
+    @classmethod
+    async def aget_or_create(cls, user, device):
+        token, created = await cls.objects.aget_or_create(
+            user=user,
+            device_id=device,
+            defaults={
+                'key': cls.make_key(user, device),
+                'expires_at': cls.get_expiry(),
+            }
+        )
+        if not created and token.has_expired():
+            await token_cache.ainvalidate(token.rotate(user, device))
+            await token.asave()
+
+        return token, created
+
+    @classmethod
+    def upsert(cls, user, device, using=None):
+        """
+        Token of ``user`` on ``device`` in one ``INSERT ... ON CONFLICT`` statement.
+
+        An unexpired token is kept as is, a missing one is created and an
+        expired one gets a new key and expiry, like ``get_or_create``. Cache
+        entries never outlive ``expires_at``, so a replaced key needs no
+        invalidation.
+        """
+        using = using or router.db_for_write(cls)
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        fields = [cls._meta.get_field(name) for name in ('user', 'device_id', 'key', 'created_at', 'expires_at')]
+        expires_at = cls._meta.get_field('expires_at')
+        current = now()
+        token = cls(
+            user=user,
+            device_id=device,
+            key=cls.make_key(user, device, salt=current),
+            expires_at=cls.get_expiry(),
+        )
+        expired = f"{table}.{qn(expires_at.column)} IS NULL OR {table}.{qn(expires_at.column)} < %s"
+        sql = (
+            f"INSERT INTO {table} ({', '.join(qn(f.column) for f in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({qn(fields[0].column)}, {qn(fields[1].column)}) DO UPDATE SET "
+            f"{qn('key')} = CASE WHEN {expired} THEN EXCLUDED.{qn('key')} ELSE {table}.{qn('key')} END, "
+            f"{qn(expires_at.column)} = CASE WHEN {expired} "
+            f"THEN EXCLUDED.{qn(expires_at.column)} ELSE {table}.{qn(expires_at.column)} END "
+            f"RETURNING {', '.join(qn(f.column) for f in [cls._meta.pk, *fields])}"
+        )
+        params = [f.get_db_prep_save(f.pre_save(token, add=True), connection) for f in fields]
+        params += [expires_at.get_db_prep_save(current, connection)] * 2
+        # raw() applies the backend's column converters to the returned row
+        token = next(iter(cls.objects.raw(sql, params, using=using)))
+        token.user = user
+        token.device_id = device
+        return token
+
+    @classmethod
+    def delete_for(cls, user, devices=None, exclude_device=None, using=None):
+        """
+        Delete the tokens of ``user`` on the ``devices`` pks, or on every device
+        but ``exclude_device``, in one statement. Returns the deleted keys.
+        """
+        queryset = cls.objects.using(using or router.db_for_write(cls)).filter(user=user)
+        if devices is not None:
+            queryset = queryset.filter(device_id__in=devices)
+        if exclude_device is not None:
+            queryset = queryset.exclude(device_id=exclude_device)
+        return cls.delete_returning_keys(queryset)
+
+    @classmethod
+    def delete_returning_keys(cls, queryset):
+        """
+        Delete the tokens in ``queryset`` with a single ``DELETE ... RETURNING``
+        on PostgreSQL and return their keys, for cache invalidation.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=queryset.db):
+                keys = list(queryset.values_list('key', flat=True))
+                queryset.delete()
+            return keys
+
+        qn = connection.ops.quote_name
+        subquery, params = queryset.order_by().values('pk').query.sql_with_params()
+        sql = (
+            f"DELETE FROM {qn(cls._meta.db_table)} WHERE {qn(cls._meta.pk.column)} IN ({subquery}) "
+            f"RETURNING {qn('key')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [key for key, in cursor.fetchall()]
+
+
+class UserTokenRevocation(models.Model):
+    """
+    Signed tokens of ``device`` issued before its ``token_generation`` became
+    ``generation`` are no longer accepted.
+
+    Generations come from the database, so no host's clock takes part in the
+    check. ``revoked_at`` is the database time too, for incremental refreshes
+    and cleanup.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_revocations')
+    device = models.ForeignKey(UserDevice, on_delete=models.CASCADE, null=True, related_name='token_revocations')
+    generation = models.PositiveIntegerField()
+    revoked_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        db_table = 'user_token_revocation'
+        ordering = ['-revoked_at']
+        indexes = [
+            # Revocation list refreshes read recent rows only
+            models.Index(fields=['revoked_at'], name='user_token_revoked_at_idx'),
+        ]
+
+    @classmethod
+    def revoke(cls, user_id, devices=None, exclude_device=None, using=None):
+        """
+        Bump the token generation of the ``devices`` pks of ``user_id``, or of
+        every device but ``exclude_device``, and record a revocation for each.
+
+        A single ``WITH ... UPDATE ... RETURNING`` statement on PostgreSQL,
+        one transaction elsewhere. Returns the revocation rows.
+        """
+        using = using or router.db_for_write(cls)
+        queryset = UserDevice.objects.using(using).filter(user_id=user_id)
+        if devices is not None:
+            queryset = queryset.filter(pk__in=devices)
+        if exclude_device is not None:
+            queryset = queryset.exclude(pk=exclude_device)
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            with transaction.atomic(using=using):
+                pks = list(queryset.values_list('pk', flat=True))
+                UserDevice.objects.using(using).filter(pk__in=pks).update(
+                    token_generation=models.F('token_generation') + 1
+                )
+                bumped = UserDevice.objects.using(using).filter(pk__in=pks).values_list('pk', 'token_generation')
+                return cls.objects.using(using).bulk_create([
+                    cls(user_id=user_id, device_id=pk, generation=generation) for pk, generation in bumped
+                ])
+
+        qn = connection.ops.quote_name
+        device_table = qn(UserDevice._meta.db_table)
+        device_pk = qn(UserDevice._meta.pk.column)
+        generation = qn(UserDevice._meta.get_field('token_generation').column)
+        columns = [cls._meta.get_field(name).column for name in ('user', 'device', 'generation')]
+        subquery, params = queryset.order_by().values('pk').query.sql_with_params()
+        sql = (
+            f"WITH bumped AS (UPDATE {device_table} SET {generation} = {generation} + 1 "
+            f"WHERE {device_pk} IN ({subquery}) RETURNING {device_pk}, {generation}) "
+            f"INSERT INTO {qn(cls._meta.db_table)} ({', '.join(qn(column) for column in columns)}) "
+            f"SELECT %s, {device_pk}, {generation} FROM bumped "
+            f"RETURNING {', '.join(qn(f.column) for f in cls._meta.concrete_fields)}"
+        )
+        # raw() applies the backend's column converters to the returned rows
+        return list(cls.objects.raw(sql, [*params, user_id], using=using))
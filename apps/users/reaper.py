@@ -0,0 +1,136 @@
+"""
+Batched deletion of expired rows in ``user_token``.
+
+Revocations older than the signed token lifetime are dropped on each run too.
+
+Each batch deletes the oldest expired tokens (walking the ``expires_at``
+index) in its own short statement, followed by a pause so replicas and
+autovacuum can keep up.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+
+from .models import UserToken, UserTokenRevocation
+from .tokens import LIFETIME
+
+logger = logging.getLogger("apps")
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'SLEEP': 0.1,
+    'MAX_BATCHES': None,
+    # Seconds between runs of the in-process reaper, 0 disables it
+    'INTERVAL': 0,
+}
+
+# pg_try_advisory_lock key, one reaper per database across all processes
+ADVISORY_LOCK_KEY = 0x7573725f746f6b
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_REAPER', {})}
+
+
+def reap_expired_tokens(batch_size=None, sleep=None, max_batches=None):
+    """
+    Delete expired tokens in batches of ``batch_size``.
+
+    Returns the number of deleted rows, batches and the runtime in seconds.
+    ``deleted`` is ``None`` when another process holds the reaper lock.
+    """
+    options = get_options()
+    batch_size = batch_size or options['BATCH_SIZE']
+    sleep = options['SLEEP'] if sleep is None else sleep
+    max_batches = max_batches or options['MAX_BATCHES']
+
+    started = time.monotonic()
+    if not _acquire_lock():
+        return {'deleted': None, 'batches': 0, 'revocations': 0, 'elapsed': 0.0}
+
+    deleted = batches = revocations = 0
+    try:
+        cutoff = now()
+        while max_batches is None or batches < max_batches:
+            expired = (
+                UserToken.objects
+                .filter(expires_at__lt=cutoff)
+                .order_by('expires_at')
+                .values('pk')[:batch_size]
+            )
+            # Single DELETE ... WHERE id IN (SELECT ... LIMIT n), no per-row collection
+            count, _ = UserToken.objects.filter(pk__in=expired).delete()
+            deleted += count
+            batches += 1
+            if count < batch_size:
+                break
+            if sleep:
+                time.sleep(sleep)
+        # Every token these cover has expired, the table stays small
+        revocations, _ = UserTokenRevocation.objects.filter(revoked_at__lt=cutoff - LIFETIME).delete()
+    finally:
+        _release_lock()
+
+    result = {
+        'deleted': deleted,
+        'batches': batches,
+        'revocations': revocations,
+        'elapsed': time.monotonic() - started,
+    }
+    logger.info("Reaped %(deleted)d expired tokens in %(batches)d batches (%(elapsed).2fs)", result)
+    return result
+
+
+def _acquire_lock():
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [ADVISORY_LOCK_KEY])
+        return cursor.fetchone()[0]
+
+
+def _release_lock():
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [ADVISORY_LOCK_KEY])
+
+
+class TokenReaperThread(threading.Thread):
+    """
+    Runs ``reap_expired_tokens`` every ``TOKEN_REAPER['INTERVAL']`` seconds.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name='token-reaper', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                reap_expired_tokens()
+            except Exception:
+                logger.exception("Expired token reaper failed")
+            finally:
+                connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_reaper_thread = None
+
+
+def start_reaper_thread():
+    global _reaper_thread
+    interval = get_options()['INTERVAL']
+    if not interval or _reaper_thread is not None:
+        return None
+    _reaper_thread = TokenReaperThread(interval)
+    _reaper_thread.start()
+    return _reaper_thread
@@ -1,5 +1,12 @@
+import hashlib
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
 from rest_framework import serializers, status
+from tzlocal import get_localzone
 
 from common.exception import (
     CustomException,
@@ -7,18 +14,39 @@ from common.exception import (
     LoginErrorMessages,
     UserValidationMessages,
 )
-from common.utils import (
-    is_password_str_num_included,
-    is_valid_email_format,
-    is_valid_password_length,
-    is_valid_password_strength,
-)
+from common.timing import TimedValidationMixin
+from common.validation import credential_rules
 
-from .models import User
+from .cache import token_cache
+from .hashing import hashing_pool
+from .models import User, UserDevice
 from .models import UserToken as Token
+from .tokens import issue_token
+
+# Columns a login changes
+LOGIN_FIELDS = ['token', 'last_login', 'updated_at']
+# Token-specific payload, clients keep it but revalidate with If-None-Match
+CHECK_TOKEN_CACHE_CONTROL = 'private, no-cache'
+
+
+class CredentialRulesMixin:
+    """
+    Email format and password rules shared by the serializers that set them.
+    """
+    def validate_email(self, value):
+        message = credential_rules.email_error(value)
+        if message:
+            raise CustomValidationError(message)
+        return value
 
+    def validate_password(self, password):
+        message = credential_rules.password_error(password)
+        if message:
+            raise CustomValidationError(message)
+        return password
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(CredentialRulesMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'name', 'password', 'email', 'device_id', 'token', 'time_zone', 'created_at', 'updated_at')
@@ -26,6 +54,15 @@ class UserSerializer(serializers.ModelSerializer):
             'password': {'write_only': True}
         }
 
+    @classmethod
+    def etag(cls, user, token_key):
+        """
+        Strong ETag of the check-token payload for ``user``, without serializing it.
+        """
+        # updated_at moves on every save, the fields cover changes to the payload itself
+        value = f"{','.join(cls.Meta.fields)}:{user.pk}:{user.updated_at.isoformat()}:{token_key}"
+        return f'"{hashlib.sha1(value.encode()).hexdigest()}"'
+
     def validate(self, attrs):
         if not attrs.get('email'):
             raise CustomValidationError(UserValidationMessages.EMAIL_REQUIRED)
@@ -37,25 +74,38 @@ class UserSerializer(serializers.ModelSerializer):
         return attrs
     
     def validate_email(self, value):
-        if not is_valid_email_format(value):
-            raise CustomValidationError(UserValidationMessages.EMAIL_FORMAT_INVALID)
+        value = super().validate_email(value)
         if User.objects.filter(email=value).exists():
             raise CustomException(message=UserValidationMessages.EMAIL_ALREADY_EXISTS, status_code=status.HTTP_409_CONFLICT)
 
         return value
-    
-    def validate_password(self, password):
-        if not is_password_str_num_included(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_STR_NUM_REQUIRED)
-        if not is_valid_password_length(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_LENGTH_INVALID)
-        if not is_valid_password_strength(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_STRENGTH_INVALID)
 
-        return password
 
+class UserDeviceSerializer(serializers.ModelSerializer):
+    current = serializers.SerializerMethodField()
 
-class LoginSerializer(serializers.Serializer):
+    class Meta:
+        model = UserDevice
+        fields = ('id', 'device_id', 'device_os', 'device_os_version', 'created_at', 'current')
+
+    def get_current(self, device):
+        return device.pk == self.context['request'].auth.device_pk
+
+
+class UserTokenSerializer(serializers.ModelSerializer):
+    # Keys are credentials, only the device and lifetime are listed
+    device = UserDeviceSerializer(source='device_id')
+    current = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Token
+        fields = ('id', 'device', 'created_at', 'expires_at', 'current')
+
+    def get_current(self, token):
+        return token.key == self.context['request'].auth.key
+
+
+class LoginSerializer(TimedValidationMixin, serializers.Serializer):
     email = serializers.CharField(write_only=True, required=False, allow_null=True)
     password = serializers.CharField(write_only=True, required=False, allow_null=True)
     device_id = serializers.CharField(write_only=True, required=False, allow_null=True)
@@ -70,19 +120,77 @@ class LoginSerializer(serializers.Serializer):
             raise CustomValidationError(UserValidationMessages.PASSWORD_REQUIRED)
         if not device_id:
             raise CustomValidationError(UserValidationMessages.DEVICE_ID_REQUIRED)
+        # Async views look the user up themselves with the async ORM
+        if self.context.get('defer_db_checks'):
+            return attrs
         
+        attrs['user'] = self.authenticate_user(email, password)
+        return attrs
+
+    @staticmethod
+    def authenticate_user(email, password):
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             raise CustomException(LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD, status_code=401)
-        if not user.check_password(password):
+        if not hashing_pool.check_password(password, user.password):
             raise CustomException(LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD, status_code=401)
-        
-        attrs['user'] = user
-        return attrs
+        hashing_pool.schedule_rehash(user, password)
 
-        
-class SignUpSerializer(serializers.Serializer):
+        return user
+
+    @staticmethod
+    async def aauthenticate_user(email, password):
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            raise CustomException(LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD, status_code=401)
+        if not await hashing_pool.acheck_password(password, user.password):
+            raise CustomException(LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD, status_code=401)
+        hashing_pool.schedule_rehash(user, password)
+
+        return user
+
+    @staticmethod
+    def login_time(user):
+        """
+        Current time in the user's time zone, the server's when unset or unknown.
+        """
+        if user.time_zone:
+            try:
+                return datetime.now(ZoneInfo(user.time_zone))
+            except (ZoneInfoNotFoundError, ValueError):
+                pass
+        return datetime.now(get_localzone())
+
+    @staticmethod
+    def record_login(user, device_id, last_login):
+        """
+        Upsert the device and token and update the user, in one transaction.
+        """
+        with transaction.atomic():
+            device = UserDevice.upsert(user, device_id)
+            token = issue_token(user, device)
+            # Cached snapshots of both tokens hold a user row that is about to change
+            token_cache.invalidate(user.token, token.key)
+            user.token = token.key
+            user.last_login = last_login
+            user.save(update_fields=LOGIN_FIELDS)
+        return token
+
+    @classmethod
+    async def arecord_login(cls, user, device_id, last_login):
+        """
+        ``record_login`` on a worker thread.
+
+        The upserts, token cache invalidation and user update share one
+        transaction, which the async ORM cannot hold, so every async login
+        takes an executor thread for this step.
+        """
+        return await sync_to_async(cls.record_login)(user, device_id, last_login)
+
+
+class SignUpSerializer(CredentialRulesMixin, TimedValidationMixin, serializers.Serializer):
     email = serializers.EmailField(required=False)
     password = serializers.CharField(write_only=True, required=False)
     name = serializers.CharField(required=False)
@@ -99,21 +207,59 @@ class SignUpSerializer(serializers.Serializer):
             raise CustomValidationError(UserValidationMessages.NAME_REQUIRED)
         
         return value
-    
-    def validate_email(self, value):
-        if not is_valid_email_format(value):
-            raise CustomValidationError(UserValidationMessages.EMAIL_FORMAT_INVALID)
-        if User.objects.filter(email=value).exists():
-            raise CustomException(message=UserValidationMessages.EMAIL_ALREADY_EXISTS, status_code=status.HTTP_409_CONFLICT)
 
-        return value
-    
-    def validate_password(self, password):
-        if not is_password_str_num_included(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_STR_NUM_REQUIRED)
-        if not is_valid_password_length(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_LENGTH_INVALID)
-        if not is_valid_password_strength(password):
-            raise CustomValidationError(UserValidationMessages.PASSWORD_STRENGTH_INVALID)
+    @staticmethod
+    def build_user(data, password):
+        user = User(
+            email=data.get('email'),
+            password=password,
+            name=data.get('name'),
+            device_id=data.get('device_id'),
+        )
+        device = UserDevice(
+            device_id=data.get('device_id'),
+            device_os=data.get('device_os'),
+            device_os_version=data.get('device_os_version'),
+        )
+        return user, device
 
-        return password
+    @staticmethod
+    def duplicate_error(error):
+        # Constraint name on PostgreSQL, the message names the column elsewhere
+        diag = getattr(error.__cause__, 'diag', None)
+        detail = getattr(diag, 'constraint_name', None) or str(error)
+        message = (
+            UserValidationMessages.DEVICE_ID_ALREADY_EXISTS if 'device_id' in detail
+            else UserValidationMessages.EMAIL_ALREADY_EXISTS
+        )
+        return CustomException(message=message, status_code=status.HTTP_409_CONFLICT)
+
+    @classmethod
+    def create_user(cls, data):
+        """
+        Create the user and its device in one statement, 409 on a duplicate email or device id.
+        """
+        user, device = cls.build_user(data, hashing_pool.make_password(data.get('password')))
+        try:
+            return User.insert_with_device(user, device)
+        except IntegrityError as e:
+            raise cls.duplicate_error(e)
+
+    @classmethod
+    async def acreate_user(cls, data):
+        """
+        ``create_user`` with the hash awaited on ``hashing_pool``.
+
+        The insert itself goes through ``User.ainsert_with_device``, which runs
+        on an executor thread, so each async sign-up still takes one.
+        """
+        user, device = cls.build_user(data, await hashing_pool.amake_password(data.get('password')))
+        try:
+            return await User.ainsert_with_device(user, device)
+        except IntegrityError as e:
+            raise cls.duplicate_error(e)
+
+
+class BulkImportSerializer(serializers.Serializer):
+    # Rows held in memory and inserted per transaction
+    batch_size = serializers.IntegerField(required=False, default=1000, min_value=1, max_value=10000)
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import token_cache
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_tokens(sender, instance, using, **kwargs):
+    # Cached tokens hold a snapshot of the user row, profile and admin edits must not wait out SHARED_TTL
+    token_cache.invalidate_users(instance.pk)
+    # Again once the change is visible, a concurrent request may have cached the old row meanwhile
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: token_cache.invalidate_users(instance.pk), using=using)
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from common.admin import EstimatedCountPaginator, estimate_count
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken
+from ..tokens import SignedToken, revocations
+
+
+class AdminTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(
+            email="admin@example.com",
+            password="Qwe!@#123",
+            name="Admin",
+            device_id="admin",
+            is_superuser=True,
+        )
+        cls.users = [
+            User.objects.create(
+                email=f"test{i}@example.com",
+                password="Qwe!@#123",
+                name="Test User",
+                device_id=f"test{i}",
+            )
+            for i in range(3)
+        ]
+        for user in cls.users:
+            device = UserDevice.objects.create(user=user, device_id=user.device_id)
+            UserToken.objects.create(user=user, device_id=device, key=f'token_{user.device_id}')
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        for model_name in ('user', 'userdevice', 'usertoken'):
+            url = reverse(f'admin:users_{model_name}_changelist')
+            response = self.client.get(url, {'q': 'test1@example.com'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['cl'].result_count, 1)
+            self.assertNotIn('delete_selected', response.context['cl'].model_admin.get_actions(response.wsgi_request))
+
+    def test_search_is_exact(self):
+        for model_name in ('user', 'userdevice', 'usertoken'):
+            url = reverse(f'admin:users_{model_name}_changelist')
+            self.assertEqual(self.client.get(url, {'q': 'test'}).context['cl'].result_count, 0)
+            self.assertEqual(self.client.get(url, {'q': 'test1'}).context['cl'].result_count, 1)
+
+    def test_soft_delete(self):
+        token_cache.set(UserToken.objects.select_related('user').get(key='token_test0'))
+        response = self.client.post(reverse('admin:users_user_changelist'), {
+            'action': 'soft_delete',
+            '_selected_action': [self.users[0].pk, self.users[1].pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            list(User.all_objects.filter(is_deleted=True).order_by('pk').values_list('pk', flat=True)),
+            [self.users[0].pk, self.users[1].pk],
+        )
+        self.assertEqual(list(UserToken.objects.values_list('key', flat=True)), ['token_test2'])
+        self.assertIsNone(token_cache.get('token_test0'))
+
+    def test_soft_delete_with_live_filter(self):
+        token_cache.set(UserToken.objects.select_related('user').get(key='token_test2'))
+        response = self.client.post(f"{reverse('admin:users_user_changelist')}?is_deleted__exact=0", {
+            'action': 'soft_delete',
+            '_selected_action': [self.users[2].pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(User.all_objects.get(pk=self.users[2].pk).is_deleted)
+        self.assertFalse(UserToken.objects.filter(key='token_test2').exists())
+        self.assertIsNone(token_cache.get('token_test2'))
+
+    def test_revoke_tokens(self):
+        token = UserToken.objects.get(key='token_test2')
+        with self.assertNumQueries(1):
+            keys = UserToken.delete_returning_keys(UserToken.objects.filter(pk=token.pk))
+        self.assertEqual(keys, ['token_test2'])
+
+        device = UserDevice.objects.get(device_id='test1')
+        response = self.client.post(reverse('admin:users_userdevice_changelist'), {
+            'action': 'revoke_tokens',
+            '_selected_action': [device.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(UserToken.objects.values_list('key', flat=True)), ['token_test0'])
+
+    @override_settings(USERS_TOKEN_FORMAT='signed')
+    def test_revoke_signed_tokens(self):
+        self.addCleanup(revocations.clear)
+        # check-token would sign out a key that is not user.token
+        devices = reverse('users:devices')
+        for model_name, action, user in (
+            ('userdevice', 'revoke_tokens', self.users[0]),
+            ('usertoken', 'revoke', self.users[1]),
+        ):
+            device = UserDevice.objects.get(user=user)
+            key = SignedToken.issue(user, device).key
+            auth = {'HTTP_AUTHORIZATION': f'Token {key}'}
+            self.assertEqual(self.client.get(devices, **auth).status_code, status.HTTP_200_OK)
+
+            selected = device if model_name == 'userdevice' else UserToken.objects.get(device_id=device)
+            response = self.client.post(reverse(f'admin:users_{model_name}_changelist'), {
+                'action': action,
+                '_selected_action': [selected.pk],
+            })
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(self.client.get(devices, **auth).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_estimated_count(self):
+        self.assertGreaterEqual(estimate_count(User.objects.all()), 0)
+        # Small results are counted exactly
+        self.assertEqual(EstimatedCountPaginator(User.objects.all(), 2).count, 4)
+        with mock.patch('common.admin.estimate_count', return_value=20_000_000):
+            paginator = EstimatedCountPaginator(User.objects.all(), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 20_000_000)
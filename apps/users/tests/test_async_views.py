@@ -0,0 +1,136 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework import status
+
+from common.exception import LoginErrorMessages, UserValidationMessages
+
+from .. import async_views
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken
+from ..serializers import LoginSerializer
+from ..throttling import login_throttle
+
+
+class AsyncViewsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.factory = AsyncRequestFactory()
+
+    async def post(self, view, data=None, **extra):
+        request = self.factory.post('/', data=json.dumps(data or {}), content_type='application/json', **extra)
+        return await view.as_view()(request)
+
+    async def login(self):
+        response = await self.post(
+            async_views.LoginView,
+            {'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)['token']
+
+    async def test_sign_up(self):
+        data = {
+            "email": "async@example.com",
+            "password": "Qwe!@#123",
+            "name": "Async User",
+            "device_id": "async1",
+            "device_os": "test",
+            "device_os_version": "test2",
+        }
+        response = await self.post(async_views.SignUpView, data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await UserDevice.objects.filter(user__email="async@example.com").aexists())
+
+        response = await self.post(async_views.SignUpView, data)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(json.loads(response.content)['message'], UserValidationMessages.EMAIL_ALREADY_EXISTS)
+
+    async def test_login_uses_user_time_zone(self):
+        await User.objects.filter(pk=self.user.pk).aupdate(time_zone='Asia/Seoul')
+        with mock.patch.object(LoginSerializer, 'login_time', wraps=LoginSerializer.login_time) as login_time:
+            await self.login()
+        self.assertEqual(login_time.call_args.args[0].time_zone, 'Asia/Seoul')
+
+    async def test_method_not_allowed(self):
+        for view in (async_views.LoginView, async_views.SignUpView):
+            response = await view.as_view()(self.factory.get('/'))
+            self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+            self.assertEqual(response['Allow'], 'POST, OPTIONS')
+
+    async def test_login_with_non_object_body(self):
+        for body in ('[]', '"x"', '1'):
+            request = self.factory.post('/', data=body, content_type='application/json')
+            response = await async_views.LoginView.as_view()(request)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+
+    async def test_login_with_wrong_password(self):
+        response = await self.post(
+            async_views.LoginView,
+            {'email': 'test@example.com', 'password': 'wrong_password', 'device_id': 'test1'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(response.content)['message'], LoginErrorMessages.WRONG_EMAIL_OR_PASSWORD)
+
+    @override_settings(USERS_LOGIN_THROTTLE={'LIMITS': {'email': 2}})
+    async def test_login_throttled(self):
+        await cache.aclear()
+        login_throttle.clear()
+        self.addCleanup(login_throttle.clear)
+        self.addCleanup(cache.clear)
+        # Frozen so a slow password check cannot shorten Retry-After
+        clock = mock.patch('apps.users.throttling.time.time', return_value=1_000_020.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        data = {'email': 'test@example.com', 'password': 'wrong_password', 'device_id': 'test1'}
+        for _ in range(2):
+            response = await self.post(async_views.LoginView, data)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.post(async_views.LoginView, {**data, 'password': 'Qwe!@#123'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+    async def test_check_token_not_modified(self):
+        token = await self.login()
+        headers = {'Authorization': f'Token {token}'}
+        response = await async_views.TokenCheckView.as_view()(self.factory.get('/', headers=headers))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        request = self.factory.get('/', headers={**headers, 'If-None-Match': response['ETag']})
+        response = await async_views.TokenCheckView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    async def test_check_token_and_logout(self):
+        token = await self.login()
+
+        request = self.factory.get('/', headers={'Authorization': f'Token {token}'})
+        response = await async_views.TokenCheckView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['user']['email'], 'test@example.com')
+
+        response = await self.post(async_views.LogoutView, headers={'Authorization': f'Token {token}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(await UserToken.objects.filter(key=token).aexists())
+
+        request = self.factory.get('/', headers={'Authorization': f'Token {token}'})
+        response = await async_views.TokenCheckView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_check_token_without_header(self):
+        response = await async_views.TokenCheckView.as_view()(self.factory.get('/'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(json.loads(response.content)['message'], '잘못된 접근입니다.')
@@ -0,0 +1,37 @@
+from unittest import mock
+
+import environ
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from core.configs.database import configure_pooling
+
+
+def postgres():
+    return {"ENGINE": "django.db.backends.postgresql", "NAME": "listener"}
+
+
+class ConfigurePoolingTestCase(SimpleTestCase):
+    def configure(self, database, **env):
+        with mock.patch.dict('os.environ', env):
+            return configure_pooling(database, environ.Env())
+
+    def test_persistent_by_default(self):
+        database = self.configure(postgres(), DJANGO_SERVER_INTERFACE='wsgi')
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+    def test_persistent_falls_back_under_asgi(self):
+        with self.assertWarns(UserWarning):
+            database = self.configure(postgres(), DJANGO_SERVER_INTERFACE='asgi', DB_POOL_MODE='persistent')
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+
+    def test_pool_options(self):
+        with mock.patch.dict('sys.modules', {'psycopg_pool': mock.Mock()}):
+            database = self.configure(postgres(), DB_POOL_MODE='pool', DB_POOL_MAX_SIZE='20')
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 20)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.configure(postgres(), DB_POOL_MODE='pgbouncer')
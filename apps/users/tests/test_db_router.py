@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, OperationalError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from common.db_router import (
+    PrimaryReplicaRouter,
+    ReplicaHealth,
+    ReplicaRoutingMiddleware,
+    pin_client,
+    replica_health,
+)
+
+from ..models import User
+
+lag_probe = ReplicaHealth.lag
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_0'],
+    REPLICA_ROUTING={'PIN_SECONDS': 5, 'MAX_LAG': 2, 'LAG_CHECK_INTERVAL': 60},
+)
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+        patcher = mock.patch.object(ReplicaHealth, 'lag', return_value=0.1)
+        self.lag = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def route(self, request, write=False):
+        """
+        Database a read inside ``request`` goes to, after an optional write.
+        """
+        def view(request):
+            if write:
+                self.router.db_for_write(User)
+            return self.router.db_for_read(User)
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertEqual(self.route(self.factory.get('/')), 'replica_0')
+
+    def test_unsafe_request_reads_from_primary(self):
+        self.assertEqual(self.route(self.factory.post('/')), DEFAULT_DB_ALIAS)
+
+    def test_write_pins_request_and_client(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token written')
+        self.assertEqual(self.route(request, write=True), DEFAULT_DB_ALIAS)
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token written')
+        self.assertEqual(self.route(request), DEFAULT_DB_ALIAS)
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token other')
+        self.assertEqual(self.route(request), 'replica_0')
+
+    def test_pinned_client_reads_from_primary(self):
+        pin_client('fresh')
+        request = self.factory.get('/', HTTP_AUTHORIZATION='Token fresh')
+        self.assertEqual(self.route(request), DEFAULT_DB_ALIAS)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.lag.return_value = 30
+        self.assertEqual(self.route(self.factory.get('/')), DEFAULT_DB_ALIAS)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        self.lag.return_value = None
+        self.assertEqual(self.route(self.factory.get('/')), DEFAULT_DB_ALIAS)
+
+    def route_with_probe(self, connection):
+        """
+        Database a safe request reads from, with the real lag probe on ``connection``.
+        """
+        self.lag.side_effect = lag_probe
+        with mock.patch('common.db_router.connections', {'replica_0': connection}):
+            return self.route(self.factory.get('/'))
+
+    @override_settings(REPLICA_ROUTING={'LAG_CHECK_INTERVAL': 60, 'PROBE_TIMEOUT': 0.5})
+    def test_probe_timeout_falls_back_to_primary(self):
+        connection = mock.MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.execute.side_effect = [None, OperationalError("canceling statement due to statement timeout")]
+        self.assertEqual(self.route_with_probe(connection), DEFAULT_DB_ALIAS)
+        cursor.execute.assert_any_call("SET statement_timeout = %s", [500])
+        connection.close.assert_called_once_with()
+
+    def test_probe_connect_error_falls_back_to_primary(self):
+        connection = mock.MagicMock()
+        connection.cursor.side_effect = OperationalError("connection to server timed out")
+        self.assertEqual(self.route_with_probe(connection), DEFAULT_DB_ALIAS)
+        connection.close.assert_called_once_with()
+
+    def test_lag_checked_once_per_interval(self):
+        for _ in range(3):
+            self.route(self.factory.get('/'))
+        self.assertEqual(self.lag.call_count, 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertEqual(self.route(self.factory.get('/')), DEFAULT_DB_ALIAS)
+        self.lag.assert_not_called()
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'users'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'users'))
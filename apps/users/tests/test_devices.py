@@ -0,0 +1,147 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework import status
+
+from common.query_budget import QueryBudgetTestMixin
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken, UserTokenRevocation
+from ..tokens import SignedToken, revocations
+from ..views import DeviceListView, RevokeOtherDevicesView, TokenListView
+
+
+class DeviceTestCase(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="device0",
+        )
+        cls.other = User.objects.create(
+            email="other@example.com",
+            password="Qwe!@#123",
+            name="Other User",
+            device_id="other",
+        )
+        cls.devices = [UserDevice.objects.create(user=cls.user, device_id=f"device{i}") for i in range(5)]
+        # Same creation time for all, pages must break ties on id
+        UserDevice.objects.filter(user=cls.user).update(created_at=now())
+        for i, device in enumerate(cls.devices):
+            UserToken.objects.create(user=cls.user, device_id=device, key=f'token{i}')
+        UserToken.objects.create(
+            user=cls.other,
+            device_id=UserDevice.objects.create(user=cls.other, device_id="other"),
+            key='other_token',
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.auth = {'HTTP_AUTHORIZATION': 'Token token0'}
+
+    def pages(self, url, page_size):
+        ids = []
+        # Later pages keep page_size in the next link
+        url = f'{url}?page_size={page_size}'
+        while url:
+            response = self.client.get(url, **self.auth)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def test_list_devices(self):
+        ids = self.pages(reverse('users:devices'), page_size=2)
+        self.assertEqual(ids, sorted((device.pk for device in self.devices), reverse=True))
+
+        response = self.client.get(reverse('users:devices'), **self.auth)
+        current = [row['device_id'] for row in response.json()['results'] if row['current']]
+        self.assertEqual(current, ['device0'])
+
+    def test_list_devices_query_budget(self):
+        with self.assertQueryBudget(DeviceListView):
+            self.client.get(reverse('users:devices'), {'page_size': 2}, **self.auth)
+
+    def test_list_tokens(self):
+        UserToken.objects.filter(key='token4').update(expires_at=now() - timedelta(days=1))
+        ids = self.pages(reverse('users:tokens'), page_size=3)
+        expected = UserToken.objects.filter(user=self.user, expires_at__gt=now()).order_by('-created_at', '-id')
+        self.assertEqual(ids, [token.pk for token in expected])
+
+        response = self.client.get(reverse('users:tokens'), **self.auth)
+        row = response.json()['results'][-1]
+        self.assertNotIn('key', row)
+        self.assertEqual(row['device']['device_id'], 'device0')
+        self.assertTrue(row['current'])
+        with self.assertQueryBudget(TokenListView):
+            self.client.get(reverse('users:tokens'), **self.auth)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('users:devices'), {'cursor': 'not-a-cursor'}, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoke_device(self):
+        # Cached, revocation has to drop it
+        self.client.get(reverse('users:devices'), HTTP_AUTHORIZATION='Token token1')
+
+        response = self.client.delete(reverse('users:device', args=[self.devices[1].pk]), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['revoked'], 1)
+        self.assertFalse(UserToken.objects.filter(key='token1').exists())
+        response = self.client.get(reverse('users:devices'), HTTP_AUTHORIZATION='Token token1')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_unknown_device(self):
+        other_device = UserDevice.objects.get(user=self.other)
+        for pk in (other_device.pk, self.devices[0].pk):
+            response = self.client.delete(reverse('users:device', args=[pk]), **self.auth)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(UserToken.objects.count(), 6)
+
+    def test_revoke_other_devices(self):
+        with self.assertQueryBudget(RevokeOtherDevicesView):
+            response = self.client.post(reverse('users:revoke-other-devices'), **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['revoked'], 4)
+        self.assertEqual(
+            sorted(UserToken.objects.values_list('key', flat=True)), ['other_token', 'token0'],
+        )
+        self.assertEqual(UserDevice.objects.filter(user=self.user).count(), 5)
+
+
+@override_settings(USERS_TOKEN_FORMAT='signed')
+class SignedDeviceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="device0",
+        )
+        cls.devices = [UserDevice.objects.create(user=cls.user, device_id=f"device{i}") for i in range(3)]
+
+    def setUp(self):
+        token_cache.clear()
+        revocations.clear()
+        self.addCleanup(token_cache.clear)
+        self.addCleanup(revocations.clear)
+        self.keys = [SignedToken.issue(self.user, device).key for device in self.devices]
+
+    def list_devices(self, key):
+        return self.client.get(reverse('users:devices'), HTTP_AUTHORIZATION=f'Token {key}').status_code
+
+    def test_revoke_other_devices(self):
+        response = self.client.post(reverse('users:revoke-other-devices'), HTTP_AUTHORIZATION=f'Token {self.keys[0]}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['revoked'], 2)
+        self.assertEqual(
+            sorted(UserTokenRevocation.objects.values_list('device_id', flat=True)),
+            [self.devices[1].pk, self.devices[2].pk],
+        )
+        self.assertEqual(self.list_devices(self.keys[1]), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.list_devices(self.keys[2]), status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.list_devices(self.keys[0]), status.HTTP_200_OK)
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, override_settings
+
+from ..hashers import CalibratedPBKDF2PasswordHasher, calibrate, load_calibration, needs_rehash
+
+
+class CalibratedHasherTestCase(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(load_calibration.cache_clear)
+
+    def write_calibration(self, iterations):
+        with open(self.path, 'w') as f:
+            json.dump({'hashers': {'pbkdf2_sha256': {'iterations': iterations}}}, f)
+        load_calibration.cache_clear()
+
+    def test_calibrated_iterations_trigger_rehash(self):
+        with override_settings(PASSWORD_HASHER_CALIBRATION_FILE=self.path):
+            self.write_calibration(1000)
+            encoded = make_password('Qwe!@#123')
+            self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+            self.assertFalse(needs_rehash(encoded))
+
+            self.write_calibration(2000)
+            self.assertEqual(CalibratedPBKDF2PasswordHasher().iterations, 2000)
+            self.assertTrue(needs_rehash(encoded))
+
+    def test_calibrate_scales_iterations(self):
+        params, latency = calibrate('pbkdf2_sha256', target=0.005, samples=3, minimum=1000)
+        self.assertGreaterEqual(params['iterations'], 1000)
+        self.assertGreater(latency, 0)
@@ -0,0 +1,93 @@
+import threading
+
+from django.contrib.auth.hashers import check_password
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+
+from ..hashing import HashingPool, HashingPoolFull
+
+
+@override_settings(PASSWORD_HASHING_POOL={'EXECUTOR': 'thread', 'WORKERS': 1, 'QUEUE_SIZE': 2, 'TIMEOUT': 10})
+class HashingPoolTestCase(SimpleTestCase):
+    def setUp(self):
+        self.pool = HashingPool()
+        self.addCleanup(self.pool.shutdown)
+
+    def test_make_and_check_password(self):
+        encoded = self.pool.make_password('Qwe!@#123')
+        self.assertTrue(check_password('Qwe!@#123', encoded))
+        self.assertTrue(self.pool.check_password('Qwe!@#123', encoded))
+        self.assertFalse(self.pool.check_password('wrong_password', encoded))
+        self.assertEqual(self.pool.stats()['completed'], 3)
+
+    def test_map_shares_the_queue(self):
+        self.assertEqual(list(self.pool.map(len, ['a', 'bb', 'ccc', 'dddd'])), [1, 2, 3, 4])
+        self.assertEqual(self.pool.stats()['completed'], 4)
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+
+    async def test_async_check_password(self):
+        encoded = await self.pool.amake_password('Qwe!@#123')
+        self.assertTrue(await self.pool.acheck_password('Qwe!@#123', encoded))
+
+    def test_rejects_when_queue_is_full(self):
+        release = threading.Event()
+        running = [self.pool.submit(release.wait) for _ in range(2)]
+
+        with self.assertRaises(HashingPoolFull):
+            self.pool.submit(release.wait)
+        self.assertEqual(self.pool.stats()['rejected'], 1)
+        self.assertEqual(self.pool.stats()['queue_depth'], 1)
+
+        release.set()
+        for future in running:
+            future.result()
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+
+    def test_queue_bound_survives_shutdown(self):
+        release_old, release_new = threading.Event(), threading.Event()
+        self.addCleanup(release_new.set)
+        old = [self.pool.submit(release_old.wait) for _ in range(2)]
+        self.pool.shutdown(wait=False)
+
+        new = [self.pool.submit(release_new.wait) for _ in range(2)]
+        # Calls of the old executor finishing must not free slots of the new one
+        release_old.set()
+        for future in old:
+            future.result()
+        with self.assertRaises(HashingPoolFull):
+            self.pool.submit(release_new.wait)
+
+        release_new.set()
+        for future in new:
+            future.result()
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+
+
+@override_settings(PASSWORD_HASHING_POOL={'EXECUTOR': 'thread', 'WORKERS': 1, 'QUEUE_SIZE': 2, 'TIMEOUT': 0.05})
+class HashingPoolTimeoutTestCase(SimpleTestCase):
+    def setUp(self):
+        self.pool = HashingPool()
+        self.addCleanup(self.pool.shutdown)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def test_timeout_is_503_and_frees_the_slot(self):
+        with self.assertRaises(HashingPoolFull) as cm:
+            self.pool.run(self.release.wait)
+        self.assertEqual(cm.exception.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        # Still running, but no longer holds a slot
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+        self.assertEqual(self.pool.stats()['timed_out'], 1)
+        # Queued behind the running call, dropped on timeout
+        with self.assertRaises(HashingPoolFull):
+            self.pool.run(self.release.wait)
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+
+        self.release.set()
+        self.assertEqual(self.pool.run(len, 'Qwe!@#123'), 9)
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
+
+    async def test_async_timeout(self):
+        with self.assertRaises(HashingPoolFull):
+            await self.pool.arun(self.release.wait)
+        self.assertEqual(self.pool.stats()['in_flight'], 0)
@@ -0,0 +1,125 @@
+import io
+import json
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from common.exception import ImportErrorMessages, UserValidationMessages
+
+from ..cache import token_cache
+from ..importer import UserImporter, iter_records
+from ..models import User, UserDevice, UserToken
+
+
+def jsonl(*records):
+    return '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records) + '\n'
+
+
+class UserImporterTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="existing@example.com",
+            password="Qwe!@#123",
+            name="Existing User",
+            device_id="existing",
+        )
+
+    def import_lines(self, text, fmt='jsonl', **kwargs):
+        importer = UserImporter(batch_size=2, executor='pool', **kwargs)
+        return importer.run(iter_records(io.StringIO(text), fmt))
+
+    def test_import_jsonl(self):
+        report = self.import_lines(jsonl(
+            {'email': 'new1@example.com', 'password': 'Qwe!@#123', 'name': 'New 1', 'device_id': 'd1', 'device_os': 'ios'},
+            {'email': 'new2@example.com', 'password': 'qwerty', 'name': 'New 2', 'device_id': 'd2'},
+            {'email': 'new1@example.com', 'password': 'Qwe!@#123', 'name': 'New 1', 'device_id': 'd3'},
+            {'email': 'existing@example.com', 'password': 'Qwe!@#123', 'name': 'Existing', 'device_id': 'd4'},
+            'not json',
+            {'email': 'new3@example.com', 'password': 'Qwe!@#123', 'name': 'New 3', 'device_id': 'd5'},
+        ))
+
+        self.assertEqual(report.summary()['processed'], 6)
+        self.assertEqual(report.created, 2)
+        self.assertEqual(
+            [(rejection['line'], rejection['reason']) for rejection in report.rejections],
+            [
+                (2, UserValidationMessages.PASSWORD_STR_NUM_REQUIRED),
+                (3, UserValidationMessages.EMAIL_ALREADY_EXISTS),
+                (4, UserValidationMessages.EMAIL_ALREADY_EXISTS),
+                (5, ImportErrorMessages.INVALID_ROW),
+            ],
+        )
+        user = User.objects.get(email='new1@example.com')
+        self.assertTrue(user.check_password('Qwe!@#123'))
+        self.assertEqual(UserDevice.objects.get(user=user).device_os, 'ios')
+        self.assertTrue(User.objects.filter(email='new3@example.com').exists())
+
+    def test_import_csv_dry_run(self):
+        report = self.import_lines(
+            'email,password,name,device_id\nnew@example.com,Qwe!@#123,New,d1\n',
+            fmt='csv',
+            dry_run=True,
+        )
+        self.assertEqual(report.created, 1)
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+    def test_rejections_are_bounded_and_streamed(self):
+        stream = io.StringIO()
+        report = self.import_lines(
+            jsonl(*['not json'] * 5), max_rejections=2, rejection_stream=stream,
+        )
+        self.assertEqual(report.summary()['rejected'], 5)
+        self.assertEqual([rejection['line'] for rejection in report.rejections], [1, 2])
+        self.assertEqual([json.loads(line)['line'] for line in stream.getvalue().splitlines()], [1, 2, 3, 4, 5])
+
+    def test_duplicates_across_batches(self):
+        lines = jsonl(
+            {'email': 'new1@example.com', 'password': 'Qwe!@#123', 'name': 'New 1', 'device_id': 'd1'},
+            {'email': 'new2@example.com', 'password': 'Qwe!@#123', 'name': 'New 2', 'device_id': 'd2'},
+            {'email': 'new3@example.com', 'password': 'Qwe!@#123', 'name': 'New 3', 'device_id': 'd1'},
+        )
+        for dry_run in (True, False):
+            report = self.import_lines(lines, dry_run=dry_run)
+            self.assertEqual(report.created, 2)
+            self.assertEqual(
+                [(rejection['line'], rejection['reason']) for rejection in report.rejections],
+                [(3, UserValidationMessages.DEVICE_ID_ALREADY_EXISTS)],
+            )
+
+    def test_bulk_import_endpoint_requires_superuser(self):
+        device = UserDevice.objects.create(user=self.user, device_id=self.user.device_id)
+        UserToken.objects.create(user=self.user, device_id=device, key='import_token')
+        upload = SimpleUploadedFile('users.jsonl', jsonl(
+            {'email': 'new@example.com', 'password': 'Qwe!@#123', 'name': 'New', 'device_id': 'd1'},
+        ).encode())
+        url = reverse('users:bulk-import')
+
+        response = self.client.post(url, {'file': upload}, HTTP_AUTHORIZATION='Token import_token')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        token_cache.invalidate('import_token')
+        upload.seek(0)
+        response = self.client.post(url, {'file': upload}, HTTP_AUTHORIZATION='Token import_token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_bulk_import_endpoint_validates_batch_size(self):
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        device = UserDevice.objects.create(user=self.user, device_id=self.user.device_id)
+        UserToken.objects.create(user=self.user, device_id=device, key='import_token')
+        url = reverse('users:bulk-import')
+
+        for batch_size in ('abc', '0', '-1', '10001'):
+            upload = SimpleUploadedFile('users.jsonl', jsonl(
+                {'email': 'new@example.com', 'password': 'Qwe!@#123', 'name': 'New', 'device_id': 'd1'},
+            ).encode())
+            response = self.client.post(
+                url, {'file': upload, 'batch_size': batch_size}, HTTP_AUTHORIZATION='Token import_token',
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, batch_size)
+            self.assertEqual(response.json()['message'], ImportErrorMessages.BATCH_SIZE_INVALID)
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
@@ -0,0 +1,61 @@
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils.timezone import now
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from common.parsers import FastJSONParser
+from common.renderers import FastJSONRenderer
+
+from ..management.commands.bench_json import payloads
+
+
+class FastJSONTestCase(SimpleTestCase):
+    def assertSameRender(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_users_payloads(self):
+        for name, data in payloads().items():
+            with self.subTest(name):
+                self.assertSameRender(data)
+
+    def test_korean_is_not_escaped(self):
+        rendered = FastJSONRenderer().render({'message': '이메일 혹은 비밀번호를 확인해 주세요'})
+        self.assertIn('이메일'.encode(), rendered)
+        self.assertNotIn(b'\\u', rendered)
+
+    def test_encoder_types(self):
+        self.assertSameRender({
+            'at': now().replace(microsecond=123456),
+            'amount': Decimal('1.50'),
+            'lazy': gettext_lazy('Yes'),
+            1: 'non string key',
+            'separators': 'a\u2028b\u2029c',
+            'none': None,
+        })
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back(self):
+        self.assertSameRender({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_without_orjson(self):
+        with mock.patch('common.renderers.orjson', None), mock.patch('common.parsers.orjson', None):
+            self.assertSameRender({'message': '한글'})
+            self.assertEqual(FastJSONParser().parse(io.BytesIO('{"a": "한글"}'.encode())), {'a': '한글'})
+
+    def test_parse(self):
+        body = '{"email": "test@example.com", "name": "테스트", "n": [1, 2.5, null, true]}'.encode()
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_parse_errors(self):
+        for body in (b'{"a":', b'{"a": NaN}', b'\xff'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body))
@@ -0,0 +1,150 @@
+import json
+import logging
+import sys
+import threading
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+
+from common.log import (
+    AuthFailureSampleFilter,
+    JSONFormatter,
+    QueueHandler,
+    RequestIdFilter,
+    RequestIdMiddleware,
+    get_request_id,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.lines = []
+
+    def emit(self, record):
+        self.records.append(record)
+        self.lines.append(self.format(record))
+
+
+def make_record(msg='message', *args, **extra):
+    record = logging.makeLogRecord({
+        'name': 'apps', 'levelno': logging.WARNING, 'levelname': 'WARNING', 'msg': msg, 'args': args,
+    })
+    record.__dict__.update(extra)
+    return record
+
+
+class RequestIdTestCase(SimpleTestCase):
+    def test_response_header(self):
+        response = self.client.get(reverse('users:check-token'))
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_client_id_is_kept_when_valid(self):
+        response = self.client.get(reverse('users:check-token'), headers={'X-Request-ID': 'lb-1234.abc'})
+        self.assertEqual(response['X-Request-ID'], 'lb-1234.abc')
+        response = self.client.get(reverse('users:check-token'), headers={'X-Request-ID': 'bad id\n'})
+        self.assertNotEqual(response['X-Request-ID'], 'bad id\n')
+
+    def test_id_set_during_request_only(self):
+        seen = []
+
+        def view(request):
+            seen.append(get_request_id())
+            record = make_record()
+            RequestIdFilter().filter(record)
+            seen.append(record.request_id)
+            return mock.MagicMock()
+
+        request = RequestFactory().get('/', headers={'X-Request-ID': 'abc'})
+        RequestIdMiddleware(view)(request)
+        self.assertEqual(seen, ['abc', 'abc'])
+        self.assertIsNone(get_request_id())
+
+        # Error responses are logged by Django once the middleware has returned
+        record = make_record(request=request)
+        RequestIdFilter().filter(record)
+        self.assertEqual(record.request_id, 'abc')
+
+
+class JSONFormatterTestCase(SimpleTestCase):
+    def test_fields(self):
+        record = make_record('Reaped %d tokens', 3, request_id='abc', status_code=401)
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['message'], 'Reaped 3 tokens')
+        self.assertEqual(entry['level'], 'WARNING')
+        self.assertEqual(entry['logger'], 'apps')
+        self.assertEqual(entry['request_id'], 'abc')
+        self.assertEqual(entry['status_code'], 401)
+        self.assertNotIn('args', entry)
+
+    def test_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = make_record('실패', exc_info=sys.exc_info())
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual(entry['message'], '실패')
+        self.assertIn('ValueError: boom', entry['exc'])
+
+
+class AuthFailureSampleFilterTestCase(SimpleTestCase):
+    def test_samples_auth_failures_only(self):
+        sample = AuthFailureSampleFilter(rate=0.25)
+        with mock.patch('common.log.random.random', return_value=0.5):
+            self.assertFalse(sample.filter(make_record(status_code=401)))
+            self.assertFalse(sample.filter(make_record(status_code=403)))
+            self.assertTrue(sample.filter(make_record(status_code=500)))
+            self.assertTrue(sample.filter(make_record()))
+        with mock.patch('common.log.random.random', return_value=0.1):
+            record = make_record(status_code=401)
+            self.assertTrue(sample.filter(record))
+            self.assertEqual(record.sample_rate, 0.25)
+
+    def test_keeps_everything_by_default(self):
+        self.assertTrue(AuthFailureSampleFilter().filter(make_record(status_code=401)))
+
+
+class QueueHandlerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.target = ListHandler()
+        self.handler = QueueHandler(self.target)
+        self.handler.setFormatter(JSONFormatter())
+        self.addCleanup(self.handler.close)
+
+    def test_written_by_background_thread(self):
+        threads = []
+        self.target.emit = lambda record: threads.append(threading.current_thread())
+        self.handler.handle(make_record())
+        self.handler.flush()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_formatted_by_target(self):
+        self.assertIsNone(self.handler.formatter)
+        self.handler.handle(make_record('%s tokens', 3))
+        self.handler.flush()
+        self.assertEqual(json.loads(self.target.lines[0])['message'], '3 tokens')
+
+    def test_prepare(self):
+        request = RequestFactory().get('/api/users/check-token')
+        args = {'key': 'value'}
+        record = make_record('%(key)s', request=request, status_code=401)
+        record.args = args
+        prepared = self.handler.prepare(record)
+        args['key'] = 'changed'
+        self.assertEqual((prepared.msg, prepared.args), ('value', None))
+        self.assertEqual((prepared.method, prepared.path), ('GET', '/api/users/check-token'))
+        self.assertNotIn('request', vars(prepared))
+        self.assertIs(record.request, request)
+
+    def test_drops_when_full(self):
+        handler = QueueHandler(self.target, queue_size=1)
+        self.addCleanup(handler.close)
+        release = threading.Event()
+        self.target.handle = lambda record: release.wait(5)
+        for _ in range(5):
+            handler.handle(make_record())
+        release.set()
+        self.assertGreaterEqual(handler.dropped, 3)
@@ -0,0 +1,112 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from common.exception import LoginErrorMessages
+
+from ..models import User, UserDevice
+from ..throttling import login_throttle
+
+
+@override_settings(USERS_LOGIN_THROTTLE={
+    'LIMITS': {'email': 3, 'device': 5, 'ip': 10},
+    'WINDOW': 60,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 120,
+})
+class LoginThrottleTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test_device_id",
+        )
+        UserDevice.objects.create(user=cls.user, device_id=cls.user.device_id)
+
+    def setUp(self):
+        cache.clear()
+        login_throttle.clear()
+        self.addCleanup(login_throttle.clear)
+        self.addCleanup(cache.clear)
+        self.url = reverse('users:login')
+        clock = mock.patch('apps.users.throttling.time.time', return_value=1_000_020.0)
+        self.time = clock.start()
+        self.addCleanup(clock.stop)
+
+    def login(self, password='wrong_password', email='test@example.com', device_id='test_device_id', **extra):
+        data = {'email': email, 'password': password, 'device_id': device_id}
+        return self.client.post(self.url, data=data, format='json', **extra)
+
+    def test_locks_after_limit_without_checking_password(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch('apps.users.serializers.hashing_pool.check_password') as check, \
+                self.assertNumQueries(0):
+            response = self.login(password='Qwe!@#123')
+        check.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response.json()['message'], LoginErrorMessages.TOO_MANY_ATTEMPTS)
+
+    def test_backoff_doubles_after_lock(self):
+        for _ in range(3):
+            self.login()
+        self.time.return_value += 31
+        # One attempt is let through once the lock expires
+        self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login()['Retry-After'], '60')
+
+    @override_settings(USERS_LOGIN_THROTTLE={
+        'LIMITS': {'email': 3}, 'WINDOW': 3600, 'BACKOFF_BASE': 30, 'BACKOFF_MAX': 120,
+    })
+    def test_backoff_is_capped(self):
+        login_throttle.clear()
+        # Start of a window so the failures stay in one bucket
+        self.time.return_value = 1_000_800.0
+        for _ in range(3):
+            self.login()
+        for wait in (30, 60, 120):
+            self.time.return_value += wait + 1
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login()['Retry-After'], '120')
+
+    def test_other_email_is_not_locked(self):
+        for _ in range(3):
+            self.login()
+        response = self.login(email='other@example.com')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ip_limit_across_emails(self):
+        for index in range(10):
+            self.login(email=f'user{index}@example.com', device_id=f'device{index}')
+        response = self.login(email='fresh@example.com', device_id='fresh')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.login(email='fresh@example.com', device_id='fresh', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_window_slides(self):
+        for _ in range(2):
+            self.login()
+        # Half of the previous window still counts
+        self.time.return_value += 60
+        self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_success_clears_email_counters(self):
+        for _ in range(2):
+            self.login()
+        self.assertEqual(self.login(password='Qwe!@#123').status_code, status.HTTP_200_OK)
+        for _ in range(2):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(USERS_LOGIN_THROTTLE={'ENABLED': False, 'LIMITS': {'email': 1}})
+    def test_disabled(self):
+        login_throttle.clear()
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
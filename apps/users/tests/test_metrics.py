@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework import status
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@override_settings(METRICS={'ENABLED': True, 'ALLOWED_IPS': []})
+class MetricsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+            token="metrics_token",
+        )
+        device = UserDevice.objects.create(user=cls.user, device_id="test1")
+        UserToken.objects.create(user=cls.user, device_id=device, key='metrics_token')
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.url = reverse('users:check-token')
+
+    def test_request_and_auth_metrics(self):
+        requests = sample('http_requests_total', view='users:check-token', method='GET', status='200')
+        successes = sample('auth_attempts_total', outcome='success')
+        invalid = sample('auth_attempts_total', outcome='invalid')
+        misses = sample('token_cache_lookups_total', result='miss')
+
+        self.client.get(self.url, HTTP_AUTHORIZATION='Token metrics_token')
+        self.client.get(self.url, HTTP_AUTHORIZATION='Token unknown')
+
+        self.assertEqual(sample('http_requests_total', view='users:check-token', method='GET', status='200'), requests + 1)
+        self.assertEqual(sample('auth_attempts_total', outcome='success'), successes + 1)
+        self.assertEqual(sample('auth_attempts_total', outcome='invalid'), invalid + 1)
+        self.assertEqual(sample('token_cache_lookups_total', result='miss'), misses + 2)
+        self.assertGreater(sample('http_request_queries_count', view='users:check-token'), 0)
+
+    def test_device_changed_outcome(self):
+        User.objects.filter(pk=self.user.pk).update(token='other')
+        changed = sample('auth_attempts_total', outcome='device_changed')
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token metrics_token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(sample('auth_attempts_total', outcome='device_changed'), changed + 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get(self.url, HTTP_AUTHORIZATION='Token metrics_token')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket', body)
+        self.assertIn('auth_attempts_total', body)
+        self.assertIn('db_connections{', body)
+
+    @override_settings(METRICS={'ENABLED': False})
+    def test_metrics_endpoint_disabled(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,174 @@
+import os
+import signal
+import socket
+import threading
+import time
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from common import prefork
+
+from ..hashing import hashing_pool
+
+
+class WarmUpTestCase(TestCase):
+    def test_preload(self):
+        with mock.patch('common.prefork.warm_up_urls') as warm_up_urls:
+            prefork.preload()
+        warm_up_urls.assert_called_once()
+
+    def test_warm_up(self):
+        connection.close()
+        with mock.patch('apps.users.apps.UsersConfig.warm_up', autospec=True) as app_warm_up:
+            prefork.warm_up()
+        app_warm_up.assert_called_once()
+        self.assertIsNotNone(connection.connection)
+
+    def test_users_warm_up(self):
+        from django.apps import apps
+
+        apps.get_app_config('users').warm_up()
+        self.assertIsNotNone(hashing_pool._executor)
+
+
+class ArbiterTestCase(SimpleTestCase):
+    def setUp(self):
+        handlers = {signum: signal.getsignal(signum) for signum in (
+            signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD,
+        )}
+        self.addCleanup(lambda: [signal.signal(signum, handler) for signum, handler in handlers.items()])
+        self.sock = prefork.bind('127.0.0.1', 0)
+        self.addCleanup(self.sock.close)
+
+    @staticmethod
+    def serve(sock):
+        signal.signal(signal.SIGTERM, lambda signum, frame: os._exit(0))
+        while True:
+            time.sleep(0.05)
+
+    def run_arbiter(self, arbiter, *signals):
+        def send():
+            while len(arbiter.workers) < arbiter.size:
+                time.sleep(0.05)
+            for signum in signals:
+                os.kill(os.getpid(), signum)
+                time.sleep(0.5)
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        arbiter.run()
+        sender.join()
+
+    def test_rolling_restart(self):
+        arbiter = prefork.Arbiter(self.sock, self.serve, workers=2, graceful_timeout=5, warm_up=None)
+        spawned = []
+        spawn = arbiter.spawn
+
+        def record_spawn():
+            pid = spawn()
+            spawned.append(pid)
+            return pid
+
+        arbiter.spawn = record_spawn
+        self.run_arbiter(arbiter, signal.SIGHUP, signal.SIGTERM)
+        # Two workers, then one replacement each
+        self.assertEqual(len(spawned), 4)
+        self.assertEqual(arbiter.workers, {})
+
+    def test_failed_warm_up_keeps_workers(self):
+        def warm_up():
+            if reloading.is_set():
+                raise RuntimeError
+
+        reloading = threading.Event()
+        arbiter = prefork.Arbiter(self.sock, self.serve, workers=1, graceful_timeout=5, warm_up=warm_up)
+        reload = arbiter.reload
+
+        def record_reload():
+            reloading.set()
+            before = set(arbiter.workers)
+            reload()
+            self.assertEqual(set(arbiter.workers), before)
+
+        arbiter.reload = record_reload
+        with self.assertLogs('core', 'ERROR') as logs:
+            self.run_arbiter(arbiter, signal.SIGHUP, signal.SIGTERM)
+        self.assertTrue(reloading.is_set())
+        self.assertIn("did not start", logs.output[-1])
+
+
+    def test_failed_boots_back_off_and_give_up(self):
+        def warm_up():
+            raise RuntimeError
+
+        arbiter = prefork.Arbiter(self.sock, self.serve, workers=2, warm_up=warm_up, max_boot_failures=3)
+        arbiter.boot_backoff = 0.01
+        spawned = []
+        spawn = arbiter.spawn
+
+        def record_spawn():
+            spawned.append(time.monotonic())
+            return spawn()
+
+        arbiter.spawn = record_spawn
+        with self.assertLogs('core', 'ERROR'), self.assertRaises(prefork.BootError):
+            arbiter.run()
+        self.assertEqual(len(spawned), 3)
+        self.assertEqual(arbiter.workers, {})
+
+
+class ServeWSGITestCase(SimpleTestCase):
+    def test_idle_connection_times_out(self):
+        sock = prefork.bind('127.0.0.1', 0)
+        self.addCleanup(sock.close)
+
+        def application(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        pid = os.fork()
+        if pid == 0:
+            prefork.logger.disabled = True
+            try:
+                prefork.serve_wsgi(sock, application, poll_interval=0.1, timeout=1)
+            finally:
+                os._exit(0)
+        self.addCleanup(lambda: (os.kill(pid, signal.SIGTERM), os.waitpid(pid, 0)))
+
+        address = sock.getsockname()[:2]
+        idle = socket.create_connection(address)
+        self.addCleanup(idle.close)
+        started = time.monotonic()
+        with socket.create_connection(address, timeout=10) as client:
+            client.sendall(b'GET / HTTP/1.0\r\n\r\n')
+            self.assertTrue(client.recv(1024).startswith(b'HTTP/1.0 200'))
+        # Served once the idle connection was dropped
+        self.assertLess(time.monotonic() - started, 5)
+
+
+class ServeCommandTestCase(SimpleTestCase):
+    def test_bind_invalid(self):
+        with self.assertRaisesMessage(CommandError, "host:port"):
+            call_command('serve', bind='8000')
+
+    def test_interface_mismatch(self):
+        with mock.patch.dict(os.environ, {'DJANGO_SERVER_INTERFACE': 'wsgi'}):
+            with self.assertRaisesMessage(CommandError, "DJANGO_SERVER_INTERFACE=asgi"):
+                call_command('serve', interface='asgi')
+
+    def test_reaper_runs_in_master(self):
+        command = 'apps.users.management.commands.serve'
+        with mock.patch.dict(os.environ, {'DJANGO_SERVER_INTERFACE': 'wsgi'}), \
+                mock.patch(f'{command}.preload'), \
+                mock.patch(f'{command}.bind') as bind, \
+                mock.patch(f'{command}.Arbiter') as arbiter, \
+                mock.patch(f'{command}.start_reaper_thread') as start_reaper:
+            bind.return_value.getsockname.return_value = ('127.0.0.1', 8000)
+            call_command('serve', workers=2, stdout=open(os.devnull, 'w'))
+        # Once before forking, not per worker
+        start_reaper.assert_called_once_with()
+        arbiter.return_value.run.assert_called_once_with()
+        start_reaper.return_value.stop.assert_called_once_with()
@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.db import connections
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.query_budget import QueryBudgetExceeded, QueryBudgetMixin
+
+from ..models import User
+
+
+class ReplicaReadView(QueryBudgetMixin, APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 1
+
+    def get(self, request):
+        User.objects.exists()
+        User.objects.using('replica_0').exists()
+        return Response({'status': True})
+
+
+@override_settings(QUERY_BUDGET_MODE='enforce')
+class QueryBudgetTestCase(TestCase):
+    def setUp(self):
+        # A second alias on the test database, standing in for a replica
+        for patcher in (
+            mock.patch.dict(connections.settings, {'replica_0': connections.settings['default']}),
+            mock.patch.object(type(self), 'databases', {'default', 'replica_0'}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: connections['replica_0'].close())
+
+    def test_counts_queries_on_every_alias(self):
+        request = RequestFactory().get('/')
+        with self.assertRaisesMessage(QueryBudgetExceeded, "ReplicaReadView ran 2 queries, budget is 1"):
+            ReplicaReadView.as_view()(request)
+
+        with mock.patch.object(ReplicaReadView, 'query_budget', 2):
+            response = ReplicaReadView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework import status
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken
+from ..reaper import reap_expired_tokens
+
+
+class TokenReaperTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+        )
+        # One token per device
+        for i in range(3):
+            UserToken.objects.create(
+                user=cls.user,
+                device_id=UserDevice.objects.create(user=cls.user, device_id=f"expired{i}"),
+                key=f'expired_{i}',
+                expires_at=now() - timedelta(days=i + 1),
+            )
+        cls.user_device = UserDevice.objects.create(user=cls.user, device_id="test1")
+        UserToken.objects.create(user=cls.user, device_id=cls.user_device, key='valid')
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+
+    def test_reap_in_batches(self):
+        result = reap_expired_tokens(batch_size=2, sleep=0)
+        self.assertEqual(result['deleted'], 3)
+        self.assertEqual(result['batches'], 2)
+        self.assertEqual(list(UserToken.objects.values_list('key', flat=True)), ['valid'])
+
+    def test_reap_max_batches(self):
+        result = reap_expired_tokens(batch_size=1, sleep=0, max_batches=2)
+        self.assertEqual(result['deleted'], 2)
+        # Oldest expiry goes first
+        self.assertTrue(UserToken.objects.filter(key='expired_0').exists())
+
+    def test_expired_token_is_rejected(self):
+        response = self.client.get(reverse('users:check-token'), HTTP_AUTHORIZATION='Token expired_0')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reap_tokens_loop(self):
+        command = 'apps.users.management.commands.reap_tokens'
+        # Stop the loop at the second sleep, keep the test transaction's connection open
+        with mock.patch(f'{command}.time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                mock.patch(f'{command}.connection'), \
+                mock.patch(f'{command}.reap_expired_tokens', wraps=reap_expired_tokens) as reap:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('reap_tokens', loop=60, sleep=0, stdout=open('/dev/null', 'w'))
+        self.assertEqual(reap.call_count, 2)
+        self.assertEqual(list(UserToken.objects.values_list('key', flat=True)), ['valid'])
+
+    def test_not_started_by_app_or_workers(self):
+        # Only the `serve` master starts it, see test_prefork
+        with mock.patch('apps.users.reaper.start_reaper_thread') as start:
+            apps.get_app_config('users').ready()
+            apps.get_app_config('users').warm_up()
+        start.assert_not_called()
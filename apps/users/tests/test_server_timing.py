@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from common.timing import Timing, span
+
+from ..cache import token_cache
+from ..models import User, UserDevice
+
+
+def parse_server_timing(header):
+    spans = {}
+    for part in header.split(', '):
+        name, *params = part.split(';')
+        spans[name] = dict(param.split('=', 1) for param in params)
+    return spans
+
+
+@override_settings(SERVER_TIMING={'ENABLED': True, 'HEADER': True, 'LOG_SAMPLE_RATE': 0})
+class ServerTimingTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+        )
+        UserDevice.objects.create(user=cls.user, device_id="test1")
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+
+    def test_login_spans(self):
+        response = self.client.post(
+            reverse('users:login'),
+            data={'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        spans = parse_server_timing(response['Server-Timing'])
+        for name in ('validate', 'hash', 'db', 'render', 'total'):
+            self.assertIn(name, spans)
+        self.assertRegex(spans['db']['desc'], r'"\d+ queries"')
+        self.assertGreaterEqual(float(spans['total']['dur']), float(spans['hash']['dur']))
+
+    def test_authenticated_request_has_auth_span(self):
+        login = self.client.post(
+            reverse('users:login'),
+            data={'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+        )
+        response = self.client.get(reverse('users:check-token'), HTTP_AUTHORIZATION=f"Token {login.json()['token']}")
+        self.assertIn('auth', parse_server_timing(response['Server-Timing']))
+
+    @override_settings(SERVER_TIMING={'ENABLED': False})
+    def test_disabled(self):
+        response = self.client.post(reverse('users:login'), data={})
+        self.assertNotIn('Server-Timing', response)
+
+    def test_span_outside_request_is_noop(self):
+        with span('outside') as s:
+            pass
+        self.assertIsNone(s.timing)
+
+        timing = Timing()
+        timing.add('db', 0.001)
+        timing.add('db', 0.002)
+        self.assertEqual(timing.header(), 'db;dur=3.00;desc="2 queries"')
@@ -0,0 +1,71 @@
+import importlib
+import logging
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from common.log import FileHandler
+from core.configs import base
+
+PRODUCTION_ENV = {
+    'POSTGRES_DB': 'listener',
+    'POSTGRES_USER': 'listener',
+    'POSTGRES_PASSWORD': 'listener',
+    'POSTGRES_HOST': 'localhost',
+}
+
+
+class ApiProfileTestCase(SimpleTestCase):
+    def load(self, **env):
+        with mock.patch.dict('os.environ', {**PRODUCTION_ENV, **env}), mock.patch.dict('sys.modules'):
+            sys.modules.pop('core.configs.production', None)
+            sys.modules.pop('core.configs.api', None)
+            return importlib.import_module('core.configs.api')
+
+    def test_drops_browser_stack(self):
+        api = self.load()
+        for app in ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages', 'drf_yasg'):
+            self.assertNotIn(app, api.INSTALLED_APPS)
+        self.assertIn('apps.users', api.INSTALLED_APPS)
+        self.assertEqual(api.MIDDLEWARE, [
+            'common.log.RequestIdMiddleware',
+            'common.timing.ServerTimingMiddleware',
+            'common.metrics.MetricsMiddleware',
+            'common.db_router.ReplicaRoutingMiddleware',
+            'django.middleware.security.SecurityMiddleware',
+            'django.middleware.common.CommonMiddleware',
+        ])
+        self.assertEqual(
+            api.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'],
+            ['apps.users.authentication.CustomTokenAuthentication'],
+        )
+        self.assertEqual(api.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'], ['common.renderers.FastJSONRenderer'])
+        self.assertEqual(api.REST_FRAMEWORK['EXCEPTION_HANDLER'], base.REST_FRAMEWORK['EXCEPTION_HANDLER'])
+
+    def load_base(self, **env):
+        with mock.patch.dict('os.environ', env), mock.patch.dict('sys.modules'):
+            sys.modules.pop('core.configs.base', None)
+            return importlib.import_module('core.configs.base')
+
+    def test_time_zone(self):
+        with mock.patch('tzlocal.get_localzone') as get_localzone:
+            self.assertEqual(self.load_base(DJANGO_ENV='api', TIME_ZONE='').TIME_ZONE, 'UTC')
+            self.assertEqual(self.load_base(DJANGO_ENV='api', TIME_ZONE='Asia/Seoul').TIME_ZONE, 'Asia/Seoul')
+        get_localzone.assert_not_called()
+
+
+class FileHandlerTestCase(SimpleTestCase):
+    def test_creates_directory_on_first_record(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'logs', 'django.log')
+            handler = FileHandler(filename)
+            self.addCleanup(handler.close)
+            self.assertFalse(os.path.exists(os.path.dirname(filename)))
+
+            handler.emit(logging.makeLogRecord({'msg': 'written', 'levelno': logging.WARNING}))
+            handler.flush()
+            with open(filename) as f:
+                self.assertIn('written', f.read())
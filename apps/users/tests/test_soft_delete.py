@@ -0,0 +1,73 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken
+
+
+class SoftDeleteTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.deleted = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Deleted User",
+            device_id="test1",
+            is_deleted=True,
+        )
+        device = UserDevice.objects.create(user=cls.deleted, device_id="test1")
+        UserToken.objects.create(user=cls.deleted, device_id=device, key='deleted_token')
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+
+    def test_managers(self):
+        self.assertFalse(User.objects.filter(email="test@example.com").exists())
+        self.assertTrue(User.all_objects.filter(email="test@example.com").exists())
+        # Related lookups go through the base manager
+        self.assertEqual(UserToken.objects.get(key='deleted_token').user, self.deleted)
+
+    def test_login_rejects_deleted_user(self):
+        response = self.client.post(
+            reverse('users:login'),
+            data={'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_of_deleted_user_is_rejected(self):
+        response = self.client.get(reverse('users:check-token'), HTTP_AUTHORIZATION='Token deleted_token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_sign_up_reuses_email_and_device_id(self):
+        response = self.client.post(reverse('users:sign-up'), data={
+            'email': 'test@example.com',
+            'password': 'Qwe!@#123',
+            'name': 'New User',
+            'device_id': 'test1',
+            'device_os': 'iOS',
+            'device_os_version': '17.0',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.all_objects.filter(email="test@example.com").count(), 2)
+
+        # Still unique among live users
+        for field, value in (('email', 'test@example.com'), ('device_id', 'test1')):
+            fields = {'email': 'other@example.com', 'device_id': 'other', field: value}
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                User.objects.create(password="Qwe!@#123", name="Duplicate", **fields)
+
+    def test_lookup_uses_partial_index(self):
+        queryset = User.objects.filter(email="test@example.com")
+        with connection.cursor() as cursor:
+            # The tables are tiny, make the planner show which index it would use
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn("user_email_live_uniq", queryset.explain())
+
+    def test_lookup_over_all_users_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assertIn("user_email_idx", User.all_objects.filter(email="test@example.com").explain())
+        self.assertIn("user_device_id_idx", User.all_objects.filter(device_id="test1").explain())
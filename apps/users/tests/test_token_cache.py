@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework import status
+
+from ..cache import LRUCache, token_cache
+from ..models import User, UserDevice, UserToken
+
+
+class TokenCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+            token="cached_token",
+        )
+        cls.user_device = UserDevice.objects.create(
+            user=cls.user,
+            device_id=cls.user.device_id,
+        )
+        cls.user_token = UserToken.objects.create(
+            user=cls.user,
+            device_id=cls.user_device,
+            key='cached_token',
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.url = reverse('users:check-token')
+
+    def test_cached_token_skips_database(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['email'], 'test@example.com')
+        self.assertEqual(token_cache.stats()['misses'], 1)
+        self.assertEqual(token_cache.stats()['local_hits'], 1)
+
+    def test_rotated_token_is_invalidated(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        UserToken.objects.filter(pk=self.user_token.pk).update(expires_at=now() - timedelta(days=1))
+        token, created = UserToken.get_or_create(user=self.user, device=self.user_device)
+        self.assertFalse(created)
+        self.assertNotEqual(token.key, 'cached_token')
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1, ttl=60)
+        lru.set('b', 2, ttl=60)
+        lru.get('a')
+        lru.set('c', 3, ttl=60)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.evictions, 1)
+
+    def test_user_change_invalidates_snapshot(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.json()['user']['name'], 'Test User')
+
+        self.user.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.json()['user']['name'], 'Renamed')
+
+    def test_user_change_invalidates_shared_snapshot(self):
+        # The shared cache outlives the test's rollback
+        self.addCleanup(token_cache.invalidate_users, self.user.pk)
+        self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        token_cache.local.clear()
+        self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(token_cache.stats()['shared_hits'], 1)
+
+        # Changed by another process, only the shared generation tells
+        token_cache.local.clear()
+        User.objects.filter(pk=self.user.pk).update(name='Renamed')
+        token_cache.invalidate_users(self.user.pk)
+        token_cache.local.clear()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token cached_token')
+        self.assertEqual(response.json()['user']['name'], 'Renamed')
+        self.assertEqual(token_cache.stats()['misses'], 2)
+
+    def test_lru_delete_tag(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1, ttl=60, tag=1)
+        lru.set('b', 2, ttl=60, tag=1)
+        lru.set('c', 3, ttl=60, tag=2)
+        lru.delete_tag(1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
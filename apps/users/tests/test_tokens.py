@@ -0,0 +1,115 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now, timedelta
+from rest_framework import status
+
+from ..cache import token_cache
+from ..models import User, UserDevice, UserToken, UserTokenRevocation
+from ..tokens import SignedToken, _sign, is_signed, revocations
+
+
+@override_settings(USERS_TOKEN_FORMAT='signed')
+class SignedTokenTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            email="test@example.com",
+            password="Qwe!@#123",
+            name="Test User",
+            device_id="test1",
+        )
+        cls.user_device = UserDevice.objects.create(user=cls.user, device_id="test1")
+
+    def setUp(self):
+        token_cache.clear()
+        revocations.clear()
+        self.addCleanup(token_cache.clear)
+        self.addCleanup(revocations.clear)
+        self.url = reverse('users:check-token')
+
+    def login(self):
+        response = self.client.post(
+            reverse('users:login'),
+            data={'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['token']
+
+    def test_login_issues_signed_token(self):
+        key = self.login()
+        self.assertTrue(is_signed(key))
+        self.assertFalse(UserToken.objects.exists())
+
+        token = SignedToken.decode(key)
+        self.assertEqual((token.user_id, token.device_pk), (self.user.pk, self.user_device.pk))
+        self.assertFalse(token.has_expired())
+
+    def test_tampered_token_is_rejected(self):
+        key = self.login()
+        message, _, signature = key.rpartition('.')
+        forged = message.replace(f's2.{self.user.pk}.', 's2.999.', 1)
+        self.assertIsNone(SignedToken.decode(f'{forged}.{signature}'))
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {forged}.{signature}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_signed_token_skips_database(self):
+        key = self.login()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_revokes_token(self):
+        key = self.login()
+        response = self.client.post(reverse('users:logout'), HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(UserTokenRevocation.objects.filter(user=self.user, device=self.user_device).exists())
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # A token issued after the logout is not affected
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {self.login()}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocation_from_another_process_is_refreshed(self):
+        key = self.login()
+        UserTokenRevocation.revoke(self.user.pk, devices=[self.user_device.pk])
+        token_cache.clear()
+        revocations.clear()
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_ignores_clocks(self):
+        key = self.login()
+        self.client.post(reverse('users:logout'), HTTP_AUTHORIZATION=f'Token {key}')
+        # As if written by a host whose clock is behind, or ahead
+        for revoked_at in (now() - timedelta(hours=1), now() + timedelta(hours=1)):
+            UserTokenRevocation.objects.update(revoked_at=revoked_at)
+            revocations.clear()
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            token_cache.clear()
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {self.login()}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_opaque_tokens_keep_working(self):
+        UserToken.objects.create(user=self.user, device_id=self.user_device, key='opaque_token')
+        User.objects.filter(pk=self.user.pk).update(token='opaque_token')
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Token opaque_token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expired_signed_token_is_rejected(self):
+        expired = int((now() - timedelta(seconds=1)).timestamp())
+        message = f's2.{self.user.pk}.{self.user_device.pk}.{expired}.0'
+        key = f'{message}.{_sign(message)}'
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()['detail'], 'Token has expired')
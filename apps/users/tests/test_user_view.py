@@ -1,14 +1,23 @@
+from unittest import mock
+
 from django.contrib.auth.hashers import make_password
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.timezone import now, timedelta
 from rest_framework import status
 
 from common.exception import LoginErrorMessages, UserValidationMessages
+from common.query_budget import QueryBudgetTestMixin
 
+from ..cache import token_cache
 from ..models import User, UserDevice, UserToken
+from ..serializers import LoginSerializer
+from ..views import LoginView, LogoutView, SignUpView, TokenCheckView
 
 
-class LoginTestCase(TestCase):
+class LoginTestCase(QueryBudgetTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = User.objects.create(
@@ -36,10 +45,32 @@ class LoginTestCase(TestCase):
             'password': 'Qwe!@#123',
             'device_id': 'test_device_id',
         }
-        response = self.client.post(self.url, data=test_data, format='json')
+        with self.assertQueryBudget(LoginView):
+            response = self.client.post(self.url, data=test_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('token', response.json())
         
+    def test_login_in_user_time_zone(self):
+        User.objects.filter(pk=self.user.pk).update(time_zone='Asia/Seoul')
+        test_data = {
+            'email': 'test@example.com',
+            'password': 'Qwe!@#123',
+            'device_id': 'test_device_id',
+        }
+        response = self.client.post(self.url, data=test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertAlmostEqual(User.objects.get(pk=self.user.pk).last_login, now(), delta=timedelta(minutes=1))
+
+        self.user.time_zone = 'Asia/Seoul'
+        self.assertEqual(LoginSerializer.login_time(self.user).utcoffset(), timedelta(hours=9))
+        self.user.time_zone = 'Nowhere/Unknown'
+        self.assertIsNotNone(LoginSerializer.login_time(self.user).tzinfo)
+
+    def test_login_with_non_object_body(self):
+        for body in ('[]', '"x"', '1'):
+            response = self.client.post(self.url, data=body, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+
     def test_login_with_wrong_email(self):
         test_data = {
             'email': 'wrong_email@example.com',
@@ -72,9 +103,39 @@ class LoginTestCase(TestCase):
         response = self.client.post(self.url, data=test_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.json()['message'], UserValidationMessages.PASSWORD_REQUIRED)
-        
 
-class SignUpTestCase(TestCase):
+    def login_statements(self, device_id):
+        data = {'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': device_id}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statements = [q['sql'] for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]
+        return response.json()['token'], statements
+
+    def test_login_round_trips(self):
+        # User lookup, device upsert, token upsert, user update
+        for device_id in ('test_device_id', 'new_device_id', 'new_device_id'):
+            _, statements = self.login_statements(device_id)
+            self.assertEqual(len(statements), 4, statements)
+        self.assertEqual(UserDevice.objects.filter(user=self.user, device_id='new_device_id').count(), 1)
+
+    def test_login_keeps_valid_token(self):
+        token, _ = self.login_statements('test_device_id')
+        self.assertEqual(token, 'test_token')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token, 'test_token')
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_login_replaces_expired_token(self):
+        UserToken.objects.filter(key='test_token').update(expires_at=now() - timedelta(days=1))
+        token, _ = self.login_statements('test_device_id')
+        self.assertNotEqual(token, 'test_token')
+        stored = UserToken.objects.get(user=self.user, device_id=self.user_device)
+        self.assertEqual(stored.key, token)
+        self.assertFalse(stored.has_expired())
+
+
+class SignUpTestCase(QueryBudgetTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = User.objects.create(
@@ -95,7 +156,8 @@ class SignUpTestCase(TestCase):
             "device_os": "test",
             "device_os_version": "test2"
         }
-        response = self.client.post(self.url, data=test_data, format='json')
+        with self.assertQueryBudget(SignUpView):
+            response = self.client.post(self.url, data=test_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.json()['created'], True)
     
@@ -112,6 +174,37 @@ class SignUpTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
         self.assertEqual(response.json()['message'], UserValidationMessages.EMAIL_ALREADY_EXISTS)
         
+    def test_sign_up_duplicate_device_id(self):
+        test_data = {
+            'email': 'other@example.com',
+            'password': 'Qwe!@#123',
+            'name': 'Other User',
+            "device_id": "test1",
+            "device_os": "test",
+            "device_os_version": "test"
+        }
+        response = self.client.post(self.url, data=test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.json()['message'], UserValidationMessages.DEVICE_ID_ALREADY_EXISTS)
+        self.assertFalse(User.objects.filter(email='other@example.com').exists())
+
+    def test_sign_up_creates_user_and_device(self):
+        test_data = {
+            "email": "created@example.com",
+            "password": "Qwe!@#123",
+            "name": "Created User",
+            "device_id": "2222",
+            "device_os": "ios",
+            "device_os_version": "18"
+        }
+        response = self.client.post(self.url, data=test_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email="created@example.com")
+        self.assertTrue(user.check_password("Qwe!@#123"))
+        self.assertIsNotNone(user.created_at)
+        device = user.devices.get()
+        self.assertEqual((device.device_id, device.device_os, device.device_os_version), ("2222", "ios", "18"))
+
     def test_sign_up_without_email(self):
         test_data = {
             'password': 'Qwe!@#123',
@@ -139,7 +232,7 @@ class SignUpTestCase(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json()['message'], UserValidationMessages.NAME_REQUIRED)
 
-class TokenCheckTestView(TestCase):
+class TokenCheckTestView(QueryBudgetTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = User.objects.create(
@@ -166,14 +259,40 @@ class TokenCheckTestView(TestCase):
         )
         self.assertEqual(login_response.status_code, status.HTTP_200_OK)
         token = login_response.json()['token']
-        response = self.client.get(
-            self.token_check_api_url,
-            HTTP_AUTHORIZATION=f'Token {token}',
-            format='json'
-        )
+        with self.assertQueryBudget(TokenCheckView):
+            response = self.client.get(
+                self.token_check_api_url,
+                HTTP_AUTHORIZATION=f'Token {token}',
+                format='json'
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('user', response.json())
         
+    def test_token_check_not_modified(self):
+        login_response = self.client.post(
+            self.login_api_url,
+            data={'email': 'test@example.com', 'password': 'Qwe!@#123', 'device_id': 'test1'},
+            format='json'
+        )
+        auth = f"Token {login_response.json()['token']}"
+        response = self.client.get(self.token_check_api_url, HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        with mock.patch('apps.users.views.UserSerializer.to_representation') as to_representation:
+            response = self.client.get(self.token_check_api_url, HTTP_AUTHORIZATION=auth, HTTP_IF_NONE_MATCH=f'W/{etag}')
+        to_representation.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # Any saved change to the user changes the tag, once the cached snapshot is gone
+        User.objects.get(pk=self.user.pk).save()
+        token_cache.invalidate(login_response.json()['token'])
+        response = self.client.get(self.token_check_api_url, HTTP_AUTHORIZATION=auth, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_token_check_invalid(self):
         response = self.client.get(self.token_check_api_url, headers={'Content-Type': 'json'}, format='json') # Not in token
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -193,17 +312,18 @@ class TokenCheckTestView(TestCase):
         self.user.save()
         
         # check token with new device_id
-        response = self.client.get(
-            self.token_check_api_url,
-            HTTP_AUTHORIZATION=f'Token {token}',
-            format='json'
-        )
+        with self.assertQueryBudget(TokenCheckView):
+            response = self.client.get(
+                self.token_check_api_url,
+                HTTP_AUTHORIZATION=f'Token {token}',
+                format='json'
+            )
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(response.json()['device_changed'], True)
         self.assertEqual(response.json()['message'], '로그인 기기가 변경 되었습니다.\n다시 로그인 해주세요.')
 
 
-class LogoutTestCase(TestCase):
+class LogoutTestCase(QueryBudgetTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = User.objects.create(
@@ -227,10 +347,31 @@ class LogoutTestCase(TestCase):
         token = login_response.json()['token']
         
         # logout
-        response = self.client.post(self.url, headers={'Content-Type': 'json', 'Authorization':  f'Token {token}'}, format='json')
+        with self.assertQueryBudget(LogoutView):
+            response = self.client.post(self.url, headers={'Content-Type': 'json', 'Authorization':  f'Token {token}'}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()['status'], True)
     
+    def test_logout_query_budget(self):
+        user = User.objects.create(
+            email="budget@example.com",
+            password="Qwe!@#123",
+            name="Budget User",
+            device_id="budget1",
+        )
+        login_response = self.client.post(
+            reverse('users:login'),
+            data={'email': 'budget@example.com', 'password': 'Qwe!@#123', 'device_id': 'budget1'},
+            format='json'
+        )
+        self.assertEqual(login_response.status_code, status.HTTP_200_OK)
+        token = login_response.json()['token']
+
+        with self.assertQueryBudget(LogoutView):
+            response = self.client.post(self.url, HTTP_AUTHORIZATION=f'Token {token}', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(User.objects.get(pk=user.pk).token)
+
     def test_logout_invalid(self):
         response = self.client.post(self.url, headers={'Content-Type': 'json'}, format='json') # Not in token
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
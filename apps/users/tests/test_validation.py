@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+
+from common.exception import ImportErrorMessages, UserValidationMessages
+from common.validation import CredentialRules, credential_rules
+
+from ..importer import validate_record, validate_records
+from ..management.commands.bench_validation import legacy_error, samples
+
+
+class CredentialRulesTestCase(SimpleTestCase):
+    def test_same_results_as_common_utils(self):
+        pairs = samples() + [
+            ('a@b.c', ''),
+            ('a@b.c', 'Ab1@' * 4),
+            ('a@b.c', 'Ab1@' * 4 + 'x'),
+            ('a@b.c', 'ＡＢｃ１２３４@'),
+            ('a@b.c', 'Pass²word@'),
+            ('a@b.c', 'Ab1!Ab1!Ab1!'),
+            ('a@b.c\n', 'Password1@'),
+            ('@b.c', 'Password1@'),
+        ]
+        for email, password in pairs:
+            with self.subTest(email=email, password=password):
+                self.assertEqual(credential_rules.error(email, password), legacy_error(email, password))
+
+    def test_message_order(self):
+        self.assertEqual(credential_rules.password_error('abc'), UserValidationMessages.PASSWORD_STR_NUM_REQUIRED)
+        self.assertEqual(credential_rules.password_error('abc1'), UserValidationMessages.PASSWORD_LENGTH_INVALID)
+        self.assertEqual(credential_rules.password_error('abcdefg1'), UserValidationMessages.PASSWORD_STRENGTH_INVALID)
+        self.assertIsNone(credential_rules.password_error('Abcdefg1@'))
+
+    def test_korean_letters_count_as_letters(self):
+        self.assertEqual(credential_rules.password_error('비밀번호1234'), UserValidationMessages.PASSWORD_STRENGTH_INVALID)
+        self.assertEqual(credential_rules.password_error('1234567@'), UserValidationMessages.PASSWORD_STR_NUM_REQUIRED)
+
+    def test_custom_rules(self):
+        rules = CredentialRules(min_length=4, max_length=6, specials='!')
+        self.assertIsNone(rules.password_error('Ab1!'))
+        self.assertEqual(rules.password_error('Ab1@'), UserValidationMessages.PASSWORD_STRENGTH_INVALID)
+        self.assertEqual(rules.password_error('Abc12!!'), UserValidationMessages.PASSWORD_LENGTH_INVALID)
+
+    def test_batch(self):
+        pairs = samples()
+        self.assertEqual(credential_rules.errors(pairs), [credential_rules.error(*pair) for pair in pairs])
+        self.assertEqual(credential_rules.errors(iter([])), [])
+
+
+class ValidateRecordsTestCase(SimpleTestCase):
+    def test_batch_matches_single_records(self):
+        valid = {'email': 'a@example.com', 'password': 'Password1@', 'name': 'a', 'device_id': 'd1'}
+        records = [
+            valid,
+            None,
+            {**valid, 'email': ''},
+            {**valid, 'name': 1},
+            {**valid, 'email': 'not-an-email'},
+            {**valid, 'password': 'password'},
+            {**valid, 'password': 'Password1'},
+        ]
+        reasons = validate_records(records)
+        self.assertEqual(reasons, [validate_record(record) for record in records])
+        self.assertEqual(reasons, [
+            None,
+            ImportErrorMessages.INVALID_ROW,
+            UserValidationMessages.EMAIL_REQUIRED,
+            ImportErrorMessages.INVALID_ROW,
+            UserValidationMessages.EMAIL_FORMAT_INVALID,
+            UserValidationMessages.PASSWORD_STR_NUM_REQUIRED,
+            UserValidationMessages.PASSWORD_STRENGTH_INVALID,
+        ])
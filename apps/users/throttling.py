@@ -0,0 +1,260 @@
+"""
+Login throttling ahead of the user lookup and password check.
+
+Failed logins are counted per email, device id and client address in the
+shared cache, in fixed buckets of ``WINDOW`` seconds that are combined into a
+sliding window: ``previous * (1 - elapsed) + current``. A scope that reaches
+its limit is locked for ``BACKOFF_BASE`` seconds, doubling each time it fails
+again after a lock, up to ``BACKOFF_MAX``. Locked attempts are rejected with
+429 and ``Retry-After`` before any query or hashing.
+
+Checking an attempt is one ``get_many``, only failures write. Identifiers are
+hashed so emails are not stored in the cache.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from common.exception import CustomThrottledError, LoginErrorMessages
+from common.metrics import LOGIN_THROTTLED
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'users:login:',
+    'WINDOW': 900,
+    # Failed attempts per window before a scope is locked
+    'LIMITS': {'email': 5, 'device': 10, 'ip': 50},
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+}
+
+# Scopes a successful login clears, the address may be shared with an attacker
+PERSONAL_SCOPES = ('email', 'device')
+
+
+def get_options():
+    options = {**DEFAULTS, **getattr(settings, 'USERS_LOGIN_THROTTLE', {})}
+    options['LIMITS'] = {**DEFAULTS['LIMITS'], **options['LIMITS']}
+    return options
+
+
+class LoginAttempt:
+    """
+    Counters of one login attempt, read by ``LoginThrottle.check``.
+    """
+
+    def __init__(self, throttle, idents, at):
+        self.throttle = throttle
+        self.options = throttle.options
+        window = self.options['WINDOW']
+        self.bucket = int(at // window)
+        self.elapsed = (at % window) / window
+        self.at = at
+        self.keys = {
+            scope: {
+                'current': throttle.make_key(scope, ident, self.bucket),
+                'previous': throttle.make_key(scope, ident, self.bucket - 1),
+                'lock': throttle.make_key(scope, ident, 'lock'),
+            }
+            for scope, ident in idents.items()
+        }
+        self.values = {}
+
+    def all_keys(self):
+        return [key for keys in self.keys.values() for key in keys.values()]
+
+    def count(self, scope):
+        keys = self.keys[scope]
+        previous = self.values.get(keys['previous'], 0)
+        return previous * (1 - self.elapsed) + self.values.get(keys['current'], 0)
+
+    def lock(self, scope):
+        # (locked until, strikes), kept after it expires to remember the strikes
+        return self.values.get(self.keys[scope]['lock'], (0, 0))
+
+    def retry_after(self):
+        """
+        Seconds until every scope of this attempt is unlocked, 0 when none is locked.
+        """
+        waits = [0]
+        for scope in self.keys:
+            until, strikes = self.lock(scope)
+            if until > self.at:
+                waits.append(until - self.at)
+            elif not strikes and self.count(scope) >= self.options['LIMITS'][scope]:
+                # Reached the limit without a lock, e.g. concurrent failures
+                waits.append(self.options['BACKOFF_BASE'])
+        return math.ceil(max(waits))
+
+    def failed_writes(self, counts):
+        """
+        Locks to set after a failure, given the new bucket counts per scope.
+        """
+        locks = {}
+        for scope, current in counts.items():
+            keys = self.keys[scope]
+            previous = self.values.get(keys['previous'], 0)
+            if previous * (1 - self.elapsed) + current < self.options['LIMITS'][scope]:
+                continue
+            _, strikes = self.lock(scope)
+            backoff = min(self.options['BACKOFF_BASE'] * 2 ** strikes, self.options['BACKOFF_MAX'])
+            locks[keys['lock']] = (self.at + backoff, strikes + 1)
+        return locks
+
+    def clear_keys(self):
+        return [
+            key
+            for scope in PERSONAL_SCOPES if scope in self.keys
+            for key in self.keys[scope].values() if key in self.values
+        ]
+
+    def failed(self):
+        self.throttle.failed(self)
+
+    async def afailed(self):
+        await self.throttle.afailed(self)
+
+    def succeeded(self):
+        keys = self.clear_keys()
+        if keys:
+            self.throttle.cache.delete_many(keys)
+
+    async def asucceeded(self):
+        keys = self.clear_keys()
+        if keys:
+            await self.throttle.cache.adelete_many(keys)
+
+
+class LoginThrottle:
+    def __init__(self):
+        self._options = None
+
+    @property
+    def options(self):
+        if self._options is None:
+            self._options = get_options()
+        return self._options
+
+    @property
+    def cache(self):
+        return caches[self.options['CACHE_ALIAS']]
+
+    @property
+    def enabled(self):
+        return self.options['ENABLED']
+
+    def make_key(self, scope, ident, suffix):
+        return f"{self.options['KEY_PREFIX']}{scope}:{ident}:{suffix}"
+
+    @staticmethod
+    def idents(request, email, device_id):
+        values = {
+            'email': email.strip().lower() if isinstance(email, str) else None,
+            'device': device_id if isinstance(device_id, str) else None,
+            # Honours NUM_PROXIES like DRF's own throttles
+            'ip': BaseThrottle().get_ident(request),
+        }
+        return {
+            scope: hashlib.sha256(value.encode()).hexdigest()[:32]
+            for scope, value in values.items() if value
+        }
+
+    @staticmethod
+    def credentials(data):
+        """
+        ``(email, device_id)`` of a login body, ``None`` for each when it is not an object.
+        """
+        # The serializer rejects the body after the check, it must not fail here
+        if not isinstance(data, dict):
+            return None, None
+        return data.get('email'), data.get('device_id')
+
+    def attempt(self, request, email, device_id):
+        return LoginAttempt(self, self.idents(request, email, device_id), time.time())
+
+    def check(self, request, email, device_id):
+        """
+        Return the ``LoginAttempt`` or raise ``CustomThrottledError`` while a scope is locked.
+        """
+        if not self.enabled:
+            return NullAttempt()
+        attempt = self.attempt(request, email, device_id)
+        attempt.values = self.cache.get_many(attempt.all_keys())
+        self.reject_locked(attempt)
+        return attempt
+
+    async def acheck(self, request, email, device_id):
+        if not self.enabled:
+            return NullAttempt()
+        attempt = self.attempt(request, email, device_id)
+        attempt.values = await self.cache.aget_many(attempt.all_keys())
+        self.reject_locked(attempt)
+        return attempt
+
+    @staticmethod
+    def reject_locked(attempt):
+        retry_after = attempt.retry_after()
+        if retry_after:
+            LOGIN_THROTTLED.inc()
+            raise CustomThrottledError(LoginErrorMessages.TOO_MANY_ATTEMPTS, retry_after)
+
+    def failed(self, attempt):
+        timeout = self.options['WINDOW'] * 2
+        counts = {}
+        for scope, keys in attempt.keys.items():
+            try:
+                counts[scope] = self.cache.incr(keys['current'])
+            except ValueError:
+                counts[scope] = 1 if self.cache.add(keys['current'], 1, timeout) else self.cache.incr(keys['current'])
+        locks = attempt.failed_writes(counts)
+        if locks:
+            self.cache.set_many(locks, self.lock_timeout)
+
+    async def afailed(self, attempt):
+        timeout = self.options['WINDOW'] * 2
+        counts = {}
+        for scope, keys in attempt.keys.items():
+            try:
+                counts[scope] = await self.cache.aincr(keys['current'])
+            except ValueError:
+                added = await self.cache.aadd(keys['current'], 1, timeout)
+                counts[scope] = 1 if added else await self.cache.aincr(keys['current'])
+        locks = attempt.failed_writes(counts)
+        if locks:
+            await self.cache.aset_many(locks, self.lock_timeout)
+
+    @property
+    def lock_timeout(self):
+        return self.options['BACKOFF_MAX'] + self.options['WINDOW']
+
+    def clear(self):
+        """
+        Forget the cached options. Used when settings change in tests.
+        """
+        self._options = None
+
+
+class NullAttempt:
+    """
+    Stand-in when throttling is disabled.
+    """
+
+    def failed(self):
+        pass
+
+    async def afailed(self):
+        pass
+
+    def succeeded(self):
+        pass
+
+    async def asucceeded(self):
+        pass
+
+
+login_throttle = LoginThrottle()
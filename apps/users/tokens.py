@@ -0,0 +1,234 @@
+"""
+Stateless signed tokens.
+
+A signed token carries the user id, device id, expiry and the device's token
+generation with an HMAC-SHA256 signature,
+``s2.<user>.<device>.<exp>.<generation>.<signature>``, so verifying it needs
+no database lookup. Logout and device changes bump the device's generation,
+are recorded in ``user_token_revocation`` and mirrored in an in-process
+``RevocationList`` that is refreshed every ``REVOCATION_REFRESH`` seconds.
+Tokens of an older generation are revoked, whichever host issued them and
+whatever its clock says. ``s1.`` tokens, revoked by issue time, are no longer
+accepted.
+
+Opaque keys are 40 hex characters, so the ``s2.`` prefix alone tells the two
+formats apart.
+"""
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.timezone import now, timedelta
+
+from common.db_router import pin_client
+
+from .cache import token_cache
+from .models import UserToken, UserTokenRevocation
+
+PREFIX = 's2.'
+# Tokens never outlive this, older revocations can be dropped
+LIFETIME = timedelta(days=7)
+
+DEFAULTS = {
+    'SECRET': '',
+    'REVOCATION_REFRESH': 5,
+}
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'USERS_SIGNED_TOKEN', {})}
+
+
+def is_signed(key):
+    return key.startswith(PREFIX)
+
+
+@lru_cache(maxsize=4)
+def _signing_key(secret):
+    return hashlib.sha256(f'apps.users.tokens{secret}'.encode()).digest()
+
+
+def _sign(message):
+    secret = get_options()['SECRET'] or settings.SECRET_KEY
+    digest = hmac.new(_signing_key(secret), message.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def _to_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+class SignedToken:
+    """
+    Decoded signed token, used as ``request.auth`` like a ``UserToken`` row.
+
+    ``user`` is set by the authenticator, ``delete()`` revokes the token.
+    """
+
+    def __init__(self, key, user_id, device_pk, expires_at, generation, user=None):
+        self.key = key
+        self.user_id = user_id
+        self.device_pk = device_pk
+        self.expires_at = expires_at
+        # The device's token_generation at issue, compared against revocations
+        self.generation = generation
+        self.user = user
+
+    @classmethod
+    def issue(cls, user, device):
+        expires_at = UserToken.get_expiry()
+        generation = device.token_generation
+        message = f'{PREFIX}{user.pk}.{device.pk}.{int(expires_at.timestamp())}.{generation}'
+        key = f'{message}.{_sign(message)}'
+        return cls(key, user.pk, device.pk, expires_at, generation, user=user)
+
+    @classmethod
+    def decode(cls, key):
+        """
+        Return the token for ``key``, or ``None`` when it is malformed or the
+        signature does not match. Expiry and revocation are left to the caller.
+        """
+        message, _, signature = key.rpartition('.')
+        if not message.startswith(PREFIX) or not hmac.compare_digest(signature, _sign(message)):
+            return None
+        try:
+            user_id, device_pk, expires, generation = map(int, message[len(PREFIX):].split('.'))
+        except ValueError:
+            return None
+        expires_at = datetime.fromtimestamp(expires, tz=timezone.utc)
+        return cls(key, user_id, device_pk, expires_at, generation)
+
+    def has_expired(self):
+        return self.expires_at < now()
+
+    def delete(self):
+        revocations.revoke(self.user_id, self.device_pk)
+
+    async def adelete(self):
+        await revocations.arevoke(self.user_id, self.device_pk)
+
+
+class RevocationList:
+    """
+    Latest revoked generation per ``(user, device)``, with its revocation time.
+
+    Each refresh re-reads rows from shortly before the latest revocation it
+    has seen, in database time, so rows committed out of order by other
+    processes are still picked up.
+    """
+    overlap = timedelta(seconds=60)
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._latest = None
+        self._next_refresh = 0.0
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def is_revoked(self, token):
+        generation, _ = self._revoked.get((token.user_id, token.device_pk), (0, 0))
+        return token.generation < generation
+
+    def add(self, revocation):
+        key = (revocation.user_id, revocation.device_id)
+        entry = (revocation.generation, _to_ms(revocation.revoked_at))
+        with self._lock:
+            self._revoked[key] = max(self._revoked.get(key, entry), entry)
+
+    def revoke(self, user_id, device_pk):
+        return self.revoke_many(user_id, devices=[device_pk])
+
+    async def arevoke(self, user_id, device_pk):
+        return await sync_to_async(self.revoke)(user_id, device_pk)
+
+    def revoke_many(self, user_id, devices=None, exclude_device=None):
+        """
+        Revoke the signed tokens of ``user_id`` on the ``devices`` pks, or on
+        every device but ``exclude_device``. Returns the number of devices.
+        """
+        rows = UserTokenRevocation.revoke(user_id, devices, exclude_device)
+        for revocation in rows:
+            self.add(revocation)
+        return len(rows)
+
+    def _claim_refresh(self):
+        # Only one thread per interval goes to the database
+        with self._lock:
+            if time.monotonic() < self._next_refresh:
+                return False
+            self._next_refresh = time.monotonic() + get_options()['REVOCATION_REFRESH']
+            return True
+
+    def refresh(self):
+        # Days of margin, this host's clock is close enough for the first window
+        horizon = now() - LIFETIME
+        since = horizon
+        if self._latest is not None:
+            since = max(since, self._latest - self.overlap)
+        rows = UserTokenRevocation.objects.filter(revoked_at__gte=since).only(
+            'user_id', 'device_id', 'generation', 'revoked_at'
+        )
+        latest = self._latest
+        for revocation in rows:
+            self.add(revocation)
+            latest = max(latest or revocation.revoked_at, revocation.revoked_at)
+
+        horizon = _to_ms(horizon)
+        with self._lock:
+            self._revoked = {key: entry for key, entry in self._revoked.items() if entry[1] >= horizon}
+            self._latest = latest
+            self._next_refresh = time.monotonic() + get_options()['REVOCATION_REFRESH']
+
+    def refresh_if_stale(self):
+        if self._claim_refresh():
+            self.refresh()
+
+    async def arefresh_if_stale(self):
+        if self._claim_refresh():
+            await sync_to_async(self.refresh)()
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._latest = None
+            self._next_refresh = 0.0
+
+
+revocations = RevocationList()
+
+
+def revoke_tokens(user, devices=None, exclude_device=None):
+    """
+    Revoke the tokens of ``user`` on the ``devices`` pks, or on every device
+    but ``exclude_device``. Returns the number of deleted token rows, or of
+    revoked devices in the ``signed`` format.
+
+    Opaque tokens go in a single delete. Signed tokens, only issued in the
+    ``signed`` format, get one revocation row per device.
+    """
+    keys = UserToken.delete_for(user, devices, exclude_device)
+    token_cache.invalidate(*keys)
+    if settings.USERS_TOKEN_FORMAT == 'signed':
+        # Devices holding opaque tokens from before the switch are among them
+        return revocations.revoke_many(user.pk, devices, exclude_device)
+    return len(keys)
+
+
+def issue_token(user, device):
+    """
+    Issue a login token in the ``USERS_TOKEN_FORMAT`` format.
+    """
+    if settings.USERS_TOKEN_FORMAT == 'signed':
+        return SignedToken.issue(user, device)
+    token = UserToken.upsert(user, device)
+    # The row may not have reached the replicas when the client first uses it
+    pin_client(token.key)
+    return token
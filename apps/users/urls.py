@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import views as sync_views
+
+if settings.USERS_ASYNC_VIEWS:
+    from . import async_views as views
+else:
+    from . import views
 
 app_name = 'users'
 
@@ -8,5 +14,10 @@ urlpatterns = [
     path('sign-up', views.SignUpView.as_view(), name='sign-up'),
     path('login', views.LoginView.as_view(), name='login'),
     path('logout', views.LogoutView.as_view(), name='logout'),
-    path('check-token', views.TokenCheckView.as_view(), name='check-token')
+    path('check-token', views.TokenCheckView.as_view(), name='check-token'),
+    path('bulk-import', sync_views.BulkImportView.as_view(), name='bulk-import'),
+    path('devices', sync_views.DeviceListView.as_view(), name='devices'),
+    path('devices/revoke-others', sync_views.RevokeOtherDevicesView.as_view(), name='revoke-other-devices'),
+    path('devices/<int:pk>', sync_views.DeviceRevokeView.as_view(), name='device'),
+    path('tokens', sync_views.TokenListView.as_view(), name='tokens'),
 ]
@@ -2,42 +2,48 @@ import logging
 
 logger = logging.getLogger("apps")
 
-from datetime import datetime
-
+from django.utils.timezone import now
 from rest_framework import status
+from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from tzlocal import get_localzone
+
+from common.exception import CustomException, CustomValidationError, DeviceErrorMessages, ImportErrorMessages
+from common.metrics import record_auth
+from common.pagination import KeysetPagination
+from common.query_budget import QueryBudgetMixin
+from common.utils import etag_matches
 
 # from rest_framework.authentication import TokenAuthentication
 from .authentication import CustomTokenAuthentication as TokenAuthentication
-from .models import User, UserDevice
+from .cache import token_cache
+from .importer import UserImporter, iter_uploaded_records
+from .models import UserDevice
 from .models import UserToken as Token
-from .serializers import LoginSerializer, SignUpSerializer, UserSerializer
+from .permissions import IsSuperUser
+from .serializers import (
+    CHECK_TOKEN_CACHE_CONTROL,
+    BulkImportSerializer,
+    LoginSerializer,
+    SignUpSerializer,
+    UserDeviceSerializer,
+    UserSerializer,
+    UserTokenSerializer,
+)
+from .throttling import login_throttle
+from .tokens import revoke_tokens
 
 
-class SignUpView(APIView):
+class SignUpView(QueryBudgetMixin, APIView):
     permission_classes = [AllowAny]
+    query_budget = 1
     
     def post(self, request):
         serializer = SignUpSerializer(data=request.data)
         if serializer.is_valid():
-            data = serializer.validated_data            
-            # Create user
-            user = User.objects.create(
-                email=data.get('email'),
-                password=data.get('password'),
-                name=data.get('name'),
-                device_id=data.get('device_id'),
-            )
-            # Create user device info
-            UserDevice.objects.create(
-                user=user,
-                device_id=data.get('device_id'),
-                device_os=data.get('device_os'),
-                device_os_version=data.get('device_os_version'),
-            )
+            # User and device info in a single statement
+            SignUpSerializer.create_user(serializer.validated_data)
             return Response({'created': True}, status=status.HTTP_201_CREATED)
 
         return Response(
@@ -48,63 +54,162 @@ class SignUpView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-class LoginView(APIView):
+class LoginView(QueryBudgetMixin, APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    query_budget = 4
     
     def post(self, request, *args, **kwargs):
+        # Locked out clients are rejected before the user lookup and password check
+        attempt = login_throttle.check(request, *login_throttle.credentials(request.data))
         serializer = LoginSerializer(data=request.data)
-        if serializer.is_valid():
+        try:
+            valid = serializer.is_valid()
+        except CustomException as e:
+            if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                attempt.failed()
+            raise
+        if valid:
+            attempt.succeeded()
             user = serializer.validated_data['user']
-            # Create or replace device info
-            device, _ = UserDevice.objects.update_or_create(
-                user=user,
-                device_id=request.data['device_id'],
-            )
-            # Create or replace token by user, device
-            token, _ = Token.get_or_create(user=user, device=device)
-            user.token = token.key
-            if user.time_zone:
-                local_tz = get_localzone(user.time_zone)
-                user.last_login = datetime.now(local_tz)
-            else:
-                user.last_login = datetime.now(get_localzone())
-            
-            user.save()
+            # Device and token upserts plus the user update, one transaction
+            token = LoginSerializer.record_login(user, request.data['device_id'], LoginSerializer.login_time(user))
             return Response(
                 {'status': True, 'token': token.key}, status=status.HTTP_200_OK
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TokenCheckView(APIView):
+class TokenCheckView(QueryBudgetMixin, APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    query_budget = 2
     
     def get(self, request):
         token = request.auth
         if token is not None:
-            try:
-                user = UserSerializer(token.user).data                
-                if user.get("token") != token.key:
-                    logger.debug(f"User(email: {user.get('email')}, id: {user.get('id')}) token changed: {token.key} -> {user.get('token')}")
-                    user.update(token=None)
-                    token.delete()
-                    return Response({'status': False, 'device_changed': True, 'message': '로그인 기기가 변경 되었습니다.\n다시 로그인 해주세요.'}, status=status.HTTP_401_UNAUTHORIZED)
-                
-                return Response({'status': True, 'user': user}, status=status.HTTP_200_OK)
-            except Token.DoesNotExist:
-                return Response({'status': False, 'message': '유효한 토큰이 아닙니다.'}, status=status.HTTP_401_UNAUTHORIZED)
+            user = token.user
+            if user.token != token.key:
+                logger.debug("User(email: %s, id: %s) token changed: %s -> %s", user.email, user.id, token.key, user.token)
+                record_auth('device_changed')
+                token_cache.invalidate(token.key)
+                token.delete()
+                return Response({'status': False, 'device_changed': True, 'message': '로그인 기기가 변경 되었습니다.\n다시 로그인 해주세요.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+            # Clients revalidate on every app foreground, skip serializing when unchanged
+            etag = UserSerializer.etag(user, token.key)
+            headers = {'ETag': etag, 'Cache-Control': CHECK_TOKEN_CACHE_CONTROL}
+            if etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response({'status': True, 'user': UserSerializer(user).data}, status=status.HTTP_200_OK, headers=headers)
             
         return Response({'status': False}, status=status.HTTP_200_OK)
 
-class LogoutView(APIView):
+class LogoutView(QueryBudgetMixin, APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    query_budget = 3
+
     def post(self, request):
         token = request.auth
-        user = User.objects.get(token=token)
+        # Loaded together with the token, may be a cached snapshot so only write token
+        user = token.user
         user.token = None
-        user.save()
+        user.save(update_fields=['token'])
+        token_cache.invalidate(token.key)
         token.delete()
-        return Response({'status': True,}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({'status': True,}, status=status.HTTP_200_OK)
+
+class DeviceListView(QueryBudgetMixin, ListAPIView):
+    """
+    The user's devices, newest first.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    serializer_class = UserDeviceSerializer
+    query_budget = 2
+
+    def get_queryset(self):
+        return UserDevice.objects.filter(user=self.request.user)
+
+
+class TokenListView(QueryBudgetMixin, ListAPIView):
+    """
+    The user's unexpired login tokens with their devices, newest first.
+    Signed tokens have no rows and are not listed.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    serializer_class = UserTokenSerializer
+    query_budget = 2
+
+    def get_queryset(self):
+        return Token.objects.filter(user=self.request.user, expires_at__gt=now()).select_related('device_id')
+
+
+class DeviceRevokeView(QueryBudgetMixin, APIView):
+    """
+    Sign device ``pk`` out. The current device signs out with logout instead.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Signed tokens add the revocation refresh and insert
+    query_budget = 5
+
+    def delete(self, request, pk):
+        if pk == request.auth.device_pk or not UserDevice.objects.filter(user=request.user, pk=pk).exists():
+            raise CustomException(DeviceErrorMessages.NOT_FOUND, status_code=status.HTTP_404_NOT_FOUND)
+        revoked = revoke_tokens(request.user, devices=[pk])
+        return Response({'status': True, 'revoked': revoked}, status=status.HTTP_200_OK)
+
+
+class RevokeOtherDevicesView(QueryBudgetMixin, APIView):
+    """
+    Sign every device but the current one out.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Signed tokens add the device lookup and revocation insert
+    query_budget = 5
+
+    def post(self, request):
+        revoked = revoke_tokens(request.user, exclude_device=request.auth.device_pk)
+        return Response({'status': True, 'revoked': revoked}, status=status.HTTP_200_OK)
+
+
+class BulkImportView(APIView):
+    """
+    Admin-only bulk user import from an uploaded CSV or JSONL ``file``.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsSuperUser]
+    max_rejections = 1000
+
+    def post(self, request):
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            raise CustomValidationError(ImportErrorMessages.FILE_REQUIRED)
+        fmt = request.data.get('format') or uploaded_file.name.rsplit('.', 1)[-1].lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CustomValidationError(ImportErrorMessages.FORMAT_INVALID)
+        serializer = BulkImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            raise CustomValidationError(ImportErrorMessages.BATCH_SIZE_INVALID)
+
+        importer = UserImporter(
+            batch_size=serializer.validated_data['batch_size'],
+            executor='pool',
+            dry_run=str(request.data.get('dry_run', '')).lower() == 'true',
+            max_rejections=self.max_rejections,
+        )
+        report = importer.run(iter_uploaded_records(uploaded_file, fmt))
+        return Response(
+            {
+                'status': True,
+                **report.summary(),
+                'rejections': report.rejections,
+            },
+            status=status.HTTP_200_OK,
+        )
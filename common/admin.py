@@ -0,0 +1,56 @@
+"""
+Admin building blocks for tables too large to count or sort on every page view.
+
+``LargeTableAdmin`` pages on the primary key index, never runs an unfiltered
+``COUNT(*)`` and takes the result count from PostgreSQL's planner statistics
+once it is large, see ``EstimatedCountPaginator``. Django's per-object
+``delete_selected`` action is removed, subclasses provide set-based actions.
+"""
+import json
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """
+    Planner estimate of the rows in ``queryset``, or ``None`` when not on PostgreSQL.
+
+    Unfiltered, it comes from ``pg_class.reltuples`` as kept by autovacuum and
+    ANALYZE; filtered, from the column statistics. No rows are read.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Exact counts below ``exact_below`` rows, where they are cheap and the
+    estimate is least reliable, planner estimates above.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_below:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Newest first on the primary key index, model orderings sort unindexed columns
+    ordering = ('-pk',)
+    list_per_page = 50
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Loads and deletes every selected object and its relations one by one
+        actions.pop('delete_selected', None)
+        return actions
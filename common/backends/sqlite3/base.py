@@ -0,0 +1,23 @@
+"""
+SQLite backend accepting ``CharField`` without ``max_length``.
+
+The models follow Postgres and leave most ``CharField`` lengths unbounded.
+SQLite ignores varchar lengths anyway, so those columns become plain
+``varchar`` here. Used by the benchmark settings only.
+"""
+from django.db.backends.sqlite3 import base, features
+
+
+def _get_varchar_column(data):
+    if data['max_length'] is None:
+        return 'varchar'
+    return 'varchar(%(max_length)s)' % data
+
+
+class DatabaseFeatures(features.DatabaseFeatures):
+    supports_unlimited_charfield = True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    data_types = {**base.DatabaseWrapper.data_types, 'CharField': _get_varchar_column}
+    features_class = DatabaseFeatures
@@ -0,0 +1,233 @@
+"""
+Primary/replica database routing.
+
+Reads go to a healthy replica from ``DATABASE_REPLICAS`` only inside a
+request marked by ``ReplicaRoutingMiddleware`` and only while nothing pins
+it to the primary:
+
+- Unsafe methods (sign-up, login, logout) read from the primary, their reads
+  feed the writes that follow.
+- A write in a safe request pins the rest of that request.
+- ``pin_client(key)`` pins a token for ``PIN_SECONDS`` across requests and
+  processes through the shared cache. Newly issued tokens and the tokens of
+  writing requests are pinned, so a token is never looked up on a replica
+  that has not caught up with its creation yet.
+
+Replica lag is checked at most every ``LAG_CHECK_INTERVAL`` seconds per
+process. The probe is bounded by ``PROBE_TIMEOUT`` seconds of statement time and
+the replicas' ``connect_timeout``, it runs on the request that claims the check.
+Replicas that lag more than ``MAX_LAG`` seconds, or cannot be queried in time,
+are skipped until the next check; with none left reads fall back to
+the primary. Management commands and background threads always use the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger("core")
+
+DEFAULTS = {
+    'PIN_SECONDS': 5,
+    'MAX_LAG': 2.0,
+    'LAG_CHECK_INTERVAL': 5,
+    'PROBE_TIMEOUT': 1.0,
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'db:pin:',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+class RoutingState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def _pin_key(key):
+    return f"{get_options()['KEY_PREFIX']}{key}"
+
+
+def pin_client(key):
+    """
+    Read from the primary for requests authenticated with ``key`` for a while.
+    """
+    if key and settings.DATABASE_REPLICAS:
+        options = get_options()
+        caches[options['CACHE_ALIAS']].set(_pin_key(key), 1, options['PIN_SECONDS'])
+
+
+async def apin_client(key):
+    if key and settings.DATABASE_REPLICAS:
+        options = get_options()
+        await caches[options['CACHE_ALIAS']].aset(_pin_key(key), 1, options['PIN_SECONDS'])
+
+
+class ReplicaHealth:
+    """
+    Per-process view of which replicas are within ``MAX_LAG``.
+    """
+
+    def __init__(self):
+        self._healthy = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def healthy(self):
+        if self._claim_check():
+            self.check()
+        return self._healthy if self._healthy is not None else []
+
+    def _claim_check(self):
+        # Only one thread per interval queries the replicas
+        with self._lock:
+            if time.monotonic() < self._next_check:
+                return False
+            self._next_check = time.monotonic() + get_options()['LAG_CHECK_INTERVAL']
+            return True
+
+    def check(self):
+        max_lag = get_options()['MAX_LAG']
+        healthy = []
+        for alias in settings.DATABASE_REPLICAS:
+            lag = self.lag(alias)
+            if lag is not None and lag <= max_lag:
+                healthy.append(alias)
+            else:
+                logger.warning("Replica %s skipped, lag %s", alias, lag)
+        self._healthy = healthy
+        return healthy
+
+    @staticmethod
+    def lag(alias):
+        """
+        Replay lag of ``alias`` in seconds, 0 when fully replayed, ``None`` when unreachable.
+        """
+        connection = connections[alias]
+        timeout = int(get_options()['PROBE_TIMEOUT'] * 1000)
+        try:
+            with connection.cursor() as cursor:
+                # A replica that accepts connections but stalls must not hold the request
+                cursor.execute("SET statement_timeout = %s", [timeout])
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                    "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                lag = float(cursor.fetchone()[0])
+                cursor.execute("RESET statement_timeout")
+                return lag
+        except Exception:
+            logger.exception("Replica %s lag check failed", alias)
+            connection.close()
+            return None
+
+    def reset(self):
+        with self._lock:
+            self._healthy = None
+            self._next_check = 0.0
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned or state.wrote or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        replicas = replica_health.healthy()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _token_key(request):
+    parts = request.headers.get('Authorization', '').split()
+    return parts[1] if len(parts) == 2 else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Marks the request for ``PrimaryReplicaRouter`` and pins the client after writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        key = _token_key(request)
+        state = RoutingState(pinned=self.pinned(request, key))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            pin_client(key)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        key = _token_key(request)
+        pinned = request.method not in SAFE_METHODS
+        if not pinned and key:
+            options = get_options()
+            pinned = await caches[options['CACHE_ALIAS']].aget(_pin_key(key)) is not None
+        state = RoutingState(pinned=pinned)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            await apin_client(key)
+        return response
+
+    @staticmethod
+    def pinned(request, key):
+        if request.method not in SAFE_METHODS:
+            return True
+        if not key:
+            return False
+        options = get_options()
+        return caches[options['CACHE_ALIAS']].get(_pin_key(key)) is not None
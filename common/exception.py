@@ -16,10 +16,31 @@ class UserValidationMessages:
     PASSWORD_LENGTH_INVALID = '8~16자로 입력하세요.'
     PASSWORD_STRENGTH_INVALID = '소문자, 대문자, 숫자, 특수문자가 포함되어야 합니다.'
     DEVICE_ID_REQUIRED = '디바이스 정보가 필요합니다.'
+    DEVICE_ID_ALREADY_EXISTS = '이미 등록된 기기입니다.'
 
 
 class LoginErrorMessages:
     WRONG_EMAIL_OR_PASSWORD = '이메일 혹은 비밀번호를 확인해 주세요'
+    TOO_MANY_ATTEMPTS = '로그인 시도가 너무 많습니다. 잠시 후 다시 시도해 주세요.'
+
+
+class ImportErrorMessages:
+    INVALID_ROW = '읽을 수 없는 행입니다.'
+    FILE_REQUIRED = '파일을 첨부해 주세요.'
+    FORMAT_INVALID = 'csv 또는 jsonl 파일만 가능합니다.'
+    BATCH_SIZE_INVALID = 'batch_size는 1 이상 10000 이하의 정수여야 합니다.'
+
+
+class DeviceErrorMessages:
+    NOT_FOUND = '등록된 기기를 찾을 수 없습니다.'
+
+
+class PaginationErrorMessages:
+    CURSOR_INVALID = '잘못된 페이지 정보입니다.'
+
+
+class ServerErrorMessages:
+    SERVER_BUSY = '요청이 많아 잠시 후 다시 시도해 주세요.'
 
 
 class ExceptionLevel(Enum):
@@ -60,11 +81,25 @@ class CustomException(Exception):
 class CustomValidationError(CustomException):
     def __init__(self, message):
         super().__init__(message, status_code=400)
+
+
+class CustomThrottledError(CustomException):
+    def __init__(self, message, retry_after):
+        super().__init__(message, status_code=429)
+        self.retry_after = retry_after
         
 
+
 def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
 
+    if isinstance(exc, CustomThrottledError):
+        return Response(
+            {'message': exc.message, 'retry_after': exc.retry_after},
+            status=exc.status_code,
+            headers={'Retry-After': str(exc.retry_after)},
+        )
+
     if isinstance(exc, CustomException):
         return Response({'message': exc.message}, status=exc.status_code)
     
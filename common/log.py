@@ -0,0 +1,257 @@
+"""
+Logging handlers, filters and formatters referenced from ``LOGGING`` in
+core/configs/base.py.
+
+Records are written off the request path: ``QueueHandler`` only puts a
+prepared record on a bounded queue and a ``QueueListener`` thread formats and
+writes it, so a slow disk or a file rotation never blocks a request. When the
+queue is full the record is dropped and counted rather than waited on.
+
+``RequestIdMiddleware`` tags each request with an id, taken from a valid
+``X-Request-ID`` header or generated, that ``RequestIdFilter`` adds to every
+record logged while the request runs and that ``JSONFormatter`` writes out.
+``AuthFailureSampleFilter`` keeps only a fraction of the 401/403 warnings
+Django logs for every rejected request.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+import weakref
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_request_id = ContextVar('request_id', default=None)
+# Client supplied ids are kept only when they are short and safe to log
+_valid_request_id = re.compile(r'^[A-Za-z0-9._-]{1,64}$').match
+
+# LogRecord attributes that are not ``extra`` fields
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+class RequestIdMiddleware:
+    """
+    Sets the request id for the duration of the request and echoes it in the response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def request_id(request):
+        value = request.headers.get(REQUEST_ID_HEADER)
+        if not (value and _valid_request_id(value)):
+            value = uuid.uuid4().hex
+        # Django logs error responses after the middleware returns
+        request.request_id = value
+        return value
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_id = self.request_id(request)
+        token = _request_id.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self.request_id(request)
+        token = _request_id.set(request_id)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get() or getattr(getattr(record, 'request', None), 'request_id', None)
+        return True
+
+
+class AuthFailureSampleFilter(logging.Filter):
+    """
+    Keep ``rate`` of the records about 401 and 403 responses, e.g. Django's
+    "Unauthorized: /path" warnings. Kept records carry ``sample_rate``.
+    """
+    STATUS_CODES = (401, 403)
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if self.rate >= 1 or getattr(record, 'status_code', None) not in self.STATUS_CODES:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        return False
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line with the record's ``extra`` fields.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DirectoryMixin:
+    # Open the file, and create its directory, on the first record rather than
+    # when logging is configured
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class FileHandler(_DirectoryMixin, logging.FileHandler):
+    def __init__(self, filename, mode='a', encoding=None, delay=True, errors=None):
+        super().__init__(filename, mode, encoding, delay, errors)
+
+
+class RotatingFileHandler(_DirectoryMixin, logging.handlers.RotatingFileHandler):
+    def __init__(self, filename, max_bytes=0, backup_count=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+
+
+class QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Waits for room when the queue is full, the writer is still draining it
+        self.queue.put(self._sentinel)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background thread that writes them with ``target``.
+
+    Filters run in the logging thread, so context variables such as the
+    request id are read there. The formatter set by ``dictConfig`` is given to
+    ``target`` and applied in the writer thread.
+    """
+
+    def __init__(self, target, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.target = target
+        self.dropped = 0
+        # Started with the first record, processes that never log get no thread
+        self.listener = None
+        self.start_lock = threading.Lock()
+        _queue_handlers.add(self)
+
+    def start(self):
+        with self.start_lock:
+            if self.listener is None:
+                self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self):
+        with self.start_lock:
+            if self.listener is not None:
+                # Writes out what is queued before returning
+                self.listener.stop()
+                self.listener = None
+
+    def after_fork(self):
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.listener = None
+        self.start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Only what cannot wait: merge the arguments and render the traceback
+        # while they still describe this moment, the rest is formatted later
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        request = vars(record).pop('request', None)
+        if request is not None:
+            # Django's request logger passes the request itself
+            record.method, record.path = request.method, request.path
+        return record
+
+    def enqueue(self, record):
+        if self.listener is None:
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            # Imported here, logging is configured before the apps are loaded
+            from common.metrics import LOG_RECORDS_DROPPED
+            LOG_RECORDS_DROPPED.inc()
+
+    def flush(self):
+        # Wait until everything queued so far is written
+        if self.listener is not None:
+            self.stop()
+            self.start()
+        self.target.flush()
+
+    def close(self):
+        self.stop()
+        self.target.close()
+        super().close()
+
+
+_queue_handlers = weakref.WeakSet()
+
+
+def _after_fork():
+    # A forked worker inherits the handlers but not their writer threads
+    for handler in list(_queue_handlers):
+        handler.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def queued_file(filename, max_bytes=0, backup_count=0, queue_size=10000):
+    """
+    ``dictConfig`` factory: a rotating log file written from a background thread.
+    """
+    return QueueHandler(RotatingFileHandler(filename, max_bytes, backup_count), queue_size)
@@ -0,0 +1,211 @@
+"""
+Prometheus metrics and the ``/metrics`` endpoint.
+
+Metrics are plain ``prometheus_client`` objects updated in-process. With
+``PROMETHEUS_MULTIPROC_DIR`` set in the environment before the workers start,
+each gunicorn/uvicorn worker writes its samples to its own mmap file in that
+directory and ``/metrics`` aggregates them, so there is no lock shared
+between processes. Database connection state is read from ``pg_stat_activity``
+when scraped rather than tracked per request.
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger("core")
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Client addresses allowed to scrape, empty allows any
+    'ALLOWED_IPS': [],
+}
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by view, method and status.', ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by view.', ['view', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries', 'SQL queries per request by view.', ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, float('inf')),
+)
+AUTH_OUTCOMES = Counter(
+    'auth_attempts_total',
+    'Token authentication outcomes: success, missing, malformed, invalid, expired, revoked, device_changed.',
+    ['outcome'],
+)
+LOGIN_THROTTLED = Counter(
+    'login_throttled_total', 'Login attempts rejected by the login throttle.',
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'password_hash_duration_seconds', 'Time spent hashing on the hashing pool.', ['operation'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PASSWORD_HASH_QUEUE = Histogram(
+    'password_hash_queue_seconds', 'Time hashing calls wait for a worker.',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+TOKEN_CACHE_LOOKUPS = Counter(
+    'token_cache_lookups_total', 'Token cache lookups: local_hit, shared_hit, miss.', ['result'],
+)
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total', 'Log records dropped because the log queue was full.',
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened_total', 'Database connections opened by this process.', ['alias'],
+)
+
+_queries = ContextVar('metrics_queries', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+def record_auth(outcome):
+    AUTH_OUTCOMES.labels(outcome).inc()
+
+
+class QueryTally:
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self.count = 0
+
+
+def count_query(execute, sql, params, many, context):
+    tally = _queries.get()
+    if tally is not None:
+        tally.count += 1
+    return execute(sql, params, many, context)
+
+
+def on_connection_created(connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+    install_query_counter(connection)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+class MetricsMiddleware:
+    """
+    Request count, latency and query count per resolved view name.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(on_connection_created)
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        tally = QueryTally()
+        token = _queries.set(tally)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, tally)
+        return response
+
+    async def __acall__(self, request):
+        tally = QueryTally()
+        token = _queries.set(tally)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.observe(request, response, time.perf_counter() - started, tally)
+        return response
+
+    @staticmethod
+    def observe(request, response, duration, tally):
+        # Resolved route names only, raw paths would make the label set unbounded
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unmatched>'
+        if view == 'metrics':
+            return
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        REQUEST_QUERIES.labels(view).observe(tally.count)
+
+
+class DatabaseCollector:
+    """
+    Connection counts by state from ``pg_stat_activity``, read at scrape time.
+    """
+
+    def collect(self):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'postgresql':
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT coalesce(state, 'unknown'), count(*) FROM pg_stat_activity "
+                    "WHERE datname = current_database() GROUP BY 1"
+                )
+                states = cursor.fetchall()
+                cursor.execute("SHOW max_connections")
+                maximum = int(cursor.fetchone()[0])
+        except Exception:
+            logger.exception("Could not read pg_stat_activity")
+            return
+
+        family = GaugeMetricFamily('db_connections', 'Server connections to this database by state.', labels=['state'])
+        for state, count in states:
+            family.add_metric([state], count)
+        yield family
+        yield GaugeMetricFamily('db_connections_max', 'Server max_connections.', value=maximum)
+
+
+database_registry = CollectorRegistry(auto_describe=False)
+database_registry.register(DatabaseCollector())
+
+
+def worker_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    options = get_options()
+    if not options['ENABLED']:
+        raise Http404
+    if options['ALLOWED_IPS'] and request.META.get('REMOTE_ADDR') not in options['ALLOWED_IPS']:
+        raise Http404
+    output = generate_latest(worker_registry()) + generate_latest(database_registry)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
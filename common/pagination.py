@@ -0,0 +1,72 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from common.exception import CustomValidationError, PaginationErrorMessages
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest first on ``(created_at, id)``, continuing after the last row of the
+    previous page instead of skipping an offset.
+
+    With an index on ``(<filter columns>, created_at, id)`` every page is one
+    index range scan of ``page_size + 1`` rows, however deep the client pages.
+    The cursor is opaque to clients, they follow ``next`` until it is null.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if position is not None:
+            created_at, pk = position
+            # (created_at, id) < (c, i), the first condition bounds the index range
+            queryset = queryset.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk))
+
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'status': True, 'results': data, 'next': self.get_next_link()})
+
+    @staticmethod
+    def encode_cursor(row):
+        value = f'{row.created_at.isoformat()}|{row.pk}'
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            created_at, pk = value.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise CustomValidationError(PaginationErrorMessages.CURSOR_INVALID)
@@ -0,0 +1,41 @@
+"""
+JSON parsing with orjson, see ``common.renderers``.
+
+Falls back to DRF's ``JSONParser`` without orjson installed, for bodies that
+are not UTF-8, and when ``STRICT_JSON`` is off (orjson never accepts NaN).
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+UTF8 = ('utf-8', 'utf8')
+
+
+def loads(body):
+    """
+    ``json.loads`` for request bodies, raises ``ValueError`` on invalid JSON.
+    """
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower() not in UTF8:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            # Rejects NaN and Infinity like JSONParser's STRICT_JSON
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,376 @@
+"""
+Preforking server behind `manage.py serve`.
+
+The master loads the project once, binds the listening socket and forks the
+workers, so they share the imported code and the resolved URLconf. Each
+worker then runs ``warm_up()`` for what cannot be shared across a fork
+(database connections, cache clients, thread pools) and tells the master it
+is ready before it accepts its first connection.
+
+Signals to the master:
+
+SIGHUP           rolling restart, a new worker is started and warmed up
+                 before each old one is stopped, so capacity never drops
+SIGTERM, SIGINT  graceful shutdown, workers finish their current requests
+                 within ``graceful_timeout`` seconds and are killed after
+
+Workers that exit on their own are replaced. Workers that fail to start are
+retried with exponential backoff, and the master gives up with ``BootError``
+after ``max_boot_failures`` failures in a row.
+"""
+import logging
+import os
+import select
+import signal
+import socket
+import time
+
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("core")
+
+
+def iter_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def warm_up_urls():
+    """
+    Resolve the URLconf and build each DRF view's authenticators, permissions,
+    renderers and parsers. Shared by forked workers when run in the master.
+    """
+    resolver = get_resolver()
+    # Populates the reverse and namespace lookups as well
+    resolver.reverse_dict, resolver.namespace_dict
+    for view in iter_views(resolver.url_patterns):
+        view_class = getattr(view, 'cls', None)
+        if view_class is None or not hasattr(view_class, 'get_authenticators'):
+            continue
+        instance = view_class()
+        instance.get_authenticators()
+        instance.get_permissions()
+        instance.get_renderers()
+        instance.get_parsers()
+
+
+def preload():
+    """
+    Run in the master before forking: the URLconf and the modules Django
+    imports on a first request, so every worker shares them.
+    """
+    warm_up_urls()
+    for alias in connections:
+        # Imported by the first query
+        import_module(connections[alias].ops.compiler_module)
+    if apps.is_installed('django.contrib.sessions'):
+        import_module(settings.SESSION_ENGINE)
+        import_string(settings.SESSION_SERIALIZER)
+    if apps.is_installed('django.contrib.messages'):
+        import_string(settings.MESSAGE_STORAGE)
+
+
+def warm_up():
+    """
+    Build in this process what the first requests would otherwise build lazily.
+
+    Apps warm up their own state from a ``warm_up()`` method on their AppConfig.
+    """
+    started = time.perf_counter()
+    warm_up_urls()
+    for config in apps.get_app_configs():
+        if hasattr(config, 'warm_up'):
+            config.warm_up()
+    for alias in connections:
+        # Kept open for the first request under persistent connections or a pool
+        connections[alias].ensure_connection()
+    for alias in settings.CACHES:
+        caches[alias].get('warm-up')
+    logger.info("Worker %s warmed up in %.0f ms", os.getpid(), (time.perf_counter() - started) * 1000)
+
+
+class BootError(Exception):
+    pass
+
+
+def bind(host, port, backlog=2048):
+    sock = socket.create_server((host, port), backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """
+    Forks ``workers`` processes that each call ``serve(sock)`` until SIGTERM.
+    """
+
+    # Seconds before retrying the first failed boot, doubled per failure in a row
+    boot_backoff = 0.5
+    max_boot_backoff = 30
+
+    def __init__(self, sock, serve, workers, graceful_timeout=30, warm_up_timeout=60, warm_up=warm_up,
+                 max_boot_failures=5):
+        self.sock = sock
+        self.serve = serve
+        self.size = workers
+        self.graceful_timeout = graceful_timeout
+        self.warm_up_timeout = warm_up_timeout
+        self.warm_up = warm_up
+        self.max_boot_failures = max_boot_failures
+        self.boot_failures = 0
+        self.next_boot = 0.0
+        # pid -> read end of the worker's readiness pipe
+        self.workers = {}
+        self.signals = []
+        self.stopping = False
+        self.wakeup_r = self.wakeup_w = None
+
+    def run(self):
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self.on_signal)
+        # Nothing forked may hold the master's connections
+        connections.close_all()
+
+        try:
+            for pid in [self.spawn() for _ in range(self.size)]:
+                self.boot(pid)
+            logger.info("Serving on %s:%s with %s workers", *self.sock.getsockname()[:2], len(self.workers))
+            while not self.stopping:
+                self.sleep()
+                self.handle_signals()
+                self.reap()
+                if not self.stopping:
+                    self.replace_dead()
+        finally:
+            self.stop_all()
+
+    def on_signal(self, signum, frame):
+        self.signals.append(signum)
+        try:
+            os.write(self.wakeup_w, b'.')
+        except BlockingIOError:
+            pass
+
+    def sleep(self):
+        if not self.signals:
+            select.select([self.wakeup_r], [], [], 1.0)
+        try:
+            while os.read(self.wakeup_r, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def handle_signals(self):
+        while self.signals:
+            signum = self.signals.pop(0)
+            if signum in (signal.SIGTERM, signal.SIGINT):
+                logger.info("Shutting down")
+                self.stopping = True
+            elif signum == signal.SIGHUP:
+                logger.info("Restarting workers")
+                self.reload()
+
+    def spawn(self):
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            self.run_worker(ready_w)
+        os.close(ready_w)
+        self.workers[pid] = ready_r
+        return pid
+
+    def run_worker(self, ready_w):
+        code = 0
+        try:
+            os.close(self.wakeup_r)
+            os.close(self.wakeup_w)
+            for fd in self.workers.values():
+                os.close(fd)
+            # The master relays shutdowns and restarts
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if self.warm_up:
+                self.warm_up()
+            os.write(ready_w, b'1')
+            os.close(ready_w)
+            self.serve(self.sock)
+        except BaseException:
+            logger.exception("Worker %s failed", os.getpid())
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def wait_ready(self, pid):
+        """
+        Whether worker ``pid`` warmed up within ``warm_up_timeout`` seconds.
+        """
+        fd = self.workers[pid]
+        deadline = time.monotonic() + self.warm_up_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([fd], [], [], remaining)
+            if readable:
+                # b'' when the worker died first
+                return os.read(fd, 1) == b'1'
+
+    def reload(self):
+        for old in list(self.workers):
+            new = self.spawn()
+            if not self.wait_ready(new):
+                logger.error("Worker %s did not start, keeping worker %s", new, old)
+                self.stop_worker(new, graceful=False)
+                return
+            self.stop_worker(old)
+
+    def stop_worker(self, pid, graceful=True):
+        self.kill(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+        deadline = time.monotonic() + self.graceful_timeout
+        while pid in self.workers:
+            if time.monotonic() > deadline:
+                self.kill(pid, signal.SIGKILL)
+                deadline = float('inf')
+            self.reap(pid)
+            if pid in self.workers:
+                time.sleep(0.05)
+
+    def stop_all(self):
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGKILL)
+            self.reap(pid, block=True)
+
+    def kill(self, pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reap(self, pid=-1, block=False):
+        while self.workers:
+            try:
+                reaped, status = os.waitpid(pid, 0 if block else os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not reaped:
+                return
+            fd = self.workers.pop(reaped, None)
+            if fd is not None:
+                os.close(fd)
+                self.worker_exited(reaped, status)
+            if pid != -1:
+                return
+
+    def worker_exited(self, pid, status):
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+        if not self.stopping and os.waitstatus_to_exitcode(status):
+            logger.warning("Worker %s exited with %s", pid, os.waitstatus_to_exitcode(status))
+
+    def boot(self, pid):
+        """
+        Wait for the new worker ``pid``. One that does not start is killed and
+        the next boot is delayed, ``BootError`` after too many in a row.
+        """
+        if self.wait_ready(pid):
+            self.boot_failures = 0
+            return True
+        self.stop_worker(pid, graceful=False)
+        self.boot_failures += 1
+        if self.boot_failures >= self.max_boot_failures:
+            raise BootError(f"{self.boot_failures} workers in a row failed to start")
+        delay = min(self.boot_backoff * 2 ** (self.boot_failures - 1), self.max_boot_backoff)
+        self.next_boot = time.monotonic() + delay
+        logger.error("Worker %s did not start, retrying in %.1fs", pid, delay)
+        return False
+
+    def replace_dead(self):
+        while len(self.workers) < self.size and time.monotonic() >= self.next_boot:
+            if not self.boot(self.spawn()):
+                return
+
+
+def serve_wsgi(sock, application, poll_interval=0.5, timeout=30):
+    """
+    Handle one request at a time on ``sock`` until SIGTERM, like a sync worker.
+
+    A connection that sends nothing for ``timeout`` seconds is dropped, so a
+    slow or idle client holds the worker, and delays its shutdown, for at most
+    that long per read. Put a buffering proxy in front for slow clients.
+    """
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+    class RequestHandler(WSGIRequestHandler):
+        def handle(self):
+            try:
+                super().handle()
+            except TimeoutError:
+                logger.warning("Dropped connection from %s, no data for %ss", self.client_address[0], timeout)
+
+        def log_message(self, format, *args):
+            # Responses are logged by Django and the metrics middleware
+            pass
+
+    # Applied to each accepted connection by StreamRequestHandler.setup
+    RequestHandler.timeout = timeout
+
+    server = WSGIServer(sock.getsockname()[:2], RequestHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    # No reverse lookup of the address, unlike HTTPServer.server_bind
+    server.server_name, server.server_port = sock.getsockname()[:2]
+    server.setup_environ()
+    server.set_app(application)
+    server.timeout = poll_interval
+
+    running = True
+
+    def stop(signum, frame):
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    while running:
+        # Returns after poll_interval without a connection, a request in
+        # progress is finished before the flag is checked again
+        server.handle_request()
+
+
+def serve_asgi(sock, application, graceful_timeout=30):
+    """
+    Run uvicorn on ``sock`` until SIGTERM.
+    """
+    import uvicorn
+
+    config = uvicorn.Config(
+        application,
+        lifespan='off',
+        log_config=None,
+        access_log=False,
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
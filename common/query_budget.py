@@ -0,0 +1,101 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+logger = logging.getLogger("core")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    ``connection.execute_wrapper`` callable counting executed statements.
+    Works with DEBUG off, unlike ``connection.queries``.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin:
+    """
+    Declares the maximum number of SQL queries a view may run per request.
+
+    ``QUERY_BUDGET_MODE`` setting:
+        'off'     - no counting
+        'log'     - log a warning when a request goes over budget
+        'enforce' - raise ``QueryBudgetExceeded``
+
+    Queries on every alias in ``DATABASES`` count, replica reads included.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if self.query_budget is None or mode == 'off':
+            return super().dispatch(request, *args, **kwargs)
+
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = super().dispatch(request, *args, **kwargs)
+
+        if counter.count > self.query_budget:
+            message = "%s ran %d queries, budget is %d" % (
+                self.__class__.__name__, counter.count, self.query_budget
+            )
+            if mode == 'enforce':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class _AssertQueryBudgetContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection):
+        self.test_case = test_case
+        self.budget = budget
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        # TestCase runs inside a transaction, so atomic() blocks add savepoints
+        # that are a BEGIN/COMMIT outside tests, not statements
+        queries = [
+            query for query in self.captured_queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
+        ]
+        executed = len(queries)
+        self.test_case.assertLessEqual(
+            executed,
+            self.budget,
+            "%d queries executed, budget is %d\nCaptured queries were:\n%s" % (
+                executed,
+                self.budget,
+                "\n".join(
+                    "%d. %s" % (i, query["sql"])
+                    for i, query in enumerate(queries, start=1)
+                ),
+            ),
+        )
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin asserting a block stays within a view's ``query_budget``.
+    """
+
+    def assertQueryBudget(self, view_class, using=DEFAULT_DB_ALIAS):
+        return _AssertQueryBudgetContext(self, view_class.query_budget, connections[using])
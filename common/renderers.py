@@ -0,0 +1,38 @@
+"""
+JSON rendering with orjson.
+
+``FastJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` with
+the default ``UNICODE_JSON``/``COMPACT_JSON`` settings: UTF-8 without ``\\u``
+escapes, no whitespace, and U+2028/U+2029 escaped. Datetimes, decimals and
+lazy strings go through DRF's encoder. Without orjson installed, with
+``indent`` requested, or with other settings, it is DRF's renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Hand these to DRF's encoder, orjson formats them differently
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder.default, option=OPTIONS)
+        # Same JavaScript-safe escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
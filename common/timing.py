@@ -0,0 +1,199 @@
+"""
+Per-request timing spans reported in a ``Server-Timing`` header.
+
+``ServerTimingMiddleware`` keeps a ``Timing`` in a context variable for the
+duration of a request. Code on the request path wraps interesting work in
+``span(name)`` or ``@timed(name)``; every SQL statement is added to the
+``db`` span by a connection execute wrapper. Spans may nest, e.g. ``hash``
+inside ``validate`` on login. Outside a timed request a span only does one
+context variable lookup, and with ``SERVER_TIMING['ENABLED']`` off the
+middleware removes itself at startup.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("core")
+
+DEFAULTS = {
+    'ENABLED': False,
+    'HEADER': True,
+    # Fraction of requests whose spans are logged to the "core" logger
+    'LOG_SAMPLE_RATE': 0.0,
+}
+
+_current = ContextVar('server_timing', default=None)
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'SERVER_TIMING', {})}
+
+
+class Timing:
+    __slots__ = ('spans', 'started')
+
+    def __init__(self):
+        # name -> [total seconds, count], in first-seen order
+        self.spans = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, duration):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [duration, 1]
+        else:
+            entry[0] += duration
+            entry[1] += 1
+
+    def header(self):
+        parts = []
+        for name, (duration, count) in self.spans.items():
+            part = f'{name};dur={duration * 1000:.2f}'
+            if name == 'db':
+                part += f';desc="{count} queries"'
+            parts.append(part)
+        return ', '.join(parts)
+
+
+def record(name, duration):
+    """
+    Add an externally measured ``duration`` in seconds to span ``name``.
+    """
+    timing = _current.get()
+    if timing is not None:
+        timing.add(name, duration)
+
+
+class span:
+    """
+    Context manager timing its block into span ``name``.
+    """
+    __slots__ = ('name', 'timing', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timing = _current.get()
+        if self.timing is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timing is not None:
+            self.timing.add(self.name, time.perf_counter() - self.started)
+
+
+def timed(name):
+    """
+    Decorator timing each call of a sync or async function into span ``name``.
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def time_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add('db', time.perf_counter() - started)
+
+
+def install_query_timer(connection, **kwargs):
+    # First in the chain, QueryBudgetMixin pops the last wrapper it pushed.
+    # sync_to_async copies the context, so queries from async views are counted too
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+class TimedValidationMixin:
+    """
+    Serializer mixin timing ``is_valid()`` as the ``validate`` span.
+    """
+
+    def is_valid(self, *args, **kwargs):
+        with span('validate'):
+            return super().is_valid(*args, **kwargs)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the request's spans and adds ``total`` when the response is ready.
+
+    Goes first in ``MIDDLEWARE`` so ``total`` covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.options = get_options()
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_timer)
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timing = Timing()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = Timing()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        timing = _current.get()
+        if timing is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda r: timing.add('render', time.perf_counter() - started))
+        return response
+
+    def finish(self, request, response, timing):
+        timing.add('total', time.perf_counter() - timing.started)
+        header = timing.header()
+        if self.options['HEADER']:
+            response['Server-Timing'] = header
+        rate = self.options['LOG_SAMPLE_RATE']
+        if rate and random.random() < rate:
+            logger.info("%s %s %s %s", request.method, request.path, response.status_code, header)
+        return response
@@ -1,5 +1,7 @@
 import re
 
+from django.utils.http import parse_etags
+
 
 def is_valid_email_format(email):
     if not re.match(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$', email):
@@ -25,4 +27,14 @@ def is_valid_password_length(password):
 def is_password_str_num_included(password):
     if not any(char.isalpha() for char in password) or not any(char.isdigit() for char in password):
         return False
-    return True
\ No newline at end of file
+    return True
+
+def etag_matches(request, etag):
+    """
+    Whether the request's If-None-Match lists ``etag``, compared weakly as RFC 9110 requires.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or any(tag.removeprefix('W/') == etag for tag in etags)
@@ -0,0 +1,85 @@
+"""
+Email and password rules for sign-up and imports, compiled once.
+
+``CredentialRules`` gives the same answers, in the same order, as the
+``common.utils`` checks:
+
+1. at least one letter and one digit (any script)
+2. ``min_length`` to ``max_length`` characters
+3. an ASCII lowercase letter, uppercase letter, digit and one of ``specials``
+
+A password is classified in a single ``bytes.translate`` pass over a
+precomputed 256-byte table. Non-ASCII characters (e.g. Korean letters) skip
+the table and are only checked with ``isalpha``/``isdigit``, for rule 1.
+"""
+import re
+import string
+
+from common.exception import UserValidationMessages
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
+SPECIALS = '@#$%^&+='
+
+# Character classes, as bytes of the translated password
+LOWER, UPPER, DIGIT, SPECIAL, OTHER = b'ludso'
+
+
+class CredentialRules:
+    def __init__(self, min_length=8, max_length=16, specials=SPECIALS, email_pattern=EMAIL_PATTERN):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.email_match = re.compile(email_pattern).match
+        table = bytearray([OTHER] * 256)
+        for chars, cls in (
+            (string.ascii_lowercase, LOWER),
+            (string.ascii_uppercase, UPPER),
+            (string.digits, DIGIT),
+            (specials, SPECIAL),
+        ):
+            for char in chars:
+                table[ord(char)] = cls
+        self.table = bytes(table)
+
+    def email_error(self, email):
+        if not self.email_match(email):
+            return UserValidationMessages.EMAIL_FORMAT_INVALID
+        return None
+
+    def password_error(self, password):
+        """
+        First message ``password`` fails, or ``None``.
+        """
+        if password.isascii():
+            classes = set(password.encode().translate(self.table))
+            has_alpha = LOWER in classes or UPPER in classes
+            has_digit = DIGIT in classes
+        else:
+            classes = set(password.encode('ascii', 'ignore').translate(self.table))
+            others = {char for char in password if not char.isascii()}
+            has_alpha = LOWER in classes or UPPER in classes or any(char.isalpha() for char in others)
+            has_digit = DIGIT in classes or any(char.isdigit() for char in others)
+        if not (has_alpha and has_digit):
+            return UserValidationMessages.PASSWORD_STR_NUM_REQUIRED
+        if not self.min_length <= len(password) <= self.max_length:
+            return UserValidationMessages.PASSWORD_LENGTH_INVALID
+        if not (LOWER in classes and UPPER in classes and DIGIT in classes and SPECIAL in classes):
+            return UserValidationMessages.PASSWORD_STRENGTH_INVALID
+        return None
+
+    def error(self, email, password):
+        return self.email_error(email) or self.password_error(password)
+
+    def errors(self, pairs):
+        """
+        Batch mode: the first message, or ``None``, for each ``(email, password)``.
+        """
+        email_match = self.email_match
+        password_error = self.password_error
+        email_invalid = UserValidationMessages.EMAIL_FORMAT_INVALID
+        return [
+            email_invalid if not email_match(email) else password_error(password)
+            for email, password in pairs
+        ]
+
+
+credential_rules = CredentialRules()
@@ -0,0 +1,44 @@
+"""
+API-only production profile (DJANGO_ENV=api).
+
+The deployment serves token-authenticated JSON only, so the admin, sessions,
+messages, static files and API docs are dropped along with their middleware,
+templates and DRF's session authentication and browsable renderer.
+`manage.py bench_settings` compares it with the production profile.
+"""
+from .production import *
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS
+    if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'rest_framework.authtoken',
+        'drf_yasg',
+    )
+]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'apps.users.authentication.CustomTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'common.renderers.FastJSONRenderer',
+    ],
+}
+
+TEMPLATES = []
@@ -14,8 +14,6 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 from pathlib import Path
 
-from tzlocal import get_localzone
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +39,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so every record logged for the request has its id
+    'common.log.RequestIdMiddleware',
+    # Next, so its total covers the rest of the stack
+    'common.timing.ServerTimingMiddleware',
+    'common.metrics.MetricsMiddleware',
+    'common.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,9 +66,118 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson backed, same output as DRF's JSON classes (common/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'common.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 AUTH_USER_MODEL = 'users.User'
+# User.email is unique among live users only (a partial unique index), which
+# is what ModelBackend looks up through the default manager
+SILENCED_SYSTEM_CHECKS = ['auth.E003']
+
+# Password hashing worker pool (apps/users/hashing.py)
+PASSWORD_HASHING_POOL = {
+    'EXECUTOR': os.getenv("PASSWORD_HASHING_EXECUTOR", "thread"),  # thread or process
+    'WORKERS': int(os.getenv("PASSWORD_HASHING_WORKERS", os.cpu_count() or 1)),
+    'QUEUE_SIZE': int(os.getenv("PASSWORD_HASHING_QUEUE_SIZE", 64)),
+    'TIMEOUT': int(os.getenv("PASSWORD_HASHING_TIMEOUT", 10)),
+    'REHASH_ON_LOGIN': os.getenv("PASSWORD_REHASH_ON_LOGIN", "true").lower() == "true",
+}
+
+# Cost parameters written by `manage.py calibrate_hasher`
+PASSWORD_HASHER_CALIBRATION_FILE = os.getenv(
+    "PASSWORD_HASHER_CALIBRATION_FILE", os.path.join(BASE_DIR, "hasher_calibration.json")
+)
+
+PASSWORD_HASHERS = [
+    'apps.users.hashers.CalibratedPBKDF2PasswordHasher',
+    'apps.users.hashers.CalibratedPBKDF2SHA1PasswordHasher',
+    'apps.users.hashers.CalibratedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Expired token reaper (apps/users/reaper.py, `manage.py reap_tokens`)
+TOKEN_REAPER = {
+    'BATCH_SIZE': int(os.getenv("TOKEN_REAPER_BATCH_SIZE", 1000)),
+    'SLEEP': float(os.getenv("TOKEN_REAPER_SLEEP", 0.1)),
+    # Run every INTERVAL seconds in the `manage.py serve` master, 0 leaves it to
+    # `manage.py reap_tokens` (--loop for a long-running reaper)
+    'INTERVAL': int(os.getenv("TOKEN_REAPER_INTERVAL", 0)),
+}
+
+# Login token format: opaque (user_token rows) or signed (apps/users/tokens.py).
+# Both formats are accepted by CustomTokenAuthentication either way
+USERS_TOKEN_FORMAT = os.getenv("USERS_TOKEN_FORMAT", "opaque")
+USERS_SIGNED_TOKEN = {
+    # Empty signs with SECRET_KEY
+    'SECRET': os.getenv("SIGNED_TOKEN_SECRET", ""),
+    'REVOCATION_REFRESH': int(os.getenv("TOKEN_REVOCATION_REFRESH", 5)),
+}
+
+# Serve the users API with the async-native views (apps/users/async_views.py), ASGI only
+USERS_ASYNC_VIEWS = os.getenv("USERS_ASYNC_VIEWS", "false").lower() == "true"
+
+# Server-Timing response header spans (common/timing.py), removed at startup when disabled
+SERVER_TIMING = {
+    'ENABLED': os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true",
+    'HEADER': True,
+    'LOG_SAMPLE_RATE': float(os.getenv("SERVER_TIMING_LOG_SAMPLE_RATE", 0)),
+}
+
+# Prometheus /metrics endpoint (common/metrics.py). Set PROMETHEUS_MULTIPROC_DIR to a
+# shared, emptied-on-start directory when running several worker processes
+METRICS = {
+    'ENABLED': os.getenv("METRICS_ENABLED", "false").lower() == "true",
+    'ALLOWED_IPS': [ip for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip],
+}
+
+# Read replicas (common/db_router.py). DATABASE_REPLICAS lists aliases in DATABASES,
+# production.py fills it from POSTGRES_REPLICA_HOSTS
+DATABASE_ROUTERS = ['common.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_ROUTING = {
+    # Seconds a client reads from the primary after a write or a new token
+    'PIN_SECONDS': int(os.getenv("DB_REPLICA_PIN_SECONDS", 5)),
+    'MAX_LAG': float(os.getenv("DB_REPLICA_MAX_LAG", 2)),
+    'LAG_CHECK_INTERVAL': int(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", 5)),
+    # Statement timeout of the lag probe in seconds
+    'PROBE_TIMEOUT': float(os.getenv("DB_REPLICA_PROBE_TIMEOUT", 1)),
+}
+
+# Per-view SQL query budgets (common/query_budget.py): off, log, enforce
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+
+# Failed login throttling (apps/users/throttling.py), counted in the shared cache
+USERS_LOGIN_THROTTLE = {
+    'ENABLED': os.getenv("LOGIN_THROTTLE_ENABLED", "true").lower() == "true",
+    'CACHE_ALIAS': 'default',
+    'WINDOW': int(os.getenv("LOGIN_THROTTLE_WINDOW", 900)),
+    'LIMITS': {
+        'email': int(os.getenv("LOGIN_THROTTLE_EMAIL_LIMIT", 5)),
+        'device': int(os.getenv("LOGIN_THROTTLE_DEVICE_LIMIT", 10)),
+        'ip': int(os.getenv("LOGIN_THROTTLE_IP_LIMIT", 50)),
+    },
+    'BACKOFF_BASE': int(os.getenv("LOGIN_THROTTLE_BACKOFF_BASE", 30)),
+    'BACKOFF_MAX': int(os.getenv("LOGIN_THROTTLE_BACKOFF_MAX", 3600)),
+}
+
+# Token verification cache (apps/users/cache.py)
+USERS_TOKEN_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'LOCAL_MAXSIZE': int(os.getenv("TOKEN_CACHE_LOCAL_MAXSIZE", 10000)),
+    'LOCAL_TTL': int(os.getenv("TOKEN_CACHE_LOCAL_TTL", 5)),
+    'SHARED_TTL': int(os.getenv("TOKEN_CACHE_SHARED_TTL", 300)),
+}
 
 TEMPLATES = [
     {
@@ -109,7 +222,15 @@ AUTH_PASSWORD_VALIDATORS = [
 
 LANGUAGE_CODE = 'en-us'
 
-TIME_ZONE = str(get_localzone())
+# The host's zone unless TIME_ZONE is set. Looking it up takes tens of
+# milliseconds at import, so the API-only profile defaults to UTC instead
+if os.getenv("TIME_ZONE"):
+    TIME_ZONE = os.getenv("TIME_ZONE")
+elif os.getenv("DJANGO_ENV") == "api":
+    TIME_ZONE = "UTC"
+else:
+    from tzlocal import get_localzone
+    TIME_ZONE = str(get_localzone())
 
 USE_I18N = True
 
@@ -127,14 +248,22 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Created with the log file on the first record (common/log.py)
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
-
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {
+            "()": "common.log.RequestIdFilter",
+        },
+        # Fraction of 401/403 "Unauthorized"/"Forbidden" records kept
+        "auth_failure_sample": {
+            "()": "common.log.AuthFailureSampleFilter",
+            "rate": float(os.getenv("LOG_AUTH_FAILURE_SAMPLE_RATE", 1)),
+        },
+    },
     "formatters": {
         "verbose": {
             "format": "[{levelname}][{asctime}][{name}]: {message}",
@@ -144,18 +273,26 @@ LOGGING = {
             "format": "[{levelname}][{asctime}][{name}] {message}",
             "style": "{",
         },
+        "json": {
+            "()": "common.log.JSONFormatter",
+        },
     },
     "handlers": {
         "console": { # development only console handler
             "level": "DEBUG",
             "class": "logging.StreamHandler",
             "formatter": "verbose",
+            "filters": ["auth_failure_sample"],
         },
-        "file": { # production file log handler
+        "file": { # production file log handler, written and rotated by a background thread
             "level": "WARNING",
-            "class": "logging.FileHandler",
+            "()": "common.log.queued_file",
             "filename": os.path.join(LOG_DIR, "django.log"),
-            "formatter": "verbose",
+            "max_bytes": int(os.getenv("LOG_FILE_MAX_BYTES", 10 * 1024 * 1024)),
+            "backup_count": int(os.getenv("LOG_FILE_BACKUP_COUNT", 5)),
+            "queue_size": int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+            "formatter": "json",
+            "filters": ["request_id", "auth_failure_sample"],
         },
     },
     "loggers": {
@@ -169,5 +306,11 @@ LOGGING = {
             "level": LOG_LEVEL,
             "propagate": False,
         },
+        # 4xx/5xx responses, one warning per rejected request
+        "django.request": {
+            "handlers": [],
+            "level": "WARNING",
+            "propagate": True,
+        },
     },
-}
\ No newline at end of file
+}
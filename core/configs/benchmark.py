@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import environ
+
+from .base import *
+from .database import configure_pooling
+
+env = environ.Env()
+
+# `manage.py bench_users` only runs against a throwaway test database created
+# from this connection, e.g. postgres://postgres@localhost/listener or sqlite:///bench.sqlite3
+DATABASES = {
+    "default": env.db(
+        "BENCH_DATABASE_URL",
+        default="sqlite:///" + os.path.join(tempfile.gettempdir(), "listener-bench.sqlite3"),
+    ),
+}
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # On-disk test database, shared-cache :memory: locks under concurrent writers
+    DATABASES["default"]["TEST"] = {
+        "NAME": os.path.join(tempfile.gettempdir(), "listener-bench-test.sqlite3"),
+    }
+    DATABASES["default"]["OPTIONS"] = {"timeout": 30}
+    # Unbounded CharFields are Postgres only, this backend maps them to varchar
+    DATABASES["default"]["ENGINE"] = "common.backends.sqlite3"
+    # 0002 builds its index with CREATE INDEX CONCURRENTLY, create tables from the models
+    MIGRATION_MODULES = {"users": None}
+
+# Compare DB_POOL_MODE=none, persistent and pool runs with bench_users
+configure_pooling(DATABASES["default"], env)
+
+ALLOWED_HOSTS = ["*"]
+
+DEBUG = False
+QUERY_BUDGET_MODE = "off"
+LOGGING["loggers"]["core"]["handlers"] = ["console"]
+LOGGING["loggers"]["core"]["level"] = "WARNING"
+LOGGING["loggers"]["apps"]["handlers"] = ["console"]
+LOGGING["loggers"]["apps"]["level"] = "WARNING"
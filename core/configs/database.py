@@ -0,0 +1,57 @@
+"""
+Connection reuse for ``DATABASES["default"]``, selected with ``DB_POOL_MODE``.
+
+none        a new connection for every request (``CONN_MAX_AGE = 0``)
+persistent  one connection per worker thread, kept for ``DB_CONN_MAX_AGE``
+            seconds and checked with ``CONN_HEALTH_CHECKS`` before reuse.
+            WSGI only: under ASGI requests hop between threads and the idle
+            connections of other threads are never closed, so it falls back
+            to ``none`` there.
+pool        psycopg 3 connection pool (Django's ``OPTIONS["pool"]``), sized
+            with ``DB_POOL_MIN_SIZE``/``DB_POOL_MAX_SIZE``. Works under WSGI
+            and ASGI, needs ``psycopg[pool]`` installed in place of psycopg2.
+
+``core/asgi.py`` and ``core/wsgi.py`` set ``DJANGO_SERVER_INTERFACE`` before
+settings are loaded.
+"""
+import os
+import warnings
+
+from django.core.exceptions import ImproperlyConfigured
+
+POOL_MODES = ("none", "persistent", "pool")
+
+
+def configure_pooling(database, env):
+    mode = env("DB_POOL_MODE", default="persistent")
+    if mode not in POOL_MODES:
+        raise ImproperlyConfigured(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, got {mode!r}.")
+
+    interface = os.getenv("DJANGO_SERVER_INTERFACE", "wsgi")
+    if mode == "persistent" and interface == "asgi":
+        warnings.warn("DB_POOL_MODE=persistent is not safe under ASGI, using none. Use pool instead.")
+        mode = "none"
+
+    database["CONN_HEALTH_CHECKS"] = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+    if mode == "persistent":
+        database["CONN_MAX_AGE"] = env.int("DB_CONN_MAX_AGE", default=60)
+    else:
+        database["CONN_MAX_AGE"] = 0
+
+    if mode == "pool":
+        if database["ENGINE"] != "django.db.backends.postgresql":
+            raise ImproperlyConfigured("DB_POOL_MODE=pool is only supported on PostgreSQL.")
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError as exc:
+            raise ImproperlyConfigured("DB_POOL_MODE=pool needs psycopg[pool] installed.") from exc
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+            # Seconds a request waits for a free connection before failing
+            "timeout": env.float("DB_POOL_TIMEOUT", default=10),
+            "max_idle": env.float("DB_POOL_MAX_IDLE", default=300),
+            "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=3600),
+        }
+
+    return database
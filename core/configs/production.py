@@ -3,6 +3,7 @@ import os
 import environ
 
 from .base import *
+from .database import configure_pooling
 
 env = environ.Env()
 
@@ -23,16 +24,42 @@ DATABASES = {
         "USER": env("POSTGRES_USER"),
         "PASSWORD": env("POSTGRES_PASSWORD"),
         "HOST": env("POSTGRES_HOST"),
-        "PORT": env("POSTGRES_PORT", "5432"),
+        "PORT": env("POSTGRES_PORT", default="5432"),
     }
 }
+# DB_POOL_MODE: none, persistent (default) or pool, see core/configs/database.py
+configure_pooling(DATABASES["default"], env)
 
+# Streaming replicas with the primary's credentials, e.g. replica-1:5432,replica-2
+for index, host in enumerate(env.list("POSTGRES_REPLICA_HOSTS", default=[])):
+    replica_host, _, replica_port = host.partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        # Unreachable replicas fail the lag probe fast instead of holding a request
+        "OPTIONS": {
+            **DATABASES["default"].get("OPTIONS", {}),
+            "connect_timeout": env.int("DB_REPLICA_CONNECT_TIMEOUT", default=2),
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+    configure_pooling(DATABASES[alias], env)
+    DATABASE_REPLICAS.append(alias)
+
+# Shared cache backend, e.g. redis://redis:6379/0
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
 
 # CORS 설정 (필요한 도메인만 허용)
 CORS_ALLOWED_ORIGINS = []
 
 DEBUG = False
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
 LOGGING["loggers"]["core"]["handlers"] = ["file"]
 LOGGING["loggers"]["core"]["level"] = "WARNING"
 LOGGING["loggers"]["apps"]["handlers"] = ["file"]
 LOGGING["loggers"]["apps"]["level"] = "WARNING"
+LOGGING["loggers"]["django.request"]["handlers"] = ["file"]
@@ -10,5 +10,9 @@ if ENVIRONMENT == "production":
     from .configs.production import *
 elif ENVIRONMENT == "development":
     from .configs.development import *
+elif ENVIRONMENT == "api":
+    from .configs.api import *
+elif ENVIRONMENT == "benchmark":
+    from .configs.benchmark import *
 else:
-    raise ValueError("Invalid DJANGO_ENV value. Choose 'development' or 'production'.")
+    raise ValueError("Invalid DJANGO_ENV value. Choose 'development', 'production', 'api' or 'benchmark'.")
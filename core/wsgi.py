@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Read by core/configs/database.py to pick a safe connection reuse mode
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'wsgi')
 
 application = get_wsgi_application()
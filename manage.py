@@ -15,8 +15,13 @@ def main():
         environ.Env().read_env('.env.production')
     elif ENVIRONMENT == "development":
         environ.Env().read_env('.env.development')
+    elif ENVIRONMENT == "api":
+        # API-only variant of the production settings
+        environ.Env().read_env('.env.production')
+    elif ENVIRONMENT == "benchmark":
+        environ.Env().read_env('.env.benchmark')
     else:
-        raise ValueError("Invalid DJANGO_ENV value. Choose 'development' or 'production'.")
+        raise ValueError("Invalid DJANGO_ENV value. Choose 'development', 'production', 'api' or 'benchmark'.")
     
     try:
         from django.core.management import execute_from_command_line